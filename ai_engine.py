@@ -1,9 +1,65 @@
+import copy
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from vector_index import ExactIndex, IVFIndex, normalize_rows
+from embedding_cache import EmbeddingCache
 import json
 import os
+import threading
+import time
+import unicodedata
 from datetime import datetime
+from lru_cache import LRUCache
+from model_backends import cache_key, load_sentence_model
+from encode_scheduler import EncodeScheduler
+from file_utils import write_json_atomic
+
+# Con index_type='auto', catálogos de este tamaño o más usan IVF
+IVF_MIN_BOOKS = 50_000
+
+
+def normalize_query(text):
+    """Clave de cache de un mensaje: minúsculas, sin acentos, espacios simples"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.split())
+
+
+# Prototipos de estados emocionales con descripciones extensas
+EMOTION_PROTOTYPES = {
+    "feliz": "alegre contento emocionado entusiasmado positivo energético optimista radiante jubiloso animado",
+    "triste": "melancólico deprimido desanimado nostálgico solitario apesadumbrado abatido decaído sombrío desesperanzado",
+    "pensativo": "reflexivo filosófico introspectivo meditativo contemplativo analítico profundo",
+    "motivado": "inspirado determinado ambicioso productivo enfocado enérgico dinámico decidido",
+    "aburrido": "cansado hastiado sin interés monótono apático desganado fastidiado",
+    "ansioso": "nervioso preocupado inquieto estresado tenso agitado intranquilo angustiado",
+    "curioso": "interesado explorador inquisitivo ávido de aprender investigador descubridor",
+    "romantico": "amoroso sentimental apasionado emotivo tierno soñador enamorado",
+    "nostalgico": "añorante evocador remembrante retrospectivo sentimental del pasado",
+    "confundido": "perdido desorientado indeciso incierto dubitativo perplejo",
+    "valiente": "audaz intrépido corajudo heroico osado temerario aventurero",
+    "tranquilo": "calmado sereno pacífico relajado sosegado apacible",
+    "rebelde": "inconformista revolucionario contestatario crítico desafiante"
+}
+
+# Prototipos de géneros con descripciones extensas
+GENRE_PROTOTYPES = {
+    "filosofia": "filosófico existencial reflexivo pensamiento profundo sabiduría ética moral verdad conocimiento razón lógica",
+    "romance": "amor romántico relaciones sentimientos pasión enamoramiento pareja intimidad corazón emotivo",
+    "distopia": "futuro oscuro totalitario control social crítica apocalíptico opresión vigilancia",
+    "aventura": "viaje exploración acción emoción épica hazaña expedición descubrimiento",
+    "clasica": "literatura clásica obra maestra histórica universal atemporal tradición",
+    "humor": "cómico gracioso irónico satírico entretenido divertido risas alegre",
+    "misterio": "suspense enigma detective investigación intriga secreto crimen",
+    "ciencia_ficcion": "futuro tecnología espacio aliens robots inteligencia artificial",
+    "terror": "miedo horror suspenso escalofriante tenebroso oscuro",
+    "biografia": "vida real persona histórica testimonio memorias experiencia",
+    "autoayuda": "crecimiento personal desarrollo motivación superación coaching",
+    "historica": "historia época pasado acontecimientos cronología",
+    "fantasia": "magia dragones mundos imaginarios épica fantástica",
+    "politica": "poder gobierno sociedad sistema estado democracia",
+    "psicologia": "mente comportamiento emociones consciencia subconsciente"
+}
+
 
 class BookRecommendationAI:
     """
@@ -11,25 +67,139 @@ class BookRecommendationAI:
     - Sentence Transformers para embeddings semánticos
     - Sistema de historial y aprendizaje
     - Análisis de similitud contextual
+    
+    Con lazy=True el modelo (y torch) no se cargan en el constructor:
+    start_warmup() los carga en un hilo de fondo.
+    encode_batch_size: textos por llamada al modelo al codificar libros.
+    index_type: 'exact', 'ivf' o 'auto' (IVF desde IVF_MIN_BOOKS libros);
+    ivf_nprobe es la perilla de recall del IVF.
+    embedding_precision: 'float32', 'float16' o 'int8' para la matriz
+    de la biblioteca en memoria (2x o 4x menos memoria).
+    query_cache_size / query_cache_ttl: cache LRU de mensajes ya
+    analizados (embeddings + emoción y género), por texto normalizado.
+    model_backend: 'fp32' o 'int8' (cuantización dinámica, ver
+    model_backends); torch_threads fija los hilos intra-op de torch.
+    micro_batch / micro_batch_wait_ms: los mensajes de peticiones
+    concurrentes se codifican juntos (EncodeScheduler); micro_batch=1
+    codifica cada mensaje por separado.
+    store: StateStore opcional; cada recomendación se registra ahí como
+    las de SmartRecommender (el feedback y el aprendizaje la ven). Con
+    store, user_history.json (preferencias de género) ya no se reescribe
+    en cada petición: se guarda en close().
     """
     
-    def __init__(self):
+    def __init__(self, lazy=False, encode_batch_size=64, index_type='auto', ivf_nprobe=8,
+                 query_cache_size=1024, query_cache_ttl=3600, embedding_precision='float32',
+                 model_name='paraphrase-multilingual-MiniLM-L12-v2', model_backend='fp32',
+                 torch_threads=None, micro_batch=32, micro_batch_wait_ms=5.0, store=None):
         print("🤖 Inicializando motor de IA...")
         
-        # Cargar modelo de embeddings (pequeño y eficiente)
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-        print("✅ Modelo cargado: paraphrase-multilingual-MiniLM-L12-v2")
+        # Modelo de embeddings (pequeño y eficiente; nombre del hub o directorio local)
+        self.model_name = model_name
+        self.model_backend = model_backend
+        self.torch_threads = torch_threads
+        self.model = None
+        self.encode_batch_size = encode_batch_size
         
-        # Archivo para persistir historial
-        self.history_file = 'user_history.json'
-        self.user_history = self.load_history()
+        # Estado del calentamiento: pending -> warming -> ready | failed
+        self.warmup_state = 'pending'
+        self.warmup_started_at = None
+        self.warmup_seconds = None
+        self.warmup_error = None
         
-        # Embeddings de estados emocionales y géneros
-        self.emotion_embeddings = {}
-        self.genre_embeddings = {}
-        self.book_embeddings = {}
+        self.store = store
         
-        print("✅ Motor de IA listo")
+        # Archivo para persistir historial
+        # (ruta absoluta: close() puede correr al apagar, con otro cwd)
+        self.history_file = os.path.abspath('user_history.json')
+        self.user_history = self.load_history()
+        self._history_lock = threading.Lock()
+        self._closed = False
+        
+        # Embeddings de estados emocionales y géneros (matrices normalizadas)
+        self.prototypes_file = 'prototypes.json'
+        self.emotion_embeddings = None
+        self.genre_embeddings = None
+        self._prototypes_lock = threading.Lock()
+        
+        # Biblioteca vectorizada: matriz normalizada + ids paralelos
+        self.books = []
+        self.book_index = ExactIndex()
+        self.book_genres = np.empty(0, dtype=object)
+        self.index_type = index_type
+        self.ivf_nprobe = ivf_nprobe
+        self.embedding_precision = embedding_precision
+        # _books_lock protege el reemplazo de books/book_index/book_genres;
+        # _encode_lock serializa las codificaciones (fuera del primero;
+        # reentrante: sync_books llama a encode_books/add_books con él tomado)
+        self._books_lock = threading.Lock()
+        self._encode_lock = threading.RLock()
+        
+        # Cache persistente de embeddings del catálogo
+        self.embedding_cache = EmbeddingCache(cache_key(self.model_name, self.model_backend))
+        
+        # Micro-batching de los mensajes (el hilo arranca con el primer uso)
+        self.encoder = None
+        if micro_batch > 1:
+            self.encoder = EncodeScheduler(self._encode_batch, max_batch=micro_batch,
+                                           max_wait_ms=micro_batch_wait_ms)
+        
+        # Cache en memoria de consultas: texto normalizado -> análisis
+        self.query_cache = LRUCache(maxsize=query_cache_size, ttl=query_cache_ttl)
+        self._query_entry_bytes = 0
+        
+        if not lazy:
+            self.load_model()
+            self.warmup_state = 'ready'
+            print("✅ Motor de IA listo")
+    
+    def load_model(self):
+        """Importa sentence-transformers (y torch) y carga el modelo con su backend"""
+        self.model = load_sentence_model(self.model_name, self.model_backend, self.torch_threads)
+        print(f"✅ Modelo cargado: {self.model_name}")
+    
+    def start_warmup(self, books=None):
+        """Carga modelo, prototipos y embeddings del catálogo en segundo plano"""
+        if self.warmup_state != 'pending':
+            return
+        self.warmup_state = 'warming'
+        self.warmup_started_at = datetime.now().isoformat()
+        
+        thread = threading.Thread(target=self._warmup, args=(books,), name='ai-warmup', daemon=True)
+        thread.start()
+    
+    def _warmup(self, books):
+        start = time.monotonic()
+        try:
+            self.load_model()
+            self.get_prototypes()
+            if books:
+                self.encode_books(books)
+            self.warmup_seconds = time.monotonic() - start
+            self.warmup_state = 'ready'
+            print(f"✅ Motor de IA listo ({self.warmup_seconds:.1f}s)")
+        except Exception as e:
+            self.warmup_seconds = time.monotonic() - start
+            self.warmup_error = str(e)
+            self.warmup_state = 'failed'
+            print(f"❌ Error calentando motor de IA: {e}")
+    
+    def is_ready(self):
+        return self.warmup_state == 'ready'
+    
+    def get_warmup_status(self):
+        """Estado del calentamiento para el endpoint de readiness"""
+        return {
+            'state': self.warmup_state,
+            'model': self.model_name,
+            'backend': self.model_backend,
+            'started_at': self.warmup_started_at,
+            'seconds': self.warmup_seconds,
+            'error': self.warmup_error,
+            'books_encoded': len(self.book_index),
+            'index_bytes': int(self.book_index.nbytes),
+            'embedding_precision': self.embedding_precision
+        }
     
     def load_history(self):
         """Carga el historial de interacciones del usuario"""
@@ -42,27 +212,244 @@ class BookRecommendationAI:
         return {'interactions': [], 'preferences': {}}
     
     def save_history(self):
-        """Guarda el historial de manera persistente"""
+        """Guarda el historial de manera persistente (reemplazo atómico)"""
+        with self._history_lock:
+            history = copy.deepcopy(self.user_history)
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.user_history, f, ensure_ascii=False, indent=2)
+            write_json_atomic(self.history_file, history, ensure_ascii=False, indent=2)
         except Exception as e:
             print(f"Error guardando historial: {e}")
     
+    def close(self):
+        """Detiene el micro-batching y guarda el historial (al apagar)"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.encoder is not None:
+            self.encoder.close()
+        self.save_history()
+    
     def encode_books(self, books):
-        """Genera embeddings para todos los libros de la biblioteca"""
+        """
+        Genera embeddings para todos los libros de la biblioteca.
+        Los libros ya codificados se leen del cache en disco.
+        """
         print("📚 Generando embeddings de libros...")
         
-        for book in books:
-            # Crear texto descriptivo del libro
-            book_text = f"{book['titulo']} {book['autor']} {book['descripcion']}"
-            embedding = self.model.encode(book_text)
-            self.book_embeddings[book['titulo']] = {
-                'embedding': embedding,
-                'book': book
-            }
+        with self._encode_lock:
+            book_texts = [self.book_text(book) for book in books]
+            keys = self.embedding_cache.content_keys(book_texts)
+            embeddings = self.embedding_cache.get_embeddings(book_texts, self.encode_texts, keys=keys)
+            
+            book_index = self.make_index(len(embeddings))
+            if isinstance(book_index, IVFIndex):
+                book_index = self.build_ivf(book_index, keys, embeddings)
+            else:
+                book_index.build(embeddings, normalized=True)
+            with self._books_lock:
+                self.books = list(books)
+                self.book_index = book_index
+                self.book_genres = np.array([book.get('categoria', '') for book in self.books], dtype=object)
+        
+        print(f"✅ {len(self.book_index)} libros codificados")
+    
+    def add_books(self, books):
+        """
+        Agrega libros a la biblioteca vectorizada codificando solo esos
+        libros; sus filas se anexan al final (id = posición en self.books).
+        """
+        books = list(books)
+        if not books:
+            return 0
         
-        print(f"✅ {len(self.book_embeddings)} libros codificados")
+        with self._encode_lock:
+            book_texts = [self.book_text(book) for book in books]
+            embeddings = self.embedding_cache.add_embeddings(book_texts, self.encode_texts)
+            
+            with self._books_lock:
+                # Copia superficial: add crea arrays nuevos y la versión
+                # anterior sigue intacta para las consultas en curso
+                book_index = copy.copy(self.book_index)
+                book_index.add(embeddings, normalized=True)
+                self.books = self.books + books
+                self.book_index = book_index
+                self.book_genres = np.concatenate([
+                    self.book_genres,
+                    np.array([book.get('categoria', '') for book in books], dtype=object)
+                ])
+        
+        print(f"✅ {len(books)} libros agregados ({len(self.book_index)} en total)")
+        return len(books)
+    
+    def sync_books(self, books_data):
+        """
+        Codifica lo que falte de books_data: todo la primera vez, después
+        solo los libros nuevos del final (ids consecutivos). La cola se
+        calcula con _encode_lock tomado, así dos peticiones que ven el
+        mismo catálogo nuevo no la agregan dos veces.
+        """
+        with self._encode_lock:
+            if not len(self.book_index):
+                if len(books_data):
+                    self.encode_books(books_data)
+            elif len(books_data) > len(self.books):
+                self.add_books(books_data[len(self.books):])
+    
+    def build_ivf(self, book_index, keys, embeddings):
+        """
+        IVF del catálogo: el guardado junto al cache de embeddings si se
+        entrenó con estas claves y parámetros (k-means no se repite en cada
+        arranque); si no, se entrena y se guarda
+        """
+        params = (book_index.nlist, book_index.train_size, book_index.seed, book_index.precision)
+        saved, inserted = self.embedding_cache.load_index(keys, embeddings, params)
+        if saved is not None:
+            saved.nprobe = book_index.nprobe
+            print(f"📂 Índice IVF cargado del cache ({inserted} libros nuevos insertados)")
+            if inserted:
+                self.embedding_cache.save_index(keys, saved, params)
+            return saved
+        
+        book_index.build(embeddings, normalized=True)
+        self.embedding_cache.save_index(keys, book_index, params)
+        return book_index
+    
+    def make_index(self, n_books):
+        """Índice vacío según index_type para un catálogo de n_books"""
+        if self.index_type == 'ivf' or (self.index_type == 'auto' and n_books >= IVF_MIN_BOOKS):
+            return IVFIndex(nprobe=self.ivf_nprobe, precision=self.embedding_precision)
+        return ExactIndex(precision=self.embedding_precision)
+    
+    @staticmethod
+    def book_text(book):
+        """Texto descriptivo de un libro (lo que se codifica)"""
+        return f"{book['titulo']} {book['autor']} {book['descripcion']}"
+    
+    def _encode_batch(self, texts):
+        return self.model.encode(texts, batch_size=len(texts))
+    
+    def encode_query(self, text):
+        """Embedding de un mensaje, en lote con los de otras peticiones"""
+        if self.encoder is None:
+            return self.model.encode(text)
+        return self.encoder.encode(text)
+    
+    def encode_texts(self, texts, batch_size=None):
+        """
+        Codifica una lista de textos con el modelo en lotes de batch_size.
+        Los textos se ordenan por longitud para que cada lote tenga poco
+        padding; el resultado vuelve en el orden original.
+        """
+        texts = list(texts)
+        batch_size = batch_size or self.encode_batch_size
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        
+        result = None
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            encoded = np.asarray(self.model.encode([texts[i] for i in rows], batch_size=len(rows)),
+                                 dtype=np.float32)
+            if result is None:
+                result = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            result[rows] = encoded
+        
+        if result is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return result
+    
+    def load_prototypes(self, emotions=None, genres=None):
+        """
+        Codifica los prototipos de emoción y género en un solo batch.
+        Parte de los prototipos por defecto, les aplica prototypes.json
+        (si existe) y finalmente los diccionarios recibidos.
+        Puede llamarse de nuevo en caliente para extender los prototipos.
+        """
+        emotions_all = dict(EMOTION_PROTOTYPES)
+        genres_all = dict(GENRE_PROTOTYPES)
+        
+        if os.path.exists(self.prototypes_file):
+            try:
+                with open(self.prototypes_file, 'r', encoding='utf-8') as f:
+                    extra = json.load(f)
+                emotions_all.update(extra.get('emotions', {}))
+                genres_all.update(extra.get('genres', {}))
+            except Exception as e:
+                print(f"❌ Error leyendo {self.prototypes_file}: {e}")
+        
+        emotions_all.update(emotions or {})
+        genres_all.update(genres or {})
+        
+        texts = list(emotions_all.values()) + list(genres_all.values())
+        matrix = normalize_rows(self.model.encode(texts))
+        split = len(emotions_all)
+        
+        emotion_embeddings = {'labels': list(emotions_all), 'matrix': matrix[:split]}
+        genre_embeddings = {'labels': list(genres_all), 'matrix': matrix[split:]}
+        
+        # Reemplazo atómico: las consultas en curso usan la versión anterior
+        with self._prototypes_lock:
+            self.emotion_embeddings = emotion_embeddings
+            self.genre_embeddings = genre_embeddings
+        # Los análisis cacheados usaban los prototipos anteriores
+        self.query_cache.clear()
+        
+        print(f"✅ Prototipos codificados: {split} emociones, {len(genres_all)} géneros")
+        return emotion_embeddings, genre_embeddings
+    
+    def get_prototypes(self):
+        """Retorna los prototipos, codificándolos en el primer uso"""
+        with self._prototypes_lock:
+            emotion_embeddings, genre_embeddings = self.emotion_embeddings, self.genre_embeddings
+        if emotion_embeddings is None:
+            return self.load_prototypes()
+        return emotion_embeddings, genre_embeddings
+    
+    @staticmethod
+    def best_prototype(prototypes, embedding):
+        """Prototipo más similar (None si ninguna similitud es positiva)"""
+        if not prototypes['labels']:
+            return None, 0.0
+        similarities = prototypes['matrix'] @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] <= 0:
+            return None, 0.0
+        return prototypes['labels'][best], float(similarities[best])
+    
+    def analyze_query(self, user_message):
+        """
+        Embeddings y análisis de un mensaje, cacheados por texto normalizado
+        (mayúsculas, acentos y espacios no cambian la clave):
+        - embedding: mensaje normalizado (L2)
+        - context_embedding: mensaje + emoción + género detectados
+        """
+        key = normalize_query(user_message)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        # Prototipos codificados una sola vez (primer uso)
+        emotion_prototypes, genre_prototypes = self.get_prototypes()
+        user_embedding = normalize_rows(self.encode_query(user_message))[0]
+        
+        # Dos productos matriz-vector + argmax
+        best_emotion, best_emotion_score = self.best_prototype(emotion_prototypes, user_embedding)
+        best_genre, best_genre_score = self.best_prototype(genre_prototypes, user_embedding)
+        
+        # Embedding del contexto completo del usuario
+        context_text = f"{user_message} {best_emotion} {best_genre}"
+        context_embedding = normalize_rows(self.encode_query(context_text))[0]
+        
+        cached = {
+            'embedding': user_embedding,
+            'context_embedding': context_embedding,
+            'emotion': best_emotion,
+            'emotion_confidence': float(best_emotion_score),
+            'genre': best_genre,
+            'genre_confidence': float(best_genre_score)
+        }
+        self._query_entry_bytes = user_embedding.nbytes + context_embedding.nbytes
+        self.query_cache.set(key, cached)
+        return cached
     
     def understand_user_input(self, user_message):
         """
@@ -71,130 +458,133 @@ class BookRecommendationAI:
         - Preferencias de género
         - Contexto adicional
         """
-        user_embedding = self.model.encode(user_message)
-        
-        # Diccionario de estados emocionales con descripciones extensas
-        emotions = {
-            "feliz": "alegre contento emocionado entusiasmado positivo energético optimista radiante jubiloso animado",
-            "triste": "melancólico deprimido desanimado nostálgico solitario apesadumbrado abatido decaído sombrío desesperanzado",
-            "pensativo": "reflexivo filosófico introspectivo meditativo contemplativo analítico profundo",
-            "motivado": "inspirado determinado ambicioso productivo enfocado enérgico dinámico decidido",
-            "aburrido": "cansado hastiado sin interés monótono apático desganado fastidiado",
-            "ansioso": "nervioso preocupado inquieto estresado tenso agitado intranquilo angustiado",
-            "curioso": "interesado explorador inquisitivo ávido de aprender investigador descubridor",
-            "romantico": "amoroso sentimental apasionado emotivo tierno soñador enamorado",
-            "nostalgico": "añorante evocador remembrante retrospectivo sentimental del pasado",
-            "confundido": "perdido desorientado indeciso incierto dubitativo perplejo",
-            "valiente": "audaz intrépido corajudo heroico osado temerario aventurero",
-            "tranquilo": "calmado sereno pacífico relajado sosegado apacible",
-            "rebelde": "inconformista revolucionario contestatario crítico desafiante"
-        }
-        
-        # Diccionario de géneros con descripciones extensas
-        genres = {
-            "filosofia": "filosófico existencial reflexivo pensamiento profundo sabiduría ética moral verdad conocimiento razón lógica",
-            "romance": "amor romántico relaciones sentimientos pasión enamoramiento pareja intimidad corazón emotivo",
-            "distopia": "futuro oscuro totalitario control social crítica apocalíptico opresión vigilancia",
-            "aventura": "viaje exploración acción emoción épica hazaña expedición descubrimiento",
-            "clasica": "literatura clásica obra maestra histórica universal atemporal tradición",
-            "humor": "cómico gracioso irónico satírico entretenido divertido risas alegre",
-            "misterio": "suspense enigma detective investigación intriga secreto crimen",
-            "ciencia_ficcion": "futuro tecnología espacio aliens robots inteligencia artificial",
-            "terror": "miedo horror suspenso escalofriante tenebroso oscuro",
-            "biografia": "vida real persona histórica testimonio memorias experiencia",
-            "autoayuda": "crecimiento personal desarrollo motivación superación coaching",
-            "historica": "historia época pasado acontecimientos cronología",
-            "fantasia": "magia dragones mundos imaginarios épica fantástica",
-            "politica": "poder gobierno sociedad sistema estado democracia",
-            "psicologia": "mente comportamiento emociones consciencia subconsciente"
-        }
-        
-        # Calcular similitud con emociones
-        best_emotion = None
-        best_emotion_score = 0
-        
-        for emotion, description in emotions.items():
-            emotion_embedding = self.model.encode(description)
-            similarity = cosine_similarity(
-                [user_embedding], 
-                [emotion_embedding]
-            )[0][0]
-            
-            if similarity > best_emotion_score:
-                best_emotion_score = similarity
-                best_emotion = emotion
-        
-        # Calcular similitud con géneros
-        best_genre = None
-        best_genre_score = 0
-        
-        for genre, description in genres.items():
-            genre_embedding = self.model.encode(description)
-            similarity = cosine_similarity(
-                [user_embedding], 
-                [genre_embedding]
-            )[0][0]
-            
-            if similarity > best_genre_score:
-                best_genre_score = similarity
-                best_genre = genre
-        
+        return self.query_analysis(self.analyze_query(user_message), user_message)
+    
+    @staticmethod
+    def query_analysis(query, user_message):
+        """Análisis público (sin embeddings) a partir de analyze_query"""
         return {
-            'emotion': best_emotion,
-            'emotion_confidence': float(best_emotion_score),
-            'genre': best_genre,
-            'genre_confidence': float(best_genre_score),
+            'emotion': query['emotion'],
+            'emotion_confidence': query['emotion_confidence'],
+            'genre': query['genre'],
+            'genre_confidence': query['genre_confidence'],
             'raw_message': user_message
         }
     
-    def recommend_book(self, user_input, books_data):
+    def get_query_cache_stats(self):
+        """Métricas del cache de consultas (memoria estimada por embeddings)"""
+        stats = self.query_cache.get_stats()
+        stats['memory_bytes'] = stats['size'] * self._query_entry_bytes
+        return stats
+    
+    def recommend_book(self, user_input, books_data, k=5, session=None):
         """
-        Recomienda un libro usando IA semántica y historial
+        Recomienda un libro usando IA semántica y historial.
+        Retorna el mejor libro y el ranking top-k completo.
+        Con session se omiten los libros que ya se le recomendaron y el
+        elegido se agrega a sus exclusiones.
         """
-        # Si no hay embeddings, generarlos
-        if not self.book_embeddings:
-            self.encode_books(books_data)
+        # Si no hay embeddings, generarlos; si llegaron libros nuevos
+        # (ids consecutivos), codificar solo esos
+        self.sync_books(books_data)
         
-        # Analizar entrada del usuario
-        analysis = self.understand_user_input(user_input)
+        # Analizar entrada del usuario (cacheado si el mensaje ya se vio)
+        query = self.analyze_query(user_input)
+        analysis = self.query_analysis(query, user_input)
+        context_embedding = query['context_embedding']
         
         print(f"🔍 Análisis: Emoción={analysis['emotion']} ({analysis['emotion_confidence']:.2f}), "
               f"Género={analysis['genre']} ({analysis['genre_confidence']:.2f})")
         
-        # Crear embedding del contexto completo del usuario
-        context_text = f"{user_input} {analysis['emotion']} {analysis['genre']}"
-        context_embedding = self.model.encode(context_text)
-        
-        # Calcular similitud con todos los libros
-        similarities = {}
-        for book_title, book_data in self.book_embeddings.items():
-            similarity = cosine_similarity(
-                [context_embedding],
-                [book_data['embedding']]
-            )[0][0]
-            
-            # Ajustar con historial (dar boost a géneros preferidos)
-            if analysis['genre'] in self.user_history.get('preferences', {}):
-                preference_weight = self.user_history['preferences'][analysis['genre']]
-                similarity *= (1 + preference_weight * 0.2)
-            
-            similarities[book_title] = similarity
-        
-        # Obtener el libro más similar
-        best_book_title = max(similarities, key=similarities.get)
-        best_book = self.book_embeddings[best_book_title]['book']
-        confidence = similarities[best_book_title]
-        
-        # Guardar en historial
-        self.add_to_history(user_input, best_book, analysis, confidence)
+        # Versión consistente de la biblioteca (add_books la reemplaza)
+        with self._books_lock:
+            books, book_index, book_genres = self.books, self.book_index, self.book_genres
+        if not len(book_index):
+            return self.no_results(analysis)
+        
+        # Ajustar con historial (dar boost a los libros del género preferido)
+        boost = self.preference_boost(analysis['genre'], book_genres)
+        
+        # Similitud con todos los libros en un solo producto matriz-vector
+        # (se piden de más para descartar los ya recomendados en la sesión)
+        excluded = session.recommended if session is not None else ()
+        ids, scores = book_index.search(context_embedding, k=k + len(excluded), boost=boost)
+        
+        ranking = [
+            {'id': int(book_id), 'libro': books[book_id], 'score': float(score)}
+            for book_id, score in zip(ids, scores)
+            if int(book_id) not in excluded
+        ][:k]
+        if not ranking:
+            return self.no_results(analysis)
+        best_book = ranking[0]['libro']
+        confidence = self.confidence(ranking[0], boost)
+        
+        # Guardar en historial (y en la sesión)
+        interaction = self.add_to_history(user_input, best_book, analysis, confidence, ranking[0]['score'])
+        if session is not None:
+            session.exclude(ranking[0]['id'])
+            session.context.append(interaction)
         
         return {
             'libro': best_book,
             'confianza': float(confidence),
             'analisis': analysis,
-            'explicacion': self.generate_explanation(best_book, analysis, confidence)
+            'explicacion': self.generate_explanation(best_book, analysis, confidence),
+            'ranking': ranking,
+            'alternativas': [
+                {
+                    'id': item['id'],
+                    'titulo': item['libro']['titulo'],
+                    'autor': item['libro']['autor'],
+                    'score': item['score']
+                }
+                for item in ranking[1:]
+            ]
         }
     
+    @staticmethod
+    def no_results(analysis):
+        """Respuesta cuando no queda ningún libro por recomendar"""
+        return {
+            'libro': {
+                'titulo': 'Sin resultados',
+                'autor': 'Sistema',
+                'descripcion': 'No encontré libros para recomendarte. ¿Quieres reiniciar la sesión?',
+                'color': '#9B8BC4',
+                'emoji': '🤔'
+            },
+            'confianza': 0.0,
+            'analisis': analysis,
+            'explicacion': 'No quedan libros disponibles para recomendarte (catálogo vacío o ya recomendados).',
+            'ranking': [],
+            'alternativas': []
+        }
+    
+    @staticmethod
+    def confidence(item, boost=None):
+        """
+        Confianza en la escala de generate_explanation: similitud coseno
+        del libro sin el boost de preferencias, acotada a [0, 1] (el score
+        del ranking sí lleva el boost y puede superar 1)
+        """
+        similarity = item['score']
+        if boost is not None:
+            similarity /= float(boost[item['id']])
+        return min(max(similarity, 0.0), 1.0)
+    
+    def preference_boost(self, genre, book_genres=None):
+        """Vector multiplicativo de preferencia por libro (None si no aplica)"""
+        preferences = self.user_history.get('preferences', {})
+        if genre not in preferences:
+            return None
+        
+        if book_genres is None:
+            book_genres = self.book_genres
+        boost = np.ones(len(book_genres), dtype=np.float32)
+        boost[book_genres == genre] = 1 + preferences[genre] * 0.2
+        return boost
+    
     def generate_explanation(self, book, analysis, confidence):
         """Genera explicación natural de por qué se recomienda el libro"""
         
@@ -228,8 +618,12 @@ class BookRecommendationAI:
         
         return explanation
     
-    def add_to_history(self, user_input, book, analysis, confidence):
-        """Agrega interacción al historial para aprendizaje"""
+    def add_to_history(self, user_input, book, analysis, confidence, score=None):
+        """
+        Agrega interacción al historial para aprendizaje. Con store, además
+        se registra como evento 'recommend' (mismo formato que el de
+        SmartRecommender). Retorna la interacción.
+        """
         interaction = {
             'timestamp': datetime.now().isoformat(),
             'user_input': user_input,
@@ -239,23 +633,47 @@ class BookRecommendationAI:
             'confidence': float(confidence)
         }
         
-        self.user_history['interactions'].append(interaction)
-        
-        # Actualizar preferencias (aprendizaje simple)
-        if analysis['genre']:
-            if analysis['genre'] not in self.user_history['preferences']:
-                self.user_history['preferences'][analysis['genre']] = 0
-            self.user_history['preferences'][analysis['genre']] += 0.1
-        
-        # Mantener solo últimas 50 interacciones
-        if len(self.user_history['interactions']) > 50:
-            self.user_history['interactions'] = self.user_history['interactions'][-50:]
-        
-        self.save_history()
+        if self.store is not None:
+            self.store.record({
+                'type': 'recommend',
+                'interaction': {
+                    'timestamp': interaction['timestamp'],
+                    'user_message': user_input,
+                    'emotion': analysis['emotion'],
+                    'confidence': float(confidence),
+                    'recommended': book['titulo'],
+                    'categoria': book.get('categoria'),
+                    'score': float(score if score is not None else confidence),
+                    'special_contexts': [],
+                    'genre': analysis['genre'],
+                    'motor': 'semantico'
+                },
+                'preferences': [[analysis['emotion'], 0.2]] if analysis['emotion'] else [],
+                'book_scores': [[f"{book['titulo']}_{book['autor']}", 0.1]]
+            })
+        
+        with self._history_lock:
+            self.user_history['interactions'].append(interaction)
+            
+            # Actualizar preferencias (aprendizaje simple)
+            if analysis['genre']:
+                preferences = self.user_history['preferences']
+                preferences[analysis['genre']] = preferences.get(analysis['genre'], 0) + 0.1
+            
+            # Mantener solo últimas 50 interacciones
+            if len(self.user_history['interactions']) > 50:
+                self.user_history['interactions'] = self.user_history['interactions'][-50:]
+        
+        # Sin store no hay escritura en segundo plano: se guarda en el acto
+        if self.store is None:
+            self.save_history()
+        return interaction
     
     def get_user_stats(self):
         """Obtiene estadísticas del usuario para mostrar"""
-        total_interactions = len(self.user_history['interactions'])
+        with self._history_lock:
+            interactions = list(self.user_history['interactions'])
+        total_interactions = len(interactions)
         
         if total_interactions == 0:
             return {
@@ -268,7 +686,7 @@ class BookRecommendationAI:
         genre_counts = {}
         emotion_counts = {}
         
-        for interaction in self.user_history['interactions']:
+        for interaction in interactions:
             genre = interaction.get('genre')
             emotion = interaction.get('emotion')
             
@@ -1,12 +1,101 @@
-from flask import Flask, render_template, request, jsonify
+import atexit
+import os
+import time
+from flask import Flask, Response, render_template, request, jsonify, g
 from smart_recommender import SmartRecommender
 from feedback_system import FeedbackSystem
+from ai_engine import BookRecommendationAI
+from state_store import StateStore
+from recent_books import RecentBooksFetcher, GOOGLE_BOOKS_URL
+from locks import lock_stats
+import metrics
 
 app = Flask(__name__)
 
+MAX_ALTERNATIVAS = 50
+MAX_LOTE = 1000
+
+# Estado persistente con escritura en segundo plano: flush cada
+# BOOKMATE_FLUSH_MS milisegundos (0 = escribir en cada petición)
+flush_ms = int(os.environ.get('BOOKMATE_FLUSH_MS', '200'))
+state_store = StateStore(flush_interval=flush_ms / 1000 if flush_ms > 0 else None)
+atexit.register(state_store.close)  # último flush al apagar
+
 # Instanciar el recomendador inteligente y sistema de feedback
-recommender = SmartRecommender()
-feedback_sys = FeedbackSystem()
+recommender = SmartRecommender(store=state_store)
+feedback_sys = FeedbackSystem(store=state_store)
+
+# Motor semántico: el modelo se carga en segundo plano. Mientras tanto
+# /recomendar lo atiende SmartRecommender (BOOKMATE_SEMANTIC=0 lo desactiva).
+# BOOKMATE_ENCODE_BATCH: textos por llamada al modelo al codificar libros.
+# BOOKMATE_INDEX: exact | ivf | auto; BOOKMATE_NPROBE: recall del IVF.
+# BOOKMATE_QUERY_CACHE / BOOKMATE_QUERY_CACHE_TTL: mensajes ya analizados.
+# BOOKMATE_EMBEDDING_PRECISION: float32 | float16 | int8 (matriz en memoria).
+# BOOKMATE_MODEL (hub o directorio local), BOOKMATE_MODEL_BACKEND: fp32 | int8,
+# BOOKMATE_TORCH_THREADS: hilos intra-op de torch.
+# BOOKMATE_MICRO_BATCH / BOOKMATE_MICRO_BATCH_MS: lote y ventana máximos
+# para codificar juntos los mensajes concurrentes (1 = sin micro-batching)
+semantic_ai = BookRecommendationAI(
+    lazy=True,
+    store=state_store,
+    encode_batch_size=int(os.environ.get('BOOKMATE_ENCODE_BATCH', '64')),
+    index_type=os.environ.get('BOOKMATE_INDEX', 'auto'),
+    ivf_nprobe=int(os.environ.get('BOOKMATE_NPROBE', '8')),
+    query_cache_size=int(os.environ.get('BOOKMATE_QUERY_CACHE', '1024')),
+    query_cache_ttl=int(os.environ.get('BOOKMATE_QUERY_CACHE_TTL', '3600')),
+    embedding_precision=os.environ.get('BOOKMATE_EMBEDDING_PRECISION', 'float32'),
+    model_name=os.environ.get('BOOKMATE_MODEL', 'paraphrase-multilingual-MiniLM-L12-v2'),
+    model_backend=os.environ.get('BOOKMATE_MODEL_BACKEND', 'fp32'),
+    torch_threads=int(os.environ.get('BOOKMATE_TORCH_THREADS', '0')) or None,
+    micro_batch=int(os.environ.get('BOOKMATE_MICRO_BATCH', '32')),
+    micro_batch_wait_ms=float(os.environ.get('BOOKMATE_MICRO_BATCH_MS', '5'))
+)
+semantic_enabled = os.environ.get('BOOKMATE_SEMANTIC', '1') != '0'
+atexit.register(semantic_ai.close)  # guarda user_history.json al apagar
+if semantic_enabled:
+    semantic_ai.start_warmup(recommender.get_all_books_flat())
+
+# Libros recientes: consultas en paralelo con cache compartida por los hilos
+recent_books = RecentBooksFetcher(base_url=os.environ.get('BOOKMATE_BOOKS_API', GOOGLE_BOOKS_URL))
+
+SESSION_COOKIE = 'bookmate_session'
+SESSION_HEADER = 'X-Session-Id'
+
+def current_session():
+    """Sesión del usuario (header X-Session-Id o cookie); crea una si no hay"""
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    if not session_id or len(session_id) > 64:
+        session_id = recommender.sessions.new_id()
+        g.new_session_id = session_id
+    return recommender.sessions.get(session_id)
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Peticiones, latencia y errores por endpoint (la regla de la ruta, no la
+    URL, para no crear una serie por parámetro). En /recomendar/stream la
+    latencia llega hasta los headers: el cuerpo se envía después.
+    """
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    start = g.pop('request_start', None)
+    if start is not None:
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method)
+    metrics.HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+    if response.status_code >= 500:
+        metrics.HTTP_ERRORS.inc(endpoint=endpoint)
+    return response
+
+@app.after_request
+def set_session_cookie(response):
+    session_id = g.pop('new_session_id', None)
+    if session_id:
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+        response.headers[SESSION_HEADER] = session_id
+    return response
 
 @app.route('/')
 def home():
@@ -23,12 +112,26 @@ def recomendar():
         if not user_message:
             return jsonify({'error': 'Por favor escribe un mensaje'}), 400
         
-        # Usar el recomendador inteligente
-        resultado = recommender.recommend(user_message)
+        # Cantidad de alternativas (por defecto 3, máximo MAX_ALTERNATIVAS)
+        try:
+            k = min(max(int(data.get('k', 3)), 0), MAX_ALTERNATIVAS)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'k debe ser un número entero'}), 400
+        
+        # Usar el motor semántico si ya está listo; si no, el inteligente
+        session = current_session()
+        if semantic_ai.is_ready():
+            resultado = semantic_ai.recommend_book(user_message, recommender.get_all_books_flat(), k=k + 1,
+                                                   session=session)
+            motor = 'semantico'
+        else:
+            resultado = recommender.recommend(user_message, k=k, session=session)
+            motor = 'smart'
         
         return jsonify({
             'success': True,
-            'recommendation': resultado
+            'recommendation': resultado,
+            'motor': motor
         })
         
     except Exception as e:
@@ -37,6 +140,122 @@ def recomendar():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+def sse_event(event, data):
+    """Un evento Server-Sent Events con datos JSON"""
+    return f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+
+@app.route('/recomendar/stream', methods=['POST'])
+def recomendar_stream():
+    """
+    /recomendar por etapas (text/event-stream). Eventos, en orden:
+    analisis, libro, alternativas, explicacion y resultado (el mismo JSON
+    que /recomendar). Un fallo a mitad de camino llega como evento error.
+    """
+    data = request.get_json(silent=True) or {}
+    user_message = (data.get('message') or '').strip()
+    
+    print(f"📨 Mensaje recibido (stream): {user_message}")
+    
+    if not user_message:
+        return jsonify({'error': 'Por favor escribe un mensaje'}), 400
+    try:
+        k = min(max(int(data.get('k', 3)), 0), MAX_ALTERNATIVAS)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'k debe ser un número entero'}), 400
+    
+    session = current_session()
+    if semantic_ai.is_ready():
+        motor = 'semantico'
+        
+        def stages():
+            # El motor semántico no calcula por etapas: se envía todo junto
+            resultado = semantic_ai.recommend_book(user_message, recommender.get_all_books_flat(), k=k + 1,
+                                                   session=session)
+            yield 'analisis', resultado['analisis']
+            yield 'libro', {'libro': resultado['libro'], 'confianza': resultado['confianza']}
+            yield 'alternativas', resultado['alternativas']
+            yield 'explicacion', resultado['explicacion']
+            yield 'resultado', resultado
+    else:
+        motor = 'smart'
+        
+        def stages():
+            return recommender.recommend_stream(user_message, k=k, session=session)
+    
+    def generate():
+        try:
+            for stage, payload in stages():
+                if stage == 'resultado':
+                    payload = {'success': True, 'recommendation': payload, 'motor': motor}
+                yield sse_event(stage, payload)
+        except Exception as e:
+            print(f"❌ Error en recomendación (stream): {e}")
+            import traceback
+            traceback.print_exc()
+            # La respuesta ya salió con 200: el error se cuenta acá
+            metrics.HTTP_ERRORS.inc(endpoint='/recomendar/stream')
+            yield sse_event('error', {'error': str(e)})
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/recomendar/batch', methods=['POST'])
+def recomendar_batch():
+    """
+    Recomendaciones para muchos mensajes en una sola llamada:
+    {"messages": ["texto", {"message": "texto", "session_id": "abc"}, ...], "k": 3}
+    Los mensajes sin session_id usan la sesión de la petición.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        messages = data.get('messages')
+        
+        if not isinstance(messages, list) or not messages:
+            return jsonify({'error': 'messages debe ser una lista no vacía'}), 400
+        if len(messages) > MAX_LOTE:
+            return jsonify({'error': f'Máximo {MAX_LOTE} mensajes por lote'}), 400
+        
+        try:
+            k = min(max(int(data.get('k', 3)), 0), MAX_ALTERNATIVAS)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'k debe ser un número entero'}), 400
+        
+        # Validar cada mensaje; los inválidos se reportan en su posición
+        default_session = None
+        pending = []
+        results = [None] * len(messages)
+        for i, item in enumerate(messages):
+            if isinstance(item, dict):
+                text, session_id = item.get('message'), item.get('session_id')
+            else:
+                text, session_id = item, None
+            if not isinstance(text, str) or not text.strip():
+                results[i] = {'error': 'Por favor escribe un mensaje'}
+                continue
+            if session_id:
+                session = recommender.sessions.get(str(session_id)[:64])
+            else:
+                default_session = default_session or current_session()
+                session = default_session
+            pending.append((i, text.strip(), session))
+        
+        recommendations = recommender.recommend_batch([(text, session) for _, text, session in pending], k=k)
+        for (i, _, _), recommendation in zip(pending, recommendations):
+            results[i] = {'recommendation': recommendation}
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'total': len(results),
+            'motor': 'smart'
+        })
+        
+    except Exception as e:
+        print(f"❌ Error en recomendación por lote: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
 # CORREGIDO: Solo UNA función para /api/feedback
 @app.route('/api/feedback', methods=['POST'])
 def submit_feedback():
@@ -94,15 +313,8 @@ def add_book():
         book_data.setdefault('intensidad', 'media')
         book_data.setdefault('temas', [])
         
-        # Agregar a la categoría correspondiente en el recommender
-        categoria = book_data['categoria']
-        if categoria not in recommender.books:
-            recommender.books[categoria] = []
-        
-        recommender.books[categoria].append(book_data)
-        
-        # Guardar en historial para persistencia
-        recommender.save_history()
+        # Persistir en el catálogo y publicarlo para el recommender
+        recommender.add_book(book_data)
         
         return jsonify({
             'success': True,
@@ -132,71 +344,21 @@ def get_biblioteca():
 def get_libros_recientes():
     """Busca libros populares que NO están en la biblioteca"""
     try:
-        import requests
         from datetime import datetime
         
         # Obtener títulos existentes
-        libros_existentes = [libro['titulo'].lower() for libro in recommender.get_all_books_flat()]
+        libros_existentes = {libro['titulo'].lower() for libro in recommender.get_all_books_flat()}
         
-        year = datetime.now().year
-        queries = [
-            f"bestseller books {year}",
-            f"most popular books {year}",
-            f"award winning books {year}"
-        ]
+        # Consultas en paralelo y cacheadas (ver RecentBooksFetcher)
+        try:
+            candidatos = recent_books.get(datetime.now().year)
+        except Exception as e:
+            print(f"Error buscando libros recientes: {e}")
+            metrics.HTTP_ERRORS.inc(endpoint='/api/libros-recientes')
+            candidatos = []
         
-        libros_encontrados = []
-        libros_unicos = set()
-        
-        for query in queries:
-            try:
-                url = f"https://www.googleapis.com/books/v1/volumes?q={query}&orderBy=relevance&maxResults=10"
-                response = requests.get(url, timeout=5)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    if 'items' in data:
-                        for item in data['items']:
-                            volume_info = item.get('volumeInfo', {})
-                            titulo = volume_info.get('title', '')
-                            
-                            if titulo and titulo.lower() not in libros_existentes and titulo not in libros_unicos:
-                                libros_unicos.add(titulo)
-                                
-                                autores = volume_info.get('authors', ['Autor desconocido'])
-                                autor = ', '.join(autores[:2])
-                                
-                                descripcion = volume_info.get('description', 'Sin descripción disponible')
-                                if len(descripcion) > 150:
-                                    descripcion = descripcion[:147] + '...'
-                                
-                                fecha = volume_info.get('publishedDate', str(year))
-                                anio = fecha[:4] if fecha else str(year)
-                                
-                                rating = volume_info.get('averageRating', 0)
-                                rating_count = volume_info.get('ratingsCount', 0)
-                                
-                                fuente = "Google Books"
-                                if rating > 0:
-                                    fuente = f"⭐ {rating}/5 ({rating_count} reseñas)"
-                                
-                                libros_encontrados.append({
-                                    "titulo": titulo,
-                                    "autor": autor,
-                                    "anio": anio,
-                                    "descripcion": descripcion,
-                                    "fuente": fuente
-                                })
-                                
-                                if len(libros_encontrados) >= 6:
-                                    break
-            except Exception as e:
-                print(f"Error buscando con query '{query}': {e}")
-                continue
-            
-            if len(libros_encontrados) >= 6:
-                break
+        libros_encontrados = [libro for libro in candidatos
+                              if libro['titulo'].lower() not in libros_existentes][:6]
         
         if not libros_encontrados:
             libros_encontrados = [
@@ -218,14 +380,15 @@ def get_libros_recientes():
         
         return jsonify({
             'success': True,
-            'libros': libros_encontrados[:6],
-            'total': len(libros_encontrados[:6]),
+            'libros': libros_encontrados,
+            'total': len(libros_encontrados),
             'fuente': 'Google Books API',
             'nota': 'Libros que no están en tu biblioteca actual'
         })
         
     except Exception as e:
         print(f"Error en /api/libros-recientes: {e}")
+        metrics.HTTP_ERRORS.inc(endpoint='/api/libros-recientes')
         return jsonify({
             'success': True,
             'libros': [{
@@ -242,7 +405,7 @@ def get_libros_recientes():
 def get_user_stats():
     """Retorna estadísticas REALES del aprendizaje"""
     try:
-        stats = recommender.get_learning_stats()
+        stats = recommender.get_learning_stats(current_session())
         return jsonify({
             'success': True,
             'stats': stats
@@ -253,9 +416,9 @@ def get_user_stats():
 
 @app.route('/api/reset-session', methods=['POST'])
 def reset_session():
-    """Reinicia las recomendaciones de la sesión"""
+    """Reinicia las recomendaciones de la sesión del usuario"""
     try:
-        recommender.reset_session()
+        recommender.reset_session(current_session())
         return jsonify({
             'success': True,
             'message': 'Sesión reiniciada. Puedo recomendarte libros nuevamente.'
@@ -271,9 +434,55 @@ def health():
         'service': 'BookMate AI (Smart Learning)',
         'total_books': len(recommender.get_all_books_flat()),
         'total_interactions': len(recommender.history.get('interactions', [])),
-        'total_feedback': feedback_sys.feedback_data.get('total_feedback_count', 0)
+        'total_feedback': feedback_sys.feedback_data.get('total_feedback_count', 0),
+        'active_sessions': len(recommender.sessions),
+        'persistence': state_store.get_stats(),
+        'semantic_engine': semantic_ai.warmup_state,
+        'query_cache': semantic_ai.get_query_cache_stats(),
+        'encode_scheduler': semantic_ai.encoder.get_stats() if semantic_ai.encoder else None
     })
 
+@app.route('/api/metrics')
+def get_metrics():
+    """Métricas en formato de texto de Prometheus (histogramas, contadores y gauges)"""
+    locks = lock_stats()
+    gauges = []
+    for key in ('acquisitions', 'contended', 'wait_ms', 'max_wait_ms'):
+        gauges += metrics.gauge_lines(f'bookmate_lock_{key}', f'Locks instrumentados: {key}',
+                                      [({'lock': name}, stats[key]) for name, stats in locks.items()])
+    gauges += metrics.gauge_lines('bookmate_active_sessions', 'Sesiones activas',
+                                  [({}, len(recommender.sessions))])
+    gauges += metrics.stats_gauges('bookmate_persistence', 'StateStore', state_store.get_stats())
+    gauges += metrics.stats_gauges('bookmate_recent_books', 'Cache de libros recientes', recent_books.get_stats())
+    gauges += metrics.stats_gauges('bookmate_query_cache', 'Cache de consultas semánticas',
+                                   semantic_ai.get_query_cache_stats())
+    if semantic_ai.encoder:
+        gauges += metrics.stats_gauges('bookmate_encode_scheduler', 'Micro-batching de codificaciones',
+                                       semantic_ai.encoder.get_stats())
+    return Response(metrics.render(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/health/live')
+def health_live():
+    """Liveness: el proceso responde"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/api/health/ready')
+def health_ready():
+    """
+    Readiness: SmartRecommender atiende desde el arranque, así que se está
+    listo mientras el motor semántico calienta (o si falló); el estado y
+    la duración del calentamiento van en el cuerpo. 503 solo si ningún
+    motor puede atender (catálogo vacío y motor semántico no listo)
+    """
+    status = semantic_ai.get_warmup_status()
+    if semantic_ai.is_ready():
+        motor = 'semantico'
+    elif len(recommender.catalog):
+        motor = 'smart'
+    else:
+        return jsonify({'status': 'unavailable', 'motor_activo': None, 'semantic_engine': status}), 503
+    return jsonify({'status': 'ready', 'motor_activo': motor, 'semantic_engine': status})
+
 if __name__ == '__main__':
     print("🚀 Iniciando BookMate AI (Smart Learning con Feedback)...")
     print("📖 Abre tu navegador en: http://localhost:5000")
@@ -0,0 +1,100 @@
+"""
+Benchmark: IVFIndex (aproximado) vs ExactIndex — recall@k y latencia
+
+Uso:
+    python benchmarks/bench_ann.py
+    python benchmarks/bench_ann.py --sizes 100000 1000000 --nprobe 1 4 8 16 32
+
+Los embeddings sintéticos se agrupan alrededor de centros aleatorios
+(como los de textos reales); sobre vectores uniformes cualquier IVF
+necesita visitar casi todas las listas.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import ExactIndex, IVFIndex, normalize_rows
+
+
+def clustered_embeddings(n, dim, clusters=200, noise=1.5, seed=0, chunk=100_000):
+    """Embeddings normalizados alrededor de `clusters` centros, por bloques"""
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.standard_normal((clusters, dim), dtype=np.float32))
+    matrix = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk):
+        end = min(start + chunk, n)
+        rows = centers[rng.integers(0, clusters, end - start)]
+        rows += rng.standard_normal((end - start, dim), dtype=np.float32) * (noise / np.sqrt(dim))
+        matrix[start:end] = normalize_rows(rows)
+    return matrix
+
+
+def timed_search(index, queries, k, **kwargs):
+    """Resultados y mediana de ms por consulta"""
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(index.search(query, k=k, **kwargs)[0])
+        timings.append(time.perf_counter() - start)
+    return results, float(np.median(timings)) * 1000
+
+
+def recall_at_k(results, truth):
+    return float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(results, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--nlist', type=int, default=None, help='por defecto 4·√n')
+    args = parser.parse_args()
+
+    print(f"📐 dim={args.dim} k={args.k} consultas={args.queries}")
+    rng = np.random.default_rng(1)
+    for n in args.sizes:
+        embeddings = clustered_embeddings(n, args.dim)
+        # Consultas: libros del catálogo con ruido (como un texto parecido)
+        queries = embeddings[rng.integers(0, n, args.queries)]
+        queries = queries + rng.standard_normal(queries.shape, dtype=np.float32) * (0.3 / np.sqrt(args.dim))
+
+        exact = ExactIndex()
+        exact.build(embeddings, normalized=True)
+
+        start = time.perf_counter()
+        ivf = IVFIndex(nlist=args.nlist)
+        ivf.build(embeddings, normalized=True)
+        build_s = time.perf_counter() - start
+
+        # Inserción incremental de 1.000 libros sin reentrenar
+        extra = clustered_embeddings(1_000, args.dim, seed=2)
+        start = time.perf_counter()
+        ivf.add(extra, normalized=True)
+        insert_ms = (time.perf_counter() - start) * 1000
+        exact.add(extra, normalized=True)
+        truth, exact_ms = timed_search(exact, queries, args.k)
+
+        print(f"\n📚 {len(ivf):,} libros | nlist={len(ivf.centroids)} | build {build_s:.1f}s | "
+              f"insertar 1.000: {insert_ms:.0f} ms")
+        print(f"{'nprobe':>8} | {'recall@' + str(args.k):>10} | {'ms/consulta':>12} | {'speedup':>8}")
+        print("-" * 48)
+        print(f"{'exacto':>8} | {1.0:>10.3f} | {exact_ms:>12.3f} | {1:>7.1f}x")
+        for nprobe in args.nprobe:
+            results, ivf_ms = timed_search(ivf, queries, args.k, nprobe=nprobe)
+            print(f"{nprobe:>8} | {recall_at_k(results, truth):>10.3f} | {ivf_ms:>12.3f} | "
+                  f"{exact_ms / ivf_ms:>7.1f}x")
+
+        del embeddings, exact, ivf
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: encoder fp32 vs int8 dinámico (model_backends) en CPU
+(latencia de una consulta, throughput en lotes y coincidencia top-k)
+
+Uso:
+    python benchmarks/bench_backends.py --model ./modelos/minilm
+    python benchmarks/bench_backends.py --tiny
+    python benchmarks/bench_backends.py --model ./modelos/minilm --threads 1 2 4
+
+--model es un directorio local (guardado antes con
+SentenceTransformer(nombre).save(directorio)); --tiny construye un BERT
+pequeño con pesos aleatorios en un directorio temporal. En ambos casos
+no se usa la red (HF_HUB_OFFLINE=1).
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_encoding import synthetic_texts
+from ai_engine import EMOTION_PROTOTYPES, GENRE_PROTOTYPES
+from model_backends import configure_threads, load_sentence_model
+from vector_index import ExactIndex, normalize_rows
+
+
+def build_tiny_model(directory, hidden=128, layers=2):
+    """BERT pequeño (pesos aleatorios, vocabulario de los prototipos) + mean pooling"""
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizer
+
+    words = sorted(set(" ".join(list(EMOTION_PROTOTYPES.values()) + list(GENRE_PROTOTYPES.values())).split()))
+    vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + words + [str(i) for i in range(10)]
+    transformer_dir = os.path.join(directory, 'transformer')
+    os.makedirs(transformer_dir, exist_ok=True)
+    vocab_file = os.path.join(transformer_dir, 'vocab.txt')
+    with open(vocab_file, 'w', encoding='utf-8') as f:
+        f.write("\n".join(vocab))
+
+    config = BertConfig(vocab_size=len(vocab), hidden_size=hidden, num_hidden_layers=layers,
+                        num_attention_heads=4, intermediate_size=hidden * 4)
+    BertModel(config).save_pretrained(transformer_dir)
+    BertTokenizer(vocab_file).save_pretrained(transformer_dir)
+
+    transformer = models.Transformer(transformer_dir, max_seq_length=128)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension())
+    model_dir = os.path.join(directory, 'model')
+    SentenceTransformer(modules=[transformer, pooling], device='cpu').save(model_dir)
+    return model_dir
+
+
+def encode_matrix(model, texts, batch_size):
+    return normalize_rows(model.encode(texts, batch_size=batch_size))
+
+
+def bench_backend(model, texts, queries, batch_size, repeats):
+    """(ms de una consulta p50, textos/s en lotes, embeddings de queries y catálogo)"""
+    model.encode(queries[:8])  # calentamiento
+    timings = []
+    for query in queries[:repeats]:
+        start = time.perf_counter()
+        model.encode(query)
+        timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    catalog = encode_matrix(model, texts, batch_size)
+    throughput = len(texts) / (time.perf_counter() - start)
+    return float(np.median(timings)) * 1000, throughput, encode_matrix(model, queries, batch_size), catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--model', help='directorio local de un SentenceTransformer')
+    source.add_argument('--tiny', action='store_true', help='BERT pequeño aleatorio (sin descargas)')
+    parser.add_argument('--books', type=int, default=1_000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--threads', type=int, nargs='+', default=[None])
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = build_tiny_model(tmp) if args.tiny else args.model
+        texts = synthetic_texts(args.books)
+        queries = [f"me siento {text.split(' ', 5)[-1][:80]}" for text in synthetic_texts(args.queries, seed=1)]
+
+        print(f"📐 modelo={model_path} libros={args.books} consultas={len(queries)} k={args.k}")
+        print(f"{'backend':>8} | {'hilos':>5} | {'ms/consulta':>11} | {'textos/s':>9} | "
+              f"{'top-' + str(args.k):>7} | {'top-1':>6}")
+        print("-" * 62)
+
+        for threads in args.threads:
+            results = {}
+            for backend in ('fp32', 'int8'):
+                model = load_sentence_model(model_path, backend, threads)
+                results[backend] = bench_backend(model, texts, queries, args.batch_size, args.queries)
+                del model
+
+            # Coincidencia: ranking int8 (consultas y catálogo int8) vs fp32
+            reference = ExactIndex()
+            reference.build(results['fp32'][3], normalized=True)
+            for backend, (latency_ms, throughput, query_matrix, catalog) in results.items():
+                index = ExactIndex()
+                index.build(catalog, normalized=True)
+                agreement, top1 = [], []
+                for fp32_query, query in zip(results['fp32'][2], query_matrix):
+                    expected = reference.search(fp32_query, k=args.k)[0]
+                    got = index.search(query, k=args.k)[0]
+                    agreement.append(len(set(expected) & set(got)) / args.k)
+                    top1.append(expected[0] == got[0])
+                print(f"{backend:>8} | {configure_threads(threads):>5} | {latency_ms:>11.2f} | "
+                      f"{throughput:>9.1f} | {np.mean(agreement):>7.3f} | {np.mean(top1):>6.3f}")
+
+
+if __name__ == '__main__':
+    main()
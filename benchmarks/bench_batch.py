@@ -0,0 +1,77 @@
+"""
+Benchmark: N mensajes por /recomendar (uno por petición) vs /recomendar/batch
+
+Uso:
+    python benchmarks/bench_batch.py --messages 2000 --batch-size 500
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stress_concurrency import QuietHandler
+
+MENSAJES = [
+    "Estoy triste pero no quiero ponerme peor",
+    "Estoy feliz, pero quiero algo que me haga llorar.",
+    "Hoy me siento vacía, como si nada tuviera sentido",
+    "Quiero algo feminista, triste y con una protagonista fuerte.",
+    "¿Tienes algo sobre duelo, pero que no sea deprimente?",
+    "Me siento nostálgica, pero con ganas de esperanza",
+    "Sorpréndeme con algo que me transforme",
+    "Estoy aburrido de la rutina",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--cohort', type=int, default=200, help='sesiones distintas')
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    os.environ['BOOKMATE_SEMANTIC'] = '0'
+    app_module = importlib.import_module('app')
+    httpd = make_server('127.0.0.1', 0, app_module.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{httpd.server_port}'
+
+    items = [{'message': MENSAJES[i % len(MENSAJES)], 'session_id': f'cohorte-{i % args.cohort}'}
+             for i in range(args.messages)]
+    http = requests.Session()
+
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    start = time.perf_counter()
+    for item in items:
+        http.post(f'{base_url}/recomendar', json={'message': item['message']},
+                  headers={'X-Session-Id': item['session_id']}).raise_for_status()
+    single = time.perf_counter() - start
+
+    for session_id in {item['session_id'] for item in items}:
+        app_module.recommender.sessions.reset(session_id)
+    start = time.perf_counter()
+    for i in range(0, len(items), args.batch_size):
+        http.post(f'{base_url}/recomendar/batch',
+                  json={'messages': items[i:i + args.batch_size]}).raise_for_status()
+    batch = time.perf_counter() - start
+    sys.stdout = stdout
+    httpd.shutdown()
+
+    print(f"📨 {args.messages:,} mensajes, {args.cohort} sesiones, lotes de {args.batch_size}")
+    print(f"{'/recomendar':<22}{single:>8.2f} s  {args.messages / single:>8.0f} mensajes/s")
+    print(f"{'/recomendar/batch':<22}{batch:>8.2f} s  {args.messages / batch:>8.0f} mensajes/s"
+          f"  (x{single / batch:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: memoria por libro y asignaciones por petición del catálogo
+(diccionarios + get_all_books_flat con .copy() vs registros Book)
+
+Uso:
+    python benchmarks/bench_catalog.py --books 10000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import Book, Catalog
+
+EMOCIONES = ['triste', 'feliz', 'pensativo', 'motivado', 'aburrido', 'ansioso',
+             'curioso', 'romántico', 'confundido', 'nostálgico']
+IMPACTOS = ['catártico', 'reflexivo', 'esperanzador', 'transformador', 'entretenimiento']
+TEMAS = ['amor', 'pérdida', 'moral', 'soledad', 'control', 'libertad', 'duelo', 'muerte']
+CATEGORIAS = ['filosofia', 'romance', 'distopia', 'clasica', 'humor', 'aventura']
+
+
+def synthetic_library(n, seed=0):
+    """Biblioteca {categoria: [libros]} con el formato de build_library"""
+    rng = random.Random(seed)
+    library = {categoria: [] for categoria in CATEGORIAS}
+    for i in range(n):
+        # Los strings repetidos se construyen por libro, como al leer JSON
+        library[rng.choice(CATEGORIAS)].append({
+            "titulo": f"Libro sintético {i}",
+            "autor": "".join(["Autor ", str(i % 500)]),
+            "descripcion": f"Descripción del libro {i} sobre la vida y la memoria",
+            "color": "".join(["#9B8B", "C4"]),
+            "emoji": "📖",
+            "emociones": ["".join(e) for e in rng.sample(EMOCIONES, 3)],
+            "impacto": "".join(rng.choice(IMPACTOS)),
+            "intensidad": "".join(rng.choice(['alta', 'media', 'baja'])),
+            "temas": ["".join(t) for t in rng.sample(TEMAS, 3)],
+        })
+    return library
+
+
+def legacy_flat(library):
+    """get_all_books_flat original: copia cada libro en cada petición"""
+    books = []
+    for category, book_list in library.items():
+        for book in book_list:
+            book_copy = book.copy()
+            book_copy['categoria'] = category
+            books.append(book_copy)
+    return books
+
+
+def measure(fn):
+    """(resultado, bytes retenidos, pico de bytes) de fn()"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current - before, peak - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=10_000)
+    args = parser.parse_args()
+    n = args.books
+
+    # 1. Memoria por libro (Book incluye los strings que retiene)
+    library, dict_bytes, _ = measure(lambda: synthetic_library(n))
+    books, record_bytes, _ = measure(
+        lambda: tuple(Book.from_dict(i, book) for i, book in enumerate(legacy_flat(synthetic_library(n))))
+    )
+    del books
+
+    print(f"📚 {n:,} libros")
+    print(f"{'':<34}{'dict':>12}{'Book':>12}")
+    print(f"{'memoria por libro (bytes)':<34}{dict_bytes / n:>12.0f}{record_bytes / n:>12.0f}")
+
+    # 2. Asignaciones por petición al listar el catálogo
+    catalog = Catalog.from_library(library)
+    _, _, legacy_peak = measure(lambda: legacy_flat(library))
+    _, _, catalog_peak = measure(lambda: catalog.books)
+    print(f"{'asignado por listado (bytes)':<34}{legacy_peak:>12,}{catalog_peak:>12,}")
+
+    # 3. Asignaciones de recommend() completo sobre el catálogo sintético
+    from smart_recommender import SmartRecommender
+    os.chdir(tempfile.mkdtemp())
+    recommender = SmartRecommender()
+    recommender.catalog = catalog
+    recommender.recommend("calentamiento")
+    _, _, recommend_peak = measure(lambda: recommender.recommend("Estoy triste pero quiero esperanza"))
+    print(f"{'pico por recommend() (bytes)':<34}{'':>12}{recommend_peak:>12,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: memoria asignada al publicar puntajes aprendidos (un evento
+'recommend' con k libros) según el tamaño del catálogo: overlay disperso
+vs copiar el vector learned completo en cada evento
+
+Uso:
+    python benchmarks/bench_learned.py --sizes 10000 100000 1000000 --events 2000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_catalog import synthetic_library
+from book_features import LEARNED_OVERLAY_MAX
+from catalog import Catalog
+
+
+def full_copy(catalog, book_scores):
+    """Versión anterior: cada evento copiaba el vector learned completo"""
+    features = catalog.features
+    learned = features.learned.copy()
+    for book_id, value in book_scores.items():
+        learned[features.rows_by_id[book_id]] = value
+    return learned
+
+
+def run(catalog, events, publish, seed=0):
+    """Bytes asignados por evento (pico medido con tracemalloc)"""
+    rng = random.Random(seed)
+    # Las recomendaciones se concentran en los libros mejor puntuados
+    popular = catalog.features.book_ids[:5_000]
+    sizes = []
+    tracemalloc.start()
+    for i in range(events):
+        book_scores = {book_id: 0.1 * i for book_id in rng.sample(popular, 3)}
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        catalog = publish(catalog, book_scores)
+        sizes.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--events', type=int, default=2_000)
+    args = parser.parse_args()
+
+    print(f"📈 {args.events:,} eventos de 3 libros, consolidación cada {LEARNED_OVERLAY_MAX} filas")
+    print(f"{'libros':>10}{'copia (B/evento)':>20}{'overlay mediana':>18}{'overlay promedio':>18}")
+    for n in args.sizes:
+        catalog = Catalog.from_library(synthetic_library(n))
+        copied = run(catalog, args.events, lambda c, scores: (full_copy(c, scores), c)[1])
+        overlay = run(catalog, args.events, lambda c, scores: c.with_learned(scores))
+        print(f"{n:>10,}{statistics.median(copied):>20,.0f}"
+              f"{statistics.median(overlay):>18,.0f}{statistics.mean(overlay):>18,.0f}")
+
+
+if __name__ == '__main__':
+    main()
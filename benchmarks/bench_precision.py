@@ -0,0 +1,71 @@
+"""
+Benchmark: matriz de la biblioteca en float32 vs float16 vs int8
+(memoria, latencia de scoring y coincidencia top-k con float32)
+
+Uso:
+    python benchmarks/bench_precision.py
+    python benchmarks/bench_precision.py --sizes 100000 1000000 --k 10
+
+La coincidencia es |top-k reducido ∩ top-k float32| / k, promediada
+sobre las consultas; "top-1" indica si el mejor libro es el mismo.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ann import clustered_embeddings
+from vector_index import ExactIndex
+
+PRECISIONS = ('float32', 'float16', 'int8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"📐 dim={args.dim} k={args.k} consultas={args.queries}")
+    rng = np.random.default_rng(1)
+    for n in args.sizes:
+        embeddings = clustered_embeddings(n, args.dim)
+        queries = embeddings[rng.integers(0, n, args.queries)]
+        queries = queries + rng.standard_normal(queries.shape, dtype=np.float32) * (0.3 / np.sqrt(args.dim))
+
+        print(f"\n📚 {n:,} libros")
+        print(f"{'precisión':>10} | {'memoria (MB)':>12} | {'ms/consulta':>12} | "
+              f"{'top-' + str(args.k):>7} | {'top-1':>6}")
+        print("-" * 61)
+
+        truth = None
+        for precision in PRECISIONS:
+            index = ExactIndex(precision=precision)
+            index.build(embeddings, normalized=True)
+
+            results, timings = [], []
+            for query in queries:
+                start = time.perf_counter()
+                results.append(index.search(query, k=args.k)[0])
+                timings.append(time.perf_counter() - start)
+            if truth is None:
+                truth = results
+
+            agreement = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(results, truth)])
+            top1 = np.mean([a[0] == b[0] for a, b in zip(results, truth)])
+            print(f"{precision:>10} | {index.nbytes / 2**20:>12.1f} | {np.median(timings) * 1000:>12.3f} | "
+                  f"{agreement:>7.3f} | {top1:>6.3f}")
+            del index
+
+        del embeddings
+
+
+if __name__ == '__main__':
+    main()
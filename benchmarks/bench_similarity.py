@@ -0,0 +1,112 @@
+"""
+Benchmark: similitud libro a libro (bucle + cosine_similarity) vs
+matriz normalizada + argpartition (ExactIndex.search)
+
+Uso:
+    python benchmarks/bench_similarity.py
+    python benchmarks/bench_similarity.py --sizes 1000 100000 --dim 384
+
+El bucle original se mide sobre una muestra de libros y se extrapola
+linealmente al tamaño completo (a 1M libros tardaría minutos).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import ExactIndex, normalize_rows
+
+try:
+    from sklearn.metrics.pairwise import cosine_similarity
+except ImportError:
+    cosine_similarity = None
+
+
+def synthetic_embeddings(n, dim, seed=0, chunk=100_000):
+    """Embeddings aleatorios normalizados, generados por bloques"""
+    rng = np.random.default_rng(seed)
+    matrix = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk):
+        end = min(start + chunk, n)
+        matrix[start:end] = normalize_rows(rng.standard_normal((end - start, dim), dtype=np.float32))
+    return matrix
+
+
+def loop_similarity(query, embeddings):
+    """Réplica del bucle original de recommend_book"""
+    similarities = {}
+    for i, embedding in enumerate(embeddings):
+        if cosine_similarity is not None:
+            similarity = cosine_similarity([query], [embedding])[0][0]
+        else:
+            similarity = float(np.dot(query, embedding) /
+                               (np.linalg.norm(query) * np.linalg.norm(embedding)))
+        similarities[i] = similarity
+    return max(similarities, key=similarities.get)
+
+
+def bench_loop(query, embeddings, sample):
+    """Segundos por consulta del bucle original (extrapolado si hay muestra)"""
+    n = len(embeddings)
+    sample = min(sample, n)
+    start = time.perf_counter()
+    loop_similarity(query, embeddings[:sample])
+    elapsed = time.perf_counter() - start
+    return elapsed * n / sample, sample < n
+
+
+def bench_matrix(queries, index, k):
+    """Segundos por consulta de ExactIndex.search (mediana)"""
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k=k)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--loop-sample', type=int, default=5_000,
+                        help='libros medidos en el bucle original antes de extrapolar')
+    args = parser.parse_args()
+
+    backend = 'sklearn' if cosine_similarity is not None else 'numpy'
+    print(f"📐 dim={args.dim} k={args.k} bucle={backend}")
+    print(f"{'libros':>10} | {'bucle (ms)':>12} | {'matriz (ms)':>12} | {'speedup':>9}")
+    print("-" * 53)
+
+    rng = np.random.default_rng(1)
+    for n in args.sizes:
+        embeddings = synthetic_embeddings(n, args.dim)
+        index = ExactIndex()
+        index.build(embeddings, normalized=True)
+        queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+        # Verificar que ambos caminos eligen el mismo libro
+        sample = embeddings[:min(n, args.loop_sample)]
+        check = ExactIndex()
+        check.build(sample, normalized=True)
+        assert loop_similarity(queries[0], sample) == check.search(queries[0], k=1)[0][0]
+
+        loop_s, extrapolated = bench_loop(queries[0], embeddings, args.loop_sample)
+        matrix_s = bench_matrix(queries, index, args.k)
+        mark = '*' if extrapolated else ' '
+        print(f"{n:>10,} | {loop_s * 1000:>11.1f}{mark} | {matrix_s * 1000:>12.3f} | {loop_s / matrix_s:>8.0f}x")
+
+        del embeddings, index
+
+    print("\n* extrapolado linealmente desde la muestra del bucle")
+
+
+if __name__ == '__main__':
+    main()
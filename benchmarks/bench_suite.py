@@ -0,0 +1,229 @@
+"""
+Suite de benchmarks de los caminos calientes de BookMate AI
+(analyze_emotion, detect_special_context, calculate_book_score,
+recommend, save_history, process_feedback y get_feedback_stats) sobre
+catálogos sintéticos y un corpus de mensajes en español.
+
+Uso:
+    python benchmarks/bench_suite.py --output resultados.json
+    python benchmarks/bench_suite.py --sizes 100 10000 --iterations 500
+    python benchmarks/bench_suite.py --sizes 1000000 --ops recommend save_history
+
+Reporta por operación p50/p95/p99/media (ms), throughput (ops/s) y pico
+de memoria asignada (tracemalloc, en una pasada aparte para no afectar
+las latencias), más el RSS máximo del proceso por tamaño. El JSON va a
+--output (o a stdout); la tabla resumen, a stderr. No usa la red.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_catalog import synthetic_library
+from catalog import Catalog
+from catalog_store import CatalogStore
+from feedback_system import FeedbackSystem
+from session_store import Session
+from smart_recommender import SmartRecommender
+from state_store import StateStore
+
+APERTURAS = ["Hoy me siento", "Estoy", "Últimamente estoy", "Me siento un poco", "La verdad es que estoy",
+             "Desde ayer estoy", "Ando"]
+ESTADOS = ["triste", "feliz", "pensativa", "motivado", "aburrida", "ansioso", "curiosa", "romántico",
+           "confundida", "nostálgico", "vacía", "cansado de la rutina", "estresada", "sola"]
+DESEOS = ["y quiero algo que me dé esperanza", "pero no quiero ponerme peor", "y necesito llorar un rato",
+          "y busco algo intenso que me transforme", "quiero algo para reflexionar", "sorpréndeme",
+          "y quiero desconectar", "busco algo que me acompañe", "quiero salir de esto",
+          "pero sin nada muy oscuro", ""]
+TEMAS = ["con una protagonista fuerte", "sobre el duelo", "feminista", "sobre la pérdida", "", "", ""]
+
+OPERATIONS = ('analyze_emotion', 'detect_special_context', 'calculate_book_score', 'recommend',
+              'save_history', 'process_feedback', 'get_feedback_stats')
+FEEDBACK_TYPES = ['positive', 'positive', 'neutral', 'negative', 'wrong_emotion']
+
+
+def message_corpus(n, seed=0):
+    """Mensajes combinando apertura + estado + deseo + tema (con erratas de mayúsculas)"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(n):
+        parts = [rng.choice(APERTURAS), rng.choice(ESTADOS), rng.choice(DESEOS), rng.choice(TEMAS)]
+        message = " ".join(part for part in parts if part)
+        if rng.random() < 0.2:
+            message = message.capitalize() + rng.choice(['.', '...', '!', ''])
+        messages.append(message)
+    return messages
+
+
+def percentiles(timings):
+    ms = np.array(timings) * 1000
+    return {
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(ms.mean()),
+        'max_ms': float(ms.max())
+    }
+
+
+def build_system(n_books, directory):
+    """Recomendador + feedback sobre un catálogo sintético de n_books en directory"""
+    db_file = os.path.join(directory, 'bookmate.db')
+    catalog_store = CatalogStore(db_file)
+    catalog_store.bulk_load(Catalog.from_library(synthetic_library(n_books)).books)
+    store = StateStore(db_file=db_file, history_file=os.path.join(directory, 'smart_history.json'),
+                       feedback_file=os.path.join(directory, 'feedback_data.json'))
+    recommender = SmartRecommender(store=store, catalog_store=catalog_store)
+    return recommender, FeedbackSystem(store=store)
+
+
+def make_operations(recommender, feedback, corpus, rng):
+    """operación -> función(i) que ejecuta una iteración"""
+    books = recommender.get_all_books_flat()
+    sessions = [Session(f'bench-{i}') for i in range(64)]
+    recommendations = []
+
+    def analyze_emotion(i):
+        recommender.analyze_emotion(corpus[i % len(corpus)], session=sessions[i % len(sessions)])
+
+    def detect_special_context(i):
+        recommender.detect_special_context(corpus[i % len(corpus)])
+
+    def calculate_book_score(i):
+        message = corpus[i % len(corpus)]
+        recommender.calculate_book_score(books[rng.randrange(len(books))], 'triste', message,
+                                         ['esperanza'], session=sessions[i % len(sessions)])
+
+    def recommend(i):
+        session = sessions[i % len(sessions)]
+        if len(session.recommended) > 50:
+            session.reset()
+        recommendations.append(recommender.recommend(corpus[i % len(corpus)], session=session))
+        del recommendations[:-256]
+
+    def save_history(i):
+        recommender.save_history()
+
+    def process_feedback(i):
+        if not recommendations:
+            recommend(i)
+        recommendation = recommendations[i % len(recommendations)]
+        feedback.process_feedback(recommendation, FEEDBACK_TYPES[i % len(FEEDBACK_TYPES)])
+
+    def get_feedback_stats(i):
+        feedback.get_feedback_stats()
+
+    return {name: fn for name, fn in locals().items() if name in OPERATIONS}
+
+
+def run_operation(fn, iterations, memory_iterations, warmup=5):
+    """Latencias (sin tracemalloc) y pico de memoria (pasada corta con tracemalloc)"""
+    for i in range(warmup):
+        fn(i)
+
+    timings = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for i in range(memory_iterations):
+        fn(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return dict(percentiles(timings), iterations=iterations,
+                throughput_ops=iterations / total, peak_alloc_kb=peak / 1024)
+
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 if sys.platform != 'darwin' else rss / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--memory-iterations', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=500, help='tamaño del corpus')
+    parser.add_argument('--ops', nargs='+', choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='archivo JSON (por defecto, stdout)')
+    args = parser.parse_args()
+
+    corpus = message_corpus(args.messages, seed=args.seed)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'iterations': args.iterations,
+            'memory_iterations': args.memory_iterations,
+            'corpus_messages': len(corpus),
+            'seed': args.seed
+        },
+        'results': []
+    }
+
+    cwd = os.getcwd()
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+            os.chdir(tmp)
+            try:
+                # Los print de los caminos calientes se descartan (sin terminal)
+                with contextlib.redirect_stdout(devnull):
+                    start = time.perf_counter()
+                    recommender, feedback = build_system(n, tmp)
+                    setup_s = time.perf_counter() - start
+
+                    operations = make_operations(recommender, feedback, corpus, random.Random(args.seed))
+                    results = {}
+                    for name in args.ops:
+                        results[name] = run_operation(operations[name], args.iterations, args.memory_iterations)
+                    recommender.store.close()
+                    recommender.catalog_store.close()
+            finally:
+                os.chdir(cwd)
+
+        report['results'].append({
+            'books': n, 'setup_s': setup_s, 'max_rss_mb': max_rss_mb(), 'operations': results
+        })
+
+        print(f"\n📚 {n:,} libros (setup {setup_s:.1f}s, RSS máx {max_rss_mb():.0f} MB)", file=sys.stderr)
+        print(f"{'operación':>24} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'ops/s':>9} | {'pico KB':>9}",
+              file=sys.stderr)
+        for name, stats in results.items():
+            print(f"{name:>24} | {stats['p50_ms']:>8.3f} | {stats['p95_ms']:>8.3f} | {stats['p99_ms']:>8.3f} | "
+                  f"{stats['throughput_ops']:>9.0f} | {stats['peak_alloc_kb']:>9.0f}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+        print(f"\n💾 Resultados en {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
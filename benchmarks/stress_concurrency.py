@@ -0,0 +1,119 @@
+"""
+Stress: muchos hilos contra /recomendar y /api/feedback en un servidor
+WSGI con hilos. Reporta throughput, latencias, contención de locks y si
+se perdió alguna actualización.
+
+Uso:
+    python benchmarks/stress_concurrency.py --threads 16 --rounds 50
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def worker(base_url, index, rounds, latencies, errors):
+    http = requests.Session()
+    http.headers['X-Session-Id'] = f'stress-{index}'
+    for round_ in range(rounds):
+        try:
+            start = time.perf_counter()
+            response = http.post(f'{base_url}/recomendar', json={'message': f'Estoy triste {round_}'})
+            response.raise_for_status()
+            latencies['recomendar'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            response = http.post(f'{base_url}/api/feedback', json={
+                'recommendation': response.json()['recommendation'], 'feedback_type': 'positive'
+            })
+            response.raise_for_status()
+            latencies['feedback'].append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(e)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000 if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--synchronous', default='FULL', choices=['OFF', 'NORMAL', 'FULL'],
+                        help='PRAGMA synchronous de SQLite')
+    parser.add_argument('--flush-ms', type=int, default=200,
+                        help='intervalo de flush del StateStore (0 = escribir en cada petición)')
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    os.environ['BOOKMATE_SEMANTIC'] = '0'
+    os.environ['BOOKMATE_FLUSH_MS'] = str(args.flush_ms)
+    app_module = importlib.import_module('app')
+    app_module.recommender.store.conn.execute(f'PRAGMA synchronous={args.synchronous}')
+
+    from locks import lock_stats
+
+    httpd = make_server('127.0.0.1', 0, app_module.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{httpd.server_port}'
+
+    latencies = {'recomendar': [], 'feedback': []}
+    errors = []
+    threads = [threading.Thread(target=worker, args=(base_url, i, args.rounds, latencies, errors))
+               for i in range(args.threads)]
+    # Silenciar los prints por petición durante la carga
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    sys.stdout = stdout
+    httpd.shutdown()
+
+    total = args.threads * args.rounds
+    requests_done = len(latencies['recomendar']) + len(latencies['feedback'])
+    print(f"🧵 {args.threads} hilos x {args.rounds} rondas ({requests_done} peticiones en {elapsed:.2f} s)")
+    print(f"⚡ Throughput: {requests_done / elapsed:.0f} peticiones/s")
+    for endpoint, values in latencies.items():
+        print(f"   {endpoint:<12} p50 {percentile(values, 50):7.2f} ms   p95 {percentile(values, 95):7.2f} ms"
+              f"   p99 {percentile(values, 99):7.2f} ms")
+
+    print("\n🔒 Contención de locks")
+    for name, stats in lock_stats().items():
+        print(f"   {name:<14} {stats['acquisitions']:>7} adquisiciones  "
+              f"{stats['contention_ratio']:6.1%} con espera  "
+              f"espera total {stats['wait_ms']:8.2f} ms  máx {stats['max_wait_ms']:6.2f} ms")
+
+    store = app_module.recommender.store
+    store.flush()
+    interactions = store.count('interactions')
+    feedback_count = app_module.feedback_sys.feedback_data['total_feedback_count']
+    lost = (total - interactions) + (total - feedback_count)
+    print(f"\n{'✅' if not lost and not errors else '❌'} Interacciones: {interactions}/{total}  "
+          f"feedback: {feedback_count}/{total}  errores: {len(errors)}")
+
+    stats = store.get_stats()
+    print(f"💾 {stats['flushes']} flushes  máx. backlog {stats['max_backlog']} eventos  "
+          f"flush medio {stats['avg_flush_ms']:.2f} ms  máx {stats['max_flush_ms']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Catálogo compilado a arrays NumPy para SmartRecommender
+Permite puntuar todos los libros con una sola expresión vectorizada que
+reproduce exactamente calculate_book_score
+"""
+
+import copy
+
+import numpy as np
+
+NO_MATCH = -2  # código para valores que no existen en un vocabulario
+LEARNED_OVERLAY_MAX = 1024  # filas con puntaje nuevo antes de consolidar learned
+
+
+class BookFeatures:
+    """
+    Features por libro (una fila por libro, en el orden del catálogo):
+    - emotion_slots: índices de las emociones del libro, en su orden
+      original y rellenados con -1 (n x máx. emociones por libro)
+    - impacto / intensidad / categoria: códigos enteros
+    - topic_matrix: incidencia libro x tema (bool)
+    - learned: puntaje aprendido de cada libro (book_scores)
+    - learned_overlay: {fila: puntaje} más nuevos que learned; se aplican
+      al puntuar y se consolidan en un vector nuevo cada
+      LEARNED_OVERLAY_MAX filas, así que actualizar un puntaje no copia
+      el vector completo
+    """
+
+    def __init__(self, books=(), book_scores=None):
+        self.books = []
+        self.titles = []
+        self.book_ids = []
+        self.rows_by_id = {}
+
+        self.emotion_vocab = {}
+        self.impacto_vocab = {}
+        self.intensidad_vocab = {}
+        self.topic_vocab = {}
+        self.category_vocab = {}
+
+        self.emotion_slots = np.full((0, 1), -1, dtype=np.int32)
+        self.impacto = np.empty(0, dtype=np.int32)
+        self.intensidad = np.empty(0, dtype=np.int32)
+        self.category = np.empty(0, dtype=np.int32)
+        self.topic_matrix = np.zeros((0, 0), dtype=bool)
+        self.is_jane_eyre = np.empty(0, dtype=bool)
+        self.learned = np.empty(0, dtype=np.float64)
+        self.learned_overlay = {}
+
+        self.extend(books, book_scores)
+
+    def __len__(self):
+        return len(self.books)
+
+    @staticmethod
+    def _code(vocab, value):
+        return vocab.setdefault(value, len(vocab))
+
+    def extend(self, books, book_scores=None):
+        """Agrega libros (ya aplanados, con 'categoria') al final"""
+        books = list(books)
+        if not books:
+            return
+        book_scores = book_scores or {}
+        start = len(self.books)
+
+        slots = []
+        impacto = []
+        intensidad = []
+        category = []
+        topics = []
+        for row, book in enumerate(books, start):
+            book_id = f"{book['titulo']}_{book['autor']}"
+            self.books.append(book)
+            self.titles.append(book['titulo'])
+            self.book_ids.append(book_id)
+            self.rows_by_id.setdefault(book_id, []).append(row)
+
+            slots.append([self._code(self.emotion_vocab, e) for e in book.get('emociones', [])])
+            impacto.append(self._code(self.impacto_vocab, book.get('impacto')))
+            intensidad.append(self._code(self.intensidad_vocab, book.get('intensidad')))
+            category.append(self._code(self.category_vocab, book.get('categoria', '')))
+            topics.append([self._code(self.topic_vocab, t) for t in book.get('temas', [])])
+
+        # Emociones: ampliar el ancho si algún libro nuevo tiene más
+        width = max([self.emotion_slots.shape[1]] + [len(s) for s in slots])
+        new_slots = np.full((len(books), width), -1, dtype=np.int32)
+        for i, row_slots in enumerate(slots):
+            new_slots[i, :len(row_slots)] = row_slots
+        old_slots = np.full((start, width), -1, dtype=np.int32)
+        old_slots[:, :self.emotion_slots.shape[1]] = self.emotion_slots
+
+        # Temas: ampliar columnas si aparecen temas nuevos
+        n_topics = len(self.topic_vocab)
+        old_topics = np.zeros((start, n_topics), dtype=bool)
+        old_topics[:, :self.topic_matrix.shape[1]] = self.topic_matrix
+        new_topics = np.zeros((len(books), n_topics), dtype=bool)
+        for i, row_topics in enumerate(topics):
+            new_topics[i, row_topics] = True
+
+        self.emotion_slots = np.vstack([old_slots, new_slots])
+        self.topic_matrix = np.vstack([old_topics, new_topics])
+        self.impacto = np.concatenate([self.impacto, np.array(impacto, dtype=np.int32)])
+        self.intensidad = np.concatenate([self.intensidad, np.array(intensidad, dtype=np.int32)])
+        self.category = np.concatenate([self.category, np.array(category, dtype=np.int32)])
+        self.is_jane_eyre = np.concatenate([
+            self.is_jane_eyre, np.array(['Jane Eyre' in book['titulo'] for book in books], dtype=bool)
+        ])
+        self.learned = np.concatenate([
+            self.learned,
+            np.array([book_scores.get(book_id, 0) for book_id in self.book_ids[start:]], dtype=np.float64)
+        ])
+
+    def extended(self, books, book_scores=None):
+        """Copia con libros agregados; esta instancia no se modifica"""
+        clone = copy.copy(self)
+        clone.books = list(self.books)
+        clone.titles = list(self.titles)
+        clone.book_ids = list(self.book_ids)
+        clone.rows_by_id = {key: list(rows) for key, rows in self.rows_by_id.items()}
+        for vocab in ('emotion_vocab', 'impacto_vocab', 'intensidad_vocab', 'topic_vocab', 'category_vocab'):
+            setattr(clone, vocab, dict(getattr(self, vocab)))
+        clone.learned = self.learned_values()
+        clone.learned_overlay = {}
+        clone.extend(books, book_scores)
+        return clone
+
+    def with_learned(self, book_scores):
+        """
+        Copia con puntajes aprendidos nuevos ({book_id: valor}, todas las
+        filas de cada libro); esta instancia no se modifica. Los puntajes
+        van al overlay (se copia solo el overlay); al superar
+        LEARNED_OVERLAY_MAX filas se consolidan en un vector learned nuevo.
+        """
+        rows = {row: value for book_id, value in book_scores.items()
+                for row in self.rows_by_id.get(book_id, ())}
+        if not rows:
+            return self
+        clone = copy.copy(self)
+        clone.learned_overlay = {**self.learned_overlay, **rows}
+        if len(clone.learned_overlay) > LEARNED_OVERLAY_MAX:
+            clone.learned = clone.learned_values()
+            clone.learned_overlay = {}
+        return clone
+
+    def learned_values(self):
+        """Vector learned con el overlay aplicado (copia)"""
+        learned = self.learned.copy()
+        self._apply_overlay(learned, 1.0)
+        return learned
+
+    def _apply_overlay(self, values, factor):
+        if self.learned_overlay:
+            values[list(self.learned_overlay)] = np.fromiter(
+                self.learned_overlay.values(), dtype=np.float64, count=len(self.learned_overlay)) * factor
+
+    def _codes(self, vocab, values):
+        return [vocab.get(value, NO_MATCH) for value in values]
+
+    def _topic_column(self, *names):
+        """Filas que tienen alguno de los temas indicados"""
+        columns = [self.topic_vocab[name] for name in names if name in self.topic_vocab]
+        if not columns:
+            return np.zeros(len(self.books), dtype=bool)
+        return self.topic_matrix[:, columns].any(axis=1)
+
+    def score(self, emotion, preferences, session_rows, special_contexts, topics, recent_categories):
+        """
+        Puntúa todos los libros. Suma los términos en el mismo orden que
+        calculate_book_score, de modo que los floats resultan idénticos.
+        """
+        n = len(self.books)
+        score = np.zeros(n, dtype=np.float64)
+        impacto_code = self.impacto_vocab.get
+        esperanzador = impacto_code('esperanzador', NO_MATCH)
+        catartico = impacto_code('catártico', NO_MATCH)
+
+        # 1. Match emocional directo
+        emotion_code = self.emotion_vocab.get(emotion, NO_MATCH)
+        score += np.where((self.emotion_slots == emotion_code).any(axis=1), 3.0, 0.0)
+
+        # 2. Historial de preferencias (una emoción del libro por vez)
+        pref = np.array([preferences.get(e, 0) for e in self.emotion_vocab] + [0.0], dtype=np.float64)
+        for column in self.emotion_slots.T:
+            score += pref[column] * 0.5
+
+        # 3. Puntaje histórico del libro
+        learned = self.learned * 0.3
+        self._apply_overlay(learned, 0.3)
+        score += learned
+
+        # 4. Penalización por repetición
+        if session_rows:
+            penalty = np.zeros(n, dtype=np.float64)
+            penalty[[row for row in session_rows if row < n]] = 10.0
+            score -= penalty
+
+        # 5. Contextos especiales
+        if 'esperanza' in special_contexts:
+            score += np.where(self.impacto == esperanzador, 3.0,
+                              np.where(self.impacto == catartico, -2.0, 0.0))
+
+        if 'catarsis' in special_contexts:
+            score += np.where(self.impacto == catartico, 3.0,
+                              np.where(self.impacto == esperanzador, -1.0, 0.0))
+
+        if 'intenso' in special_contexts:
+            alta = self.intensidad_vocab.get('alta', NO_MATCH)
+            score += np.where(self.intensidad == alta, 2.0, 0.0)
+
+        if 'no_empeorar' in special_contexts:
+            score += np.where(self.impacto == catartico, -2.0, 0.0)
+            score += np.where(self.impacto == esperanzador, 2.0, 0.0)
+
+        # 6. Búsqueda por temas específicos
+        if 'feminista' in topics and 'protagonista' in topics:
+            score += np.where(self.is_jane_eyre, 3.0, 0.0)
+
+        if 'duelo' in topics:
+            score += np.where(self._topic_column('duelo', 'pérdida'), 2.5, 0.0)
+
+        if 'vacío' in topics:
+            score += np.where(self._topic_column('vacío', 'muerte'), 2.5, 0.0)
+
+        # 7. Diversidad
+        recent = self._codes(self.category_vocab, recent_categories)
+        score += np.where(np.isin(self.category, recent), 0.0, 1.0)
+
+        return score
@@ -0,0 +1,123 @@
+"""
+Catálogo inmutable de libros para BookMate AI
+Cada libro es un registro compacto (slots) con un id entero estable; el
+catálogo se construye una vez y cada alta crea una versión nueva que se
+publica con un solo cambio de referencia
+"""
+
+import copy
+import sys
+from dataclasses import dataclass, fields
+
+from book_features import BookFeatures
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(frozen=True, slots=True)
+class Book:
+    """Registro inmutable de un libro (acceso también como diccionario)"""
+    id: int
+    titulo: str
+    autor: str
+    descripcion: str
+    categoria: str
+    color: str = '#9B8BC4'
+    emoji: str = '📖'
+    emociones: tuple = ()
+    impacto: str = None
+    intensidad: str = None
+    temas: tuple = ()
+
+    @classmethod
+    def from_dict(cls, book_id, data, categoria=None):
+        """Crea un Book desde un diccionario (ignora claves desconocidas)"""
+        values = {field.name: data[field.name] for field in fields(cls)
+                  if field.name in data and data[field.name] is not None}
+        values['id'] = book_id
+        if categoria is not None:
+            values['categoria'] = categoria
+
+        # Valores muy repetidos (categorías, emociones, temas) se internan
+        for key in ('categoria', 'autor', 'impacto', 'intensidad', 'color', 'emoji'):
+            if key in values:
+                values[key] = _intern(values[key])
+        values['emociones'] = tuple(_intern(e) for e in values.get('emociones', ()))
+        values['temas'] = tuple(_intern(t) for t in values.get('temas', ()))
+        return cls(**values)
+
+    @property
+    def book_id(self):
+        """Clave usada por el historial y el feedback"""
+        return f"{self.titulo}_{self.autor}"
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in self.__dataclass_fields__
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+
+class Catalog:
+    """
+    Versión inmutable del catálogo:
+    - books: tupla de Book, books[i].id == i
+    - features: arrays de scoring (BookFeatures) de esta versión
+    - by_category: {categoria: tupla de ids}
+
+    Los lectores toman self.catalog una vez por petición y trabajan con
+    esa versión sin copiar nada.
+    """
+
+    def __init__(self, books, features):
+        self.books = books
+        self.features = features
+        by_category = {}
+        for book in books:
+            by_category.setdefault(book.categoria, []).append(book.id)
+        self.by_category = {categoria: tuple(ids) for categoria, ids in by_category.items()}
+
+    def __len__(self):
+        return len(self.books)
+
+    @classmethod
+    def from_books(cls, books, book_scores=None):
+        """Construye el catálogo desde una secuencia de Book (books[i].id == i)"""
+        books = tuple(books)
+        return cls(books, BookFeatures(books, book_scores))
+
+    @classmethod
+    def from_library(cls, library, book_scores=None):
+        """Construye el catálogo desde {categoria: [libros]}"""
+        books = []
+        for categoria, book_list in library.items():
+            for data in book_list:
+                books.append(Book.from_dict(len(books), data, categoria))
+        return cls.from_books(books, book_scores)
+
+    def new_book(self, data):
+        """Book con el siguiente id libre de esta versión"""
+        return data if isinstance(data, Book) else Book.from_dict(len(self.books), data)
+
+    def with_learned(self, book_scores):
+        """Nueva versión con otros puntajes aprendidos (mismos libros e índices)"""
+        features = self.features.with_learned(book_scores)
+        if features is self.features:
+            return self
+        clone = copy.copy(self)
+        clone.features = features
+        return clone
+
+    def with_book(self, data, book_scores=None):
+        """Nueva versión del catálogo con un libro más (ids existentes intactos)"""
+        book = self.new_book(data)
+        return Catalog(self.books + (book,), self.features.extended([book], book_scores))
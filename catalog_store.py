@@ -0,0 +1,147 @@
+"""
+Catálogo persistente de BookMate AI en SQLite
+Los libros agregados con /api/add-book sobreviven reinicios; al iniciar,
+el catálogo en memoria (Catalog / BookFeatures) se construye desde aquí.
+Índices B-tree sobre categoría, impacto, título y emoción: cada alta es
+O(log n) y las búsquedas por esos campos no recorren la tabla.
+"""
+
+import json
+import sqlite3
+
+from catalog import Book
+from locks import InstrumentedLock
+from metrics import IO_SECONDS, timed
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    titulo TEXT NOT NULL,
+    autor TEXT NOT NULL,
+    descripcion TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    color TEXT,
+    emoji TEXT,
+    impacto TEXT,
+    intensidad TEXT,
+    emociones TEXT NOT NULL DEFAULT '[]',
+    temas TEXT NOT NULL DEFAULT '[]'
+);
+CREATE TABLE IF NOT EXISTS book_emotions (
+    emotion TEXT NOT NULL,
+    book_id INTEGER NOT NULL REFERENCES books(id),
+    PRIMARY KEY (emotion, book_id)
+) WITHOUT ROWID;
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_books_categoria ON books(categoria);
+CREATE INDEX IF NOT EXISTS idx_books_impacto ON books(impacto);
+CREATE INDEX IF NOT EXISTS idx_books_titulo ON books(titulo);
+"""
+
+DROP_INDEXES = """
+DROP INDEX IF EXISTS idx_books_categoria;
+DROP INDEX IF EXISTS idx_books_impacto;
+DROP INDEX IF EXISTS idx_books_titulo;
+"""
+
+COLUMNS = ('id', 'titulo', 'autor', 'descripcion', 'categoria', 'color', 'emoji',
+           'impacto', 'intensidad', 'emociones', 'temas')
+
+
+class CatalogStore:
+    """
+    Libros persistidos en db_file (puede ser la misma base que StateStore).
+    Los ids son los Book.id del catálogo en memoria.
+    """
+
+    def __init__(self, db_file='bookmate.db'):
+        self.db_file = db_file
+        self.lock = InstrumentedLock('catalog_store')
+        self.conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA busy_timeout=5000')
+        self.conn.executescript(SCHEMA + INDEXES)
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM books').fetchone()[0]
+
+    @staticmethod
+    def _row(book):
+        return (book.id, book.titulo, book.autor, book.descripcion, book.categoria, book.color,
+                book.emoji, book.impacto, book.intensidad,
+                json.dumps(list(book.emociones), ensure_ascii=False),
+                json.dumps(list(book.temas), ensure_ascii=False))
+
+    def _insert(self, books):
+        self.conn.executemany(
+            f"INSERT INTO books ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            (self._row(book) for book in books)
+        )
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO book_emotions (emotion, book_id) VALUES (?, ?)',
+            ((emotion, book.id) for book in books for emotion in book.emociones)
+        )
+
+    def add(self, book):
+        """Inserta un libro (una transacción; O(log n) por índice)"""
+        with self.lock, timed(IO_SECONDS, op='catalog_add'), self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            self._insert([book])
+
+    def bulk_load(self, books, rebuild_indexes=True):
+        """
+        Carga masiva en una sola transacción. Con rebuild_indexes los
+        índices secundarios se eliminan y se reconstruyen al final (un
+        ordenamiento en lugar de n inserciones en cada B-tree).
+        """
+        books = list(books)
+        with self.lock, timed(IO_SECONDS, op='catalog_bulk_load'), self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            if rebuild_indexes:
+                for statement in DROP_INDEXES.strip().splitlines():
+                    self.conn.execute(statement)
+            self._insert(books)
+            if rebuild_indexes:
+                for statement in INDEXES.strip().splitlines():
+                    self.conn.execute(statement)
+        return len(books)
+
+    def load(self):
+        """Todos los libros como Book, ordenados por id"""
+        with self.lock, timed(IO_SECONDS, op='catalog_load'):
+            rows = self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM books ORDER BY id").fetchall()
+        books = []
+        for row in rows:
+            data = dict(zip(COLUMNS, row))
+            data['emociones'] = json.loads(data['emociones'])
+            data['temas'] = json.loads(data['temas'])
+            books.append(Book.from_dict(data['id'], data))
+        return tuple(books)
+
+    def find(self, categoria=None, emocion=None, impacto=None, titulo=None):
+        """Ids de los libros que cumplen todos los filtros (usa los índices)"""
+        clauses, params = [], []
+        if categoria is not None:
+            clauses.append('b.categoria = ?')
+            params.append(categoria)
+        if impacto is not None:
+            clauses.append('b.impacto = ?')
+            params.append(impacto)
+        if titulo is not None:
+            clauses.append('b.titulo = ?')
+            params.append(titulo)
+        query = 'SELECT b.id FROM books b'
+        if emocion is not None:
+            query += ' JOIN book_emotions e ON e.book_id = b.id AND e.emotion = ?'
+            params.insert(0, emocion)
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        with self.lock:
+            return [row[0] for row in self.conn.execute(query + ' ORDER BY b.id', params)]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,21 @@
+import importlib
+import sys
+
+import pytest
+
+# test_casos.py es un script de demostración (imprime y borra el historial
+# al importarse), no una suite de pytest
+collect_ignore = ['test_casos.py']
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """Módulo app importado en un directorio limpio, sin motor semántico"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('BOOKMATE_SEMANTIC', '0')
+    sys.modules.pop('app', None)
+    module = importlib.import_module('app')
+    yield module
+    module.semantic_ai.close()
+    module.state_store.close()
+    sys.modules.pop('app', None)
@@ -0,0 +1,239 @@
+"""
+Cache persistente de embeddings para el catálogo de BookMate AI
+Cada libro se identifica por un hash del modelo + su texto, de modo que
+solo se codifican los libros nuevos o modificados
+"""
+
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+
+from metrics import IO_SECONDS, timed
+from vector_index import IVFIndex, normalize_rows
+
+
+class EmbeddingCache:
+    """
+    Cache en disco direccionado por contenido:
+    - embeddings-<token>.npy: matriz float32 normalizada (memory-mapped)
+    - index.json: modelo, dimensión, archivo de matriz y clave de cada fila
+    - ivf-<token>.npz + ivf.json: entrenamiento del IVFIndex del catálogo
+      y la huella de las claves (en orden) y parámetros con que se entrenó
+    """
+
+    def __init__(self, model_name, cache_dir='embedding_cache'):
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.ivf_file = os.path.join(cache_dir, 'ivf.json')
+        self.keys = []
+        self.matrix = None
+        self.load()
+
+    def content_key(self, text):
+        """Clave estable para un texto bajo el modelo actual"""
+        return hashlib.sha256(f"{self.model_name}\n{text}".encode('utf-8')).hexdigest()
+
+    def content_keys(self, texts):
+        return [self.content_key(text) for text in texts]
+
+    def fingerprint(self, keys, params):
+        """Huella de un catálogo (claves en orden) y de los parámetros de su índice"""
+        digest = hashlib.sha256(f"{self.model_name}\n{params}\n".encode('utf-8'))
+        for key in keys:
+            digest.update(key.encode('ascii'))
+        return digest.hexdigest()
+
+    def load(self):
+        """Carga el índice y mapea la matriz sin leerla completa"""
+        self.keys = []
+        self.matrix = None
+        if not os.path.exists(self.index_file):
+            return
+
+        try:
+            with timed(IO_SECONDS, op='embedding_cache_load'):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                if index.get('model') != self.model_name:
+                    return
+                matrix = np.load(os.path.join(self.cache_dir, index['matrix']), mmap_mode='r')
+                if matrix.shape[0] != len(index['keys']):
+                    raise ValueError("la matriz no coincide con el índice")
+                self.keys = index['keys']
+                self.matrix = matrix
+        except Exception as e:
+            print(f"⚠️ Cache de embeddings ignorado: {e}")
+
+    def get_embeddings(self, texts, encode_fn, keys=None):
+        """
+        Retorna la matriz normalizada (len(texts) x dim) de los textos.
+
+        Solo se llama a encode_fn(lista_de_textos) para los textos que no
+        están en cache. Las entradas que ya no pertenecen al catálogo se
+        eliminan del disco. keys: content_keys(texts) si ya se calcularon.
+        """
+        keys = keys if keys is not None else self.content_keys(texts)
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # Todo en cache y en el mismo orden: se usa el mmap directamente
+        if keys == self.keys:
+            return self.matrix
+
+        row_of = {key: row for row, key in enumerate(self.keys)}
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in row_of and key not in missing:
+                missing[key] = i
+
+        # Mismo conjunto de claves en otro orden o con textos repetidos
+        # (save guarda una fila por clave única): nada que escribir
+        if not missing and len(set(keys)) == len(self.keys):
+            return np.asarray(self.matrix[[row_of[key] for key in keys]], dtype=np.float32)
+
+        new_rows = {}
+        if missing:
+            print(f"🧮 Codificando {len(missing)} libros nuevos o modificados...")
+            encoded = normalize_rows(encode_fn([texts[i] for i in missing.values()]))
+            new_rows = dict(zip(missing, encoded))
+
+        dim = self.matrix.shape[1] if self.matrix is not None else len(next(iter(new_rows.values())))
+        result = np.empty((len(texts), dim), dtype=np.float32)
+        for i, key in enumerate(keys):
+            result[i] = new_rows[key] if key in new_rows else self.matrix[row_of[key]]
+
+        self.save(keys, result)
+        return result
+
+    def add_embeddings(self, texts, encode_fn):
+        """
+        Como get_embeddings, pero para libros que se agregan al catálogo:
+        no desaloja las entradas existentes y solo codifica los textos que
+        no están en cache.
+        """
+        keys = self.content_keys(texts)
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        row_of = {key: row for row, key in enumerate(self.keys)}
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in row_of and key not in missing:
+                missing[key] = i
+        if not missing:
+            return np.asarray(self.matrix[[row_of[key] for key in keys]], dtype=np.float32)
+
+        print(f"🧮 Codificando {len(missing)} libros nuevos...")
+        encoded = normalize_rows(encode_fn([texts[i] for i in missing.values()]))
+        new_rows = dict(zip(missing, encoded))
+        result = np.stack([new_rows[key] if key in new_rows else self.matrix[row_of[key]] for key in keys])
+
+        if self.matrix is None:
+            self.save(list(missing), encoded)
+        else:
+            self.save(self.keys + list(missing), np.concatenate([self.matrix, encoded]))
+        return result
+
+    def save(self, keys, matrix):
+        """
+        Escribe una nueva matriz y luego el índice que la referencia.
+        El reemplazo del índice es el punto de confirmación: si el proceso
+        muere antes, el índice anterior sigue apuntando a su matriz.
+        """
+        # Claves únicas (libros con el mismo texto comparten fila)
+        unique = {}
+        for row, key in enumerate(keys):
+            unique.setdefault(key, row)
+        unique_keys = list(unique)
+        matrix = np.ascontiguousarray(matrix[list(unique.values())], dtype=np.float32)
+
+        try:
+            with timed(IO_SECONDS, op='embedding_cache_save'):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                matrix_name = f"embeddings-{uuid.uuid4().hex[:12]}.npy"
+                with open(os.path.join(self.cache_dir, matrix_name), 'wb') as f:
+                    np.save(f, matrix)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                index = {
+                    'model': self.model_name,
+                    'dim': int(matrix.shape[1]),
+                    'matrix': matrix_name,
+                    'keys': unique_keys
+                }
+                tmp_file = self.index_file + '.tmp'
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(index, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.index_file)
+
+                # Eliminar matrices antiguas (entradas desalojadas)
+                for name in os.listdir(self.cache_dir):
+                    if name.startswith('embeddings-') and name != matrix_name:
+                        try:
+                            os.remove(os.path.join(self.cache_dir, name))
+                        except OSError:
+                            pass
+        except Exception as e:
+            print(f"❌ Error guardando cache de embeddings: {e}")
+            return
+
+        self.keys = unique_keys
+        self.matrix = np.load(os.path.join(self.cache_dir, matrix_name), mmap_mode='r')
+        print(f"💾 Cache de embeddings: {len(unique_keys)} libros")
+
+    def load_index(self, keys, embeddings, params):
+        """
+        (IVFIndex guardado para este catálogo, filas insertadas), o
+        (None, 0) si no hay uno válido para keys y params.
+
+        Sirve también si se entrenó sobre un prefijo de keys (libros
+        agregados después al final): esas filas se insertan sin reentrenar.
+        """
+        if not os.path.exists(self.ivf_file):
+            return None, 0
+        try:
+            with timed(IO_SECONDS, op='ivf_load'):
+                with open(self.ivf_file, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                rows = saved['rows']
+                if rows > len(keys) or saved['fingerprint'] != self.fingerprint(keys[:rows], params):
+                    return None, 0
+                index = IVFIndex.load(os.path.join(self.cache_dir, saved['file']), embeddings[:rows],
+                                      normalized=True)
+                if rows < len(keys):
+                    index.add(embeddings[rows:], normalized=True)
+        except Exception as e:
+            print(f"⚠️ Índice IVF guardado ignorado: {e}")
+            return None, 0
+        return index, len(keys) - rows
+
+    def save_index(self, keys, index, params):
+        """Guarda el entrenamiento del índice (mismo esquema de confirmación que save)"""
+        try:
+            with timed(IO_SECONDS, op='ivf_save'):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                index_name = f"ivf-{uuid.uuid4().hex[:12]}.npz"
+                index.save(os.path.join(self.cache_dir, index_name))
+
+                saved = {'file': index_name, 'rows': len(keys), 'fingerprint': self.fingerprint(keys, params)}
+                tmp_file = self.ivf_file + '.tmp'
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(saved, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.ivf_file)
+
+                for name in os.listdir(self.cache_dir):
+                    if name.startswith('ivf-') and name != index_name:
+                        try:
+                            os.remove(os.path.join(self.cache_dir, name))
+                        except OSError:
+                            pass
+        except Exception as e:
+            print(f"❌ Error guardando índice IVF: {e}")
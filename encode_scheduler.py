@@ -0,0 +1,147 @@
+"""
+Micro-batching de codificaciones para el motor semántico de BookMate AI
+Las peticiones concurrentes de /recomendar encolan su texto; un único
+hilo junta lo pendiente durante unos milisegundos (o hasta max_batch
+textos), hace un solo forward en lote y entrega cada fila a su Future.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class EncodeScheduler:
+    """
+    - encode_fn(lista_de_textos) -> matriz (una fila por texto)
+    - max_batch: textos por forward como máximo
+    - max_wait_ms: ventana máxima para juntar un lote
+    - adaptive: la ventana sigue a la carga. Con lotes de 1 (sin
+      concurrencia) se cierra y no agrega latencia; cuando llegan
+      peticiones juntas vuelve a abrirse hasta max_wait_ms.
+    """
+
+    def __init__(self, encode_fn, max_batch=32, max_wait_ms=5.0, adaptive=True, clock=time.monotonic):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.adaptive = adaptive
+        self.clock = clock
+
+        self._pending = deque()   # (texto, Future, momento de encolado)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+        # Promedio móvil del tamaño de lote: decide la ventana adaptativa
+        self._avg_batch = 1.0
+        self.window = self.max_wait if not adaptive else 0.0
+
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.max_batch_seen = 0
+        self.last_batch_size = 0
+        self.max_queue_depth = 0
+        self.wait_total = 0.0
+        self.max_wait_seen = 0.0
+
+    def submit(self, text):
+        """Encola un texto; el Future entrega su embedding (1-D)"""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("EncodeScheduler cerrado")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='encode-scheduler', daemon=True)
+                self._thread.start()
+            self._pending.append((text, future, self.clock()))
+            self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+            self._cond.notify()
+        return future
+
+    def encode(self, text, timeout=None):
+        """Embedding de un texto (bloquea hasta que su lote se procese)"""
+        return self.submit(text).result(timeout=timeout)
+
+    def _next_batch(self):
+        """Espera el primer texto, luego hasta max_batch o fin de la ventana"""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return None
+
+            deadline = self._pending[0][2] + self.window
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            size = min(len(self._pending), self.max_batch)
+            return [self._pending.popleft() for _ in range(size)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._process(batch)
+
+    def _process(self, batch):
+        start = self.clock()
+        texts = [text for text, _, _ in batch]
+        try:
+            matrix = np.asarray(self.encode_fn(texts))
+            if len(matrix) != len(batch):
+                raise ValueError(f"encode_fn devolvió {len(matrix)} filas para {len(batch)} textos")
+        except Exception as e:
+            self.errors += 1
+            for _, future, _ in batch:
+                future.set_exception(e)
+        else:
+            for row, (_, future, _) in zip(matrix, batch):
+                future.set_result(row)
+
+        waits = [start - queued for _, _, queued in batch]
+        with self._cond:
+            self.batches += 1
+            self.items += len(batch)
+            self.last_batch_size = len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.wait_total += sum(waits)
+            self.max_wait_seen = max(self.max_wait_seen, max(waits))
+            if self.adaptive:
+                self._avg_batch = 0.8 * self._avg_batch + 0.2 * len(batch)
+                # Lotes de 1 -> ventana 0; desde ~2 en promedio -> ventana completa
+                self.window = self.max_wait * min(1.0, max(0.0, self._avg_batch - 1.0))
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                'queue_depth': len(self._pending),
+                'max_queue_depth': self.max_queue_depth,
+                'batches': self.batches,
+                'items': self.items,
+                'errors': self.errors,
+                'avg_batch_size': self.items / self.batches if self.batches else 0.0,
+                'last_batch_size': self.last_batch_size,
+                'max_batch_size': self.max_batch_seen,
+                'avg_wait_ms': self.wait_total / self.items * 1000 if self.items else 0.0,
+                'max_wait_ms': self.max_wait_seen * 1000,
+                'window_ms': self.window * 1000,
+                'max_batch': self.max_batch,
+                'max_window_ms': self.max_wait * 1000
+            }
+
+    def close(self):
+        """Procesa lo pendiente y detiene el hilo"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
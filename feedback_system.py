@@ -3,10 +3,9 @@ Sistema de Retroalimentación Inteligente para BookMate AI
 Permite que el usuario califique recomendaciones y el sistema aprenda de ello
 """
 
-import json
-import os
 from datetime import datetime
-from collections import defaultdict
+from metrics import STAGE_SECONDS, timed
+from state_store import StateStore
 
 class FeedbackSystem:
     """
@@ -16,48 +15,11 @@ class FeedbackSystem:
     3. Explica cómo usa el feedback en futuras recomendaciones
     """
     
-    def __init__(self, history_file='smart_history.json'):
-        self.history_file = history_file
-        self.feedback_file = 'feedback_data.json'
-        self.load_feedback_data()
-    
-    def load_feedback_data(self):
-        """Carga datos de feedback persistentes"""
-        if os.path.exists(self.feedback_file):
-            try:
-                with open(self.feedback_file, 'r', encoding='utf-8') as f:
-                    self.feedback_data = json.load(f)
-            except:
-                self.feedback_data = self.init_feedback_data()
-        else:
-            self.feedback_data = self.init_feedback_data()
-    
-    def init_feedback_data(self):
-        """Inicializa estructura de feedback"""
-        return {
-            'book_ratings': {},  # ❌ CAMBIAR de defaultdict a dict normal
-            'emotion_accuracy': {},
-            'context_effectiveness': {},
-            'total_feedback_count': 0,
-            'learning_adjustments': []
-        }
-    
-    def save_feedback_data(self):
-        """Guarda feedback de manera persistente"""
-        # Convertir defaultdicts a dicts normales
-        save_data = {
-            'book_ratings': dict(self.feedback_data['book_ratings']),
-            'emotion_accuracy': dict(self.feedback_data['emotion_accuracy']),
-            'context_effectiveness': dict(self.feedback_data['context_effectiveness']),
-            'total_feedback_count': self.feedback_data['total_feedback_count'],
-            'learning_adjustments': self.feedback_data['learning_adjustments'][-50:]  # Últimos 50
-        }
-        
-        try:
-            with open(self.feedback_file, 'w', encoding='utf-8') as f:
-                json.dump(save_data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"❌ Error guardando feedback: {e}")
+    def __init__(self, store=None):
+        # Compartir el StateStore del recomendador: los ajustes se aplican
+        # a su estado en memoria y se guardan en la misma base
+        self.store = store or StateStore()
+        self.feedback_data = self.store.feedback
     
     def process_feedback(self, recommendation_data, feedback_type, user_comment=None):
         """
@@ -83,55 +45,81 @@ class FeedbackSystem:
         emotion = analisis['emotion']
         special_contexts = analisis.get('special_contexts', [])
         
+        with timed(STAGE_SECONDS, stage='feedback'):
+            event = self.build_feedback_event(
+                adjustments, libro, book_id, emotion, special_contexts, feedback_type, user_comment
+            )
+        
+        # 5. GUARDAR: historial y feedback como un solo evento (se escribe
+        # en segundo plano, en el próximo flush del StateStore)
+        with timed(STAGE_SECONDS, stage='persistence'):
+            self.store.record(event)
+        print("✅ Feedback registrado")
+        
+        # 6. GENERAR EXPLICACIÓN
+        explanation = self.generate_learning_explanation(adjustments, feedback_type, libro['titulo'])
+        adjustments['explanation'] = explanation
+        
+        return adjustments
+    
+    def build_feedback_event(self, adjustments, libro, book_id, emotion, special_contexts, feedback_type, user_comment):
+        """Evento del StateStore con todos los ajustes de un feedback"""
+        event = {
+            'type': 'feedback',
+            'preferences': [],
+            'book_scores': [],
+            'book_ratings': [],
+            'emotion_accuracy': [],
+            'context_effectiveness': []
+        }
+        
         # 1. AJUSTAR SCORE DEL LIBRO
         if feedback_type == 'positive':
             adjustment = +0.5
-            if book_id not in self.feedback_data['book_ratings']:
-                self.feedback_data['book_ratings'][book_id] = {'positive': 0, 'negative': 0, 'neutral': 0}
-            self.feedback_data['book_ratings'][book_id]['positive'] += 1
+            event['book_ratings'].append([book_id, 'positive'])
+            event['preferences'].append([emotion, 0.3])
             adjustments['adjustments_made'].append(
                 f"📈 Score de '{libro['titulo']}' aumentado +{adjustment}"
             )
         elif feedback_type == 'negative':
             adjustment = -0.3
-            self.feedback_data['book_ratings'][book_id]['negative'] += 1
+            event['book_ratings'].append([book_id, 'negative'])
+            event['preferences'].append([emotion, -0.2])
             adjustments['adjustments_made'].append(
                 f"📉 Score de '{libro['titulo']}' reducido {adjustment}"
             )
         else:  # neutral
             adjustment = 0.0
-            self.feedback_data['book_ratings'][book_id]['neutral'] += 1
+            event['book_ratings'].append([book_id, 'neutral'])
+        event['book_scores'].append([book_id, adjustment])
         
         # 2. AJUSTAR PRECISIÓN EMOCIONAL
         if feedback_type == 'wrong_emotion':
-            self.feedback_data['emotion_accuracy'][emotion]['incorrect'] += 1
+            event['emotion_accuracy'].append([emotion, 'incorrect'])
             adjustments['adjustments_made'].append(
                 f"⚠️ La emoción '{emotion}' no fue precisa. Necesito mejorar su detección."
             )
         else:
-            self.feedback_data['emotion_accuracy'][emotion]['correct'] += 1
+            event['emotion_accuracy'].append([emotion, 'correct'])
             adjustments['adjustments_made'].append(
                 f"✅ Emoción '{emotion}' correctamente identificada"
             )
-
-
         
         # 3. AJUSTAR EFECTIVIDAD DE CONTEXTOS
         for context in special_contexts:
             if feedback_type == 'positive':
-                self.feedback_data['context_effectiveness'][context]['helpful'] += 1
+                event['context_effectiveness'].append([context, 'helpful'])
                 adjustments['adjustments_made'].append(
                     f"🎯 Contexto '{context}' fue efectivo para tu recomendación"
                 )
             elif feedback_type == 'negative':
-                self.feedback_data['context_effectiveness'][context]['not_helpful'] += 1
+                event['context_effectiveness'].append([context, 'not_helpful'])
                 adjustments['adjustments_made'].append(
                     f"⚠️ Contexto '{context}' no fue útil, ajustando su peso"
                 )
         
         # 4. REGISTRAR AJUSTE EN HISTORIAL
-        self.feedback_data['total_feedback_count'] += 1
-        adjustment_record = {
+        event['adjustment'] = {
             'timestamp': datetime.now().isoformat(),
             'book': libro['titulo'],
             'emotion': emotion,
@@ -139,51 +127,7 @@ class FeedbackSystem:
             'adjustment_value': adjustment,
             'user_comment': user_comment
         }
-        self.feedback_data['learning_adjustments'].append(adjustment_record)
-        
-        # 5. ACTUALIZAR SCORES EN smart_history.json
-        self.update_history_scores(book_id, adjustment, emotion, feedback_type)
-        
-        # 6. GUARDAR
-        self.save_feedback_data()
-        
-        # 7. GENERAR EXPLICACIÓN
-        explanation = self.generate_learning_explanation(adjustments, feedback_type, libro['titulo'])
-        adjustments['explanation'] = explanation
-        
-        return adjustments
-    
-    def update_history_scores(self, book_id, adjustment, emotion, feedback_type):
-        """Actualiza scores en smart_history.json según feedback"""
-        try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    history = json.load(f)
-                
-                # Ajustar score del libro
-                if 'book_scores' not in history:
-                    history['book_scores'] = {}
-                
-                current_score = history['book_scores'].get(book_id, 0.0)
-                history['book_scores'][book_id] = current_score + adjustment
-                
-                # Ajustar preferencias emocionales
-                if 'preferences' not in history:
-                    history['preferences'] = {}
-                
-                if feedback_type == 'positive':
-                    history['preferences'][emotion] = history['preferences'].get(emotion, 0.0) + 0.3
-                elif feedback_type == 'negative':
-                    history['preferences'][emotion] = history['preferences'].get(emotion, 0.0) - 0.2
-                
-                # Guardar
-                with open(self.history_file, 'w', encoding='utf-8') as f:
-                    json.dump(history, f, ensure_ascii=False, indent=2)
-                
-                print(f"✅ Scores actualizados en {self.history_file}")
-            
-        except Exception as e:
-            print(f"❌ Error actualizando scores: {e}")
+        return event
     
     def generate_learning_explanation(self, adjustments, feedback_type, book_title):
         """Genera explicación clara de cómo el sistema aprendió"""
@@ -221,12 +165,12 @@ class FeedbackSystem:
     
     def get_feedback_stats(self):
         """Retorna estadísticas de feedback para mostrar al usuario"""
-        
-        total = self.feedback_data['total_feedback_count']
+        feedback_data = self.store.feedback_snapshot()
+        total = feedback_data['total_feedback_count']
         
         # Calcular libros mejor y peor calificados
         book_rankings = []
-        for book_id, ratings in self.feedback_data['book_ratings'].items():
+        for book_id, ratings in feedback_data['book_ratings'].items():
             score = ratings['positive'] - ratings['negative']
             total_ratings = ratings['positive'] + ratings['negative'] + ratings['neutral']
             book_rankings.append({
@@ -241,7 +185,7 @@ class FeedbackSystem:
         
         # Precisión emocional
         emotion_accuracy = []
-        for emotion, accuracy in self.feedback_data['emotion_accuracy'].items():
+        for emotion, accuracy in feedback_data['emotion_accuracy'].items():
             total_checks = accuracy['correct'] + accuracy['incorrect']
             if total_checks > 0:
                 precision = (accuracy['correct'] / total_checks) * 100
@@ -254,7 +198,7 @@ class FeedbackSystem:
         emotion_accuracy.sort(key=lambda x: x['precision'], reverse=True)
         
         # Últimos ajustes
-        recent_adjustments = self.feedback_data['learning_adjustments'][-5:]
+        recent_adjustments = feedback_data['learning_adjustments'][-5:]
         
         return {
             'total_feedback': total,
@@ -262,21 +206,17 @@ class FeedbackSystem:
             'worst_books': book_rankings[-5:] if len(book_rankings) > 5 else [],
             'emotion_accuracy': emotion_accuracy,
             'recent_adjustments': recent_adjustments,
-            'context_effectiveness': dict(self.feedback_data['context_effectiveness'])
+            'context_effectiveness': feedback_data['context_effectiveness']
         }
     
     def get_confidence_explanation(self, libro_titulo):
         """Explica por qué el sistema tiene cierta confianza en un libro"""
-        book_id = None
-        for bid in self.feedback_data['book_ratings'].keys():
-            if libro_titulo in bid:
-                book_id = bid
-                break
+        book_ratings = self.store.feedback_snapshot()['book_ratings']
+        ratings = next((r for bid, r in book_ratings.items() if libro_titulo in bid), None)
         
-        if not book_id:
+        if ratings is None:
             return "Este es un libro nuevo para el sistema. No tengo feedback previo."
         
-        ratings = self.feedback_data['book_ratings'][book_id]
         total = ratings['positive'] + ratings['negative'] + ratings['neutral']
         
         if total == 0:
@@ -0,0 +1,26 @@
+"""
+Utilidades de archivos compartidas por los módulos de BookMate AI
+"""
+
+import json
+import os
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """Escribe JSON en un archivo temporal, fsync y os.replace"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    # Persistir también la entrada del directorio (no disponible en Windows)
+    try:
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
@@ -0,0 +1,81 @@
+"""
+Lector del historial JSON anterior a StateStore (snapshot + log JSONL)
+Solo se usa para migrar instalaciones anteriores (StateStore.migrate_json):
+se carga el snapshot y se reproducen los eventos del log con
+seq > last_seq. No escribe nada salvo apartar un snapshot dañado.
+"""
+
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+
+
+def empty_history():
+    return {
+        'interactions': [],
+        'preferences': defaultdict(float),
+        'book_scores': defaultdict(float)
+    }
+
+
+def _apply(history, event, max_interactions):
+    if event.get('interaction'):
+        history['interactions'].append(event['interaction'])
+        del history['interactions'][:-max_interactions]
+    for emotion, delta in event.get('preferences', []):
+        history['preferences'][emotion] += delta
+    for book_id, delta in event.get('book_scores', []):
+        history['book_scores'][book_id] += delta
+
+
+def load_history(snapshot_file='smart_history.json', log_file=None, max_interactions=100):
+    """
+    Historial heredado: snapshot_file ('last_seq' = último evento incluido)
+    más los eventos posteriores de log_file (por defecto <snapshot>.log.jsonl).
+
+    Eventos del log:
+        {'seq': 12, 'type': 'recommend' | 'feedback',
+         'interaction': {...},                       # opcional
+         'preferences': [[emocion, delta], ...],     # en orden de aplicación
+         'book_scores': [[book_id, delta], ...]}
+    """
+    log_file = log_file or f"{os.path.splitext(snapshot_file)[0]}.log.jsonl"
+    history = empty_history()
+    last_seq = 0
+
+    if os.path.exists(snapshot_file):
+        try:
+            with open(snapshot_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            history['interactions'] = data.get('interactions', [])
+            history['preferences'].update(data.get('preferences', {}))
+            history['book_scores'].update(data.get('book_scores', {}))
+            last_seq = data.get('last_seq', 0)
+        except Exception as e:
+            # No descartar en silencio: conservar el archivo dañado
+            corrupt_file = f"{snapshot_file}.corrupt-{datetime.now():%Y%m%d%H%M%S}"
+            os.replace(snapshot_file, corrupt_file)
+            print(f"❌ Snapshot de historial dañado ({e}); movido a {corrupt_file}")
+
+    replayed = 0
+    if os.path.exists(log_file):
+        with open(log_file, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        for number, line in enumerate(lines, 1):
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # Una última línea incompleta es un corte a mitad de escritura
+                if number < len(lines):
+                    print(f"⚠️ Evento ilegible en {log_file}:{number}, se omite")
+                continue
+            if event.get('seq', 0) <= last_seq:
+                continue
+            _apply(history, event, max_interactions)
+            last_seq = event['seq']
+            replayed += 1
+
+    if replayed:
+        print(f"🔁 {replayed} eventos reproducidos desde {log_file}")
+    return history
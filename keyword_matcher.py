@@ -0,0 +1,104 @@
+"""
+Matcher multi-patrón para el análisis por palabras clave de BookMate AI
+Compila todas las palabras clave (emociones, contextos, temas...) en una
+sola expresión regular con forma de trie y recorre el mensaje una vez
+"""
+
+import re
+from collections import defaultdict, namedtuple
+
+# Una coincidencia: categoría ('emotion', 'context'...), etiqueta
+# ('triste', 'esperanza'...), palabra clave y posición en el texto
+Hit = namedtuple('Hit', ['category', 'label', 'keyword', 'start'])
+
+
+def _trie_pattern(node):
+    """
+    Convierte un trie {caracter: subtrie, '': fin, '*': fin de raíz} en
+    regex (rama más larga primero; una raíz acepta el resto de la palabra)
+    """
+    branches = [re.escape(char) + _trie_pattern(child)
+                for char, child in sorted(node.items()) if char not in ('', '*')]
+    if '*' in node:
+        branches.append(r'\w*')
+    if not branches:
+        return ''
+    if len(branches) == 1 and '' not in node:
+        return branches[0]
+    pattern = '(?:' + '|'.join(branches) + ')'
+    return pattern + '?' if '' in node and '*' not in node else pattern
+
+
+class KeywordMatcher:
+    """
+    Busca todas las palabras clave registradas en una sola pasada:
+    - respeta límites de palabra (acentos incluidos)
+    - una palabra clave puede pertenecer a varias categorías/etiquetas
+    - las frases que contienen otras palabras clave ('sin sentido' ->
+      'sin') reportan ambas
+    - una clave terminada en '*' es una raíz: 'melanc*' coincide con
+      cualquier palabra que empiece así ('melancólicos', 'melancolía')
+
+    El costo depende del largo del mensaje, no de la cantidad de claves.
+    """
+
+    def __init__(self):
+        self.tags = defaultdict(set)  # palabra clave -> {(categoría, etiqueta)}
+        self.regex = None
+        self.prefixes = {}
+        self.stems = []
+
+    def add(self, category, label, keywords):
+        """Registra palabras clave para una categoría y etiqueta"""
+        for keyword in keywords:
+            self.tags[keyword.lower()].add((category, label))
+        self.regex = None
+
+    def add_groups(self, category, groups):
+        """Registra un diccionario {etiqueta: [palabras clave]}"""
+        for label, keywords in groups.items():
+            self.add(category, label, keywords)
+
+    def compile(self):
+        """Construye la regex combinada (se llama solo en el primer uso)"""
+        trie = {}
+        for keyword in self.tags:
+            stem = keyword[:-1] if keyword.endswith('*') else keyword
+            node = trie
+            for char in stem:
+                node = node.setdefault(char, {})
+            node['*' if stem != keyword else ''] = True
+
+        # La regex devuelve la palabra más larga en cada posición; las claves
+        # más cortas que empiezan en el mismo punto se derivan de ella
+        self.prefixes = {
+            keyword: [keyword[:i] for i, char in enumerate(keyword)
+                      if not char.isalnum() and keyword[:i] in self.tags]
+            for keyword in self.tags if not keyword.endswith('*')
+        }
+        self.stems = sorted(keyword[:-1] for keyword in self.tags if keyword.endswith('*'))
+        # Lookahead para encontrar coincidencias solapadas en cada posición
+        self.regex = re.compile(r'(?<!\w)(?=(' + _trie_pattern(trie) + r')(?!\w))')
+
+    def find(self, text):
+        """Lista de Hit en orden de aparición"""
+        if self.regex is None:
+            self.compile()
+
+        hits = []
+        for match in self.regex.finditer(text.lower()):
+            word = match.group(1)
+            start = match.start()
+            found_keywords = [word] + self.prefixes[word] if word in self.prefixes else []
+            found_keywords += [stem + '*' for stem in self.stems if word.startswith(stem)]
+            for found in found_keywords:
+                for category, label in sorted(self.tags[found]):
+                    hits.append(Hit(category, label, found, start))
+        return hits
+
+    def match(self, text):
+        """Coincidencias agrupadas: {categoría: {etiqueta: [Hit, ...]}}"""
+        grouped = defaultdict(lambda: defaultdict(list))
+        for hit in self.find(text):
+            grouped[hit.category][hit.label].append(hit)
+        return grouped
@@ -0,0 +1,74 @@
+"""
+Locks instrumentados para el estado compartido de BookMate AI
+
+Modelo de concurrencia:
+- Escrituras (historial, feedback, altas de libros): cada estructura tiene
+  su propio lock; los escritores lo toman solo mientras mutan y persisten
+- Lecturas (recommend): sin locks. Toman la referencia inmutable del
+  catálogo y leen valores escalares del historial (operaciones atómicas)
+
+Orden de adquisición para evitar deadlocks: state -> catalog (el lock
+'state' del StateStore se mantiene tomado mientras sus suscriptores
+publican una nueva versión del catálogo)
+"""
+
+import threading
+import time
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class InstrumentedLock:
+    """
+    Lock (o RLock) que cuenta adquisiciones, cuántas tuvieron que esperar
+    y el tiempo total de espera. Se usa con `with`.
+    """
+
+    def __init__(self, name, reentrant=False):
+        self.name = name
+        self._lock = threading.RLock() if reentrant else threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+        with _registry_lock:
+            _registry[name] = self
+
+    def acquire(self):
+        if not self._lock.acquire(blocking=False):
+            start = time.perf_counter()
+            self._lock.acquire()
+            waited = time.perf_counter() - start
+            # Los contadores se actualizan ya con el lock tomado
+            self.contended += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        self.acquisitions += 1
+        return True
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def get_stats(self):
+        return {
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'contention_ratio': self.contended / self.acquisitions if self.acquisitions else 0.0,
+            'wait_ms': self.wait_seconds * 1000,
+            'max_wait_ms': self.max_wait_seconds * 1000
+        }
+
+
+def lock_stats():
+    """Estadísticas de todos los locks instrumentados, por nombre"""
+    with _registry_lock:
+        locks = list(_registry.values())
+    return {lock.name: lock.get_stats() for lock in locks}
@@ -0,0 +1,135 @@
+"""
+Cache LRU acotado con expiración por inactividad (TTL)
+Thread-safe; usado para sesiones y resultados cacheados de BookMate AI
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Diccionario acotado:
+    - maxsize: al superarlo se desaloja la entrada usada hace más tiempo
+    - ttl: segundos sin acceso tras los cuales una entrada expira
+      (None = sin expiración)
+    - on_evict(key, value): callback opcional al desalojar o expirar
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, on_evict=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.clock = clock
+
+        self._data = OrderedDict()  # key -> (value, último acceso)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _expired(self, accessed, now):
+        return self.ttl is not None and now - accessed > self.ttl
+
+    def _purge(self, now):
+        """Quita expiradas desde el extremo menos reciente y aplica maxsize"""
+        evicted = []
+        while self._data:
+            key, (value, accessed) = next(iter(self._data.items()))
+            if self._expired(accessed, now):
+                self.expirations += 1
+            elif len(self._data) > self.maxsize:
+                self.evictions += 1
+            else:
+                break
+            del self._data[key]
+            evicted.append((key, value))
+        return evicted
+
+    def _notify(self, evicted):
+        if self.on_evict:
+            for key, value in evicted:
+                self.on_evict(key, value)
+
+    def get(self, key, default=None, touch=True):
+        """Valor de key (None/default si no existe o expiró)"""
+        now = self.clock()
+        evicted = []
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self._expired(entry[1], now):
+                del self._data[key]
+                self.expirations += 1
+                evicted.append((key, entry[0]))
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                value = default
+            else:
+                self.hits += 1
+                value = entry[0]
+                if touch:
+                    self._data[key] = (value, now)
+                    self._data.move_to_end(key)
+        self._notify(evicted)
+        return value
+
+    def set(self, key, value):
+        now = self.clock()
+        with self._lock:
+            self._data[key] = (value, now)
+            self._data.move_to_end(key)
+            evicted = self._purge(now)
+        self._notify(evicted)
+
+    def get_or_create(self, key, factory):
+        """Valor de key; si no existe lo crea con factory() de forma atómica"""
+        now = self.clock()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and not self._expired(entry[1], now):
+                self.hits += 1
+                value = entry[0]
+            else:
+                self.misses += 1
+                value = factory()
+            self._data[key] = (value, now)
+            self._data.move_to_end(key)
+            evicted = self._purge(now)
+        self._notify(evicted)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def purge_expired(self):
+        """Elimina las entradas expiradas (también ocurre en cada set)"""
+        with self._lock:
+            evicted = self._purge(self.clock())
+        self._notify(evicted)
+        return len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
@@ -0,0 +1,205 @@
+"""
+Métricas de BookMate AI en formato de texto de Prometheus
+Contadores e histogramas en memoria (por proceso). Cada observación es
+una búsqueda binaria en los buckets y unas sumas bajo un lock, así que
+se pueden medir etapas de microsegundos sin costo apreciable.
+
+Uso:
+    with timed(STAGE_SECONDS, stage='scoring'):
+        ...
+    HTTP_REQUESTS.inc(endpoint='recomendar', method='POST', status='200')
+    render()  # texto para /api/metrics
+
+Las métricas se registran en REGISTRY (el que expone /api/metrics); los
+tests crean su propio Registry para no aparecer ahí.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Buckets en segundos: de 50 µs (etapas en memoria) a 10 s (red, flush)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Conjunto de métricas que se exponen juntas (por nombre)"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    """Base: nombre, ayuda, nombres de etiquetas y registro (REGISTRY por defecto)"""
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    """Contador monótono por combinación de etiquetas"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [f"{self.name}{_format_labels(key)} {_format_value(value)}"
+                                for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    """Histograma acumulativo (buckets le, _sum y _count) por etiquetas"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels):
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def render(self):
+        with self._lock:
+            values = {key: (list(counts), total, n) for key, (counts, total, n) in self._values.items()}
+        lines = self.header()
+        for key, (counts, total, n) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(key + (('le', _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {n}")
+        return lines
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observa en histogram los segundos del bloque (reloj monótono), aunque falle"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def gauge_lines(name, help, samples):
+    """
+    Líneas de un gauge calculado al momento de exponer las métricas.
+    samples: lista de (etiquetas dict, valor); los valores no numéricos
+    (None, textos) se omiten.
+    """
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        if isinstance(value, bool):
+            value = int(value)
+        if not isinstance(value, (int, float)):
+            continue
+        lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+    return lines
+
+
+def stats_gauges(prefix, help, stats, **labels):
+    """Un gauge por clave numérica de un dict de get_stats() (prefix_clave)"""
+    lines = []
+    for key, value in stats.items():
+        lines += gauge_lines(f"{prefix}_{key}", f"{help}: {key}", [(labels, value)])
+    return lines
+
+
+def render(extra_lines=(), registry=REGISTRY):
+    """Todas las métricas del registro (+ gauges extra) en formato Prometheus"""
+    lines = []
+    for metric in registry.metrics():
+        lines += metric.render()
+    lines += list(extra_lines)
+    return "\n".join(lines) + "\n"
+
+
+# Métricas compartidas por los módulos de BookMate AI
+STAGE_SECONDS = Histogram(
+    'bookmate_stage_seconds', 'Duración de cada etapa del pipeline de recomendación y feedback', ['stage'])
+IO_SECONDS = Histogram(
+    'bookmate_io_seconds', 'Duración de operaciones de archivo y SQLite', ['op'])
+OUTBOUND_SECONDS = Histogram(
+    'bookmate_outbound_seconds', 'Duración de llamadas a servicios externos', ['service'])
+OUTBOUND_ERRORS = Counter(
+    'bookmate_outbound_errors_total', 'Llamadas a servicios externos que fallaron', ['service'])
+HTTP_SECONDS = Histogram(
+    'bookmate_http_request_seconds', 'Duración de las peticiones HTTP por endpoint', ['endpoint', 'method'])
+HTTP_REQUESTS = Counter(
+    'bookmate_http_requests_total', 'Peticiones HTTP por endpoint, método y status', ['endpoint', 'method', 'status'])
+HTTP_ERRORS = Counter(
+    'bookmate_http_errors_total',
+    'Errores por endpoint: respuestas 5xx, fallos a mitad de un stream y fallos externos absorbidos',
+    ['endpoint'])
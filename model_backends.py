@@ -0,0 +1,56 @@
+"""
+Backends de inferencia en CPU para el encoder de BookMate AI
+- fp32: SentenceTransformer tal cual
+- int8: cuantización dinámica de las capas Linear (pesos int8,
+  activaciones cuantizadas en cada llamada); sin datos de calibración
+
+torch y sentence-transformers se importan al cargar, no al importar
+este módulo.
+"""
+
+BACKENDS = ('fp32', 'int8')
+
+
+def configure_threads(threads=None):
+    """Hilos intra-op de torch (None = lo que decida torch)"""
+    import torch
+
+    if threads:
+        torch.set_num_threads(int(threads))
+    return torch.get_num_threads()
+
+
+def quantize_dynamic_int8(model):
+    """Copia del modelo con las capas Linear cuantizadas dinámicamente a int8"""
+    import torch
+
+    try:
+        from torch.ao.quantization import quantize_dynamic
+    except ImportError:  # torch < 1.10
+        from torch.quantization import quantize_dynamic
+
+    model.eval()
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_sentence_model(model_name, backend='fp32', threads=None):
+    """
+    Carga un SentenceTransformer en CPU con el backend pedido.
+    model_name puede ser un nombre del hub o un directorio local.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+
+    from sentence_transformers import SentenceTransformer
+
+    threads = configure_threads(threads)
+    model = SentenceTransformer(model_name, device='cpu')
+    if backend == 'int8':
+        model = quantize_dynamic_int8(model)
+    print(f"⚙️ Backend {backend} ({threads} hilos)")
+    return model
+
+
+def cache_key(model_name, backend='fp32'):
+    """Nombre para el cache de embeddings: int8 produce vectores distintos"""
+    return model_name if backend == 'fp32' else f"{model_name}+{backend}"
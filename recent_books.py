@@ -0,0 +1,190 @@
+"""
+Libros recientes desde Google Books para /api/libros-recientes
+Las consultas salen en paralelo sobre una sesión HTTP con pool de
+conexiones y un timeout total; el resultado se cachea con TTL y, ya
+vencido, se sirve igual (stale-while-revalidate) mientras un único
+refresco corre en segundo plano. Los fallos también se recuerdan por
+unos segundos para no esperar el timeout en cada petición.
+
+La cache es del proceso (compartida por sus hilos): con varios workers
+cada uno consulta Google Books por su cuenta, a lo sumo una vez por ttl.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from lru_cache import LRUCache
+from metrics import OUTBOUND_ERRORS, OUTBOUND_SECONDS, timed
+
+GOOGLE_BOOKS_URL = 'https://www.googleapis.com/books/v1/volumes'
+
+
+def parse_volume(item, year):
+    """Libro en el formato de /api/libros-recientes desde un item de Google Books"""
+    volume_info = item.get('volumeInfo', {})
+    titulo = volume_info.get('title', '')
+    if not titulo:
+        return None
+
+    autores = volume_info.get('authors', ['Autor desconocido'])
+    descripcion = volume_info.get('description', 'Sin descripción disponible')
+    if len(descripcion) > 150:
+        descripcion = descripcion[:147] + '...'
+
+    fecha = volume_info.get('publishedDate', str(year))
+    rating = volume_info.get('averageRating', 0)
+    rating_count = volume_info.get('ratingsCount', 0)
+
+    fuente = "Google Books"
+    if rating > 0:
+        fuente = f"⭐ {rating}/5 ({rating_count} reseñas)"
+
+    return {
+        "titulo": titulo,
+        "autor": ', '.join(autores[:2]),
+        "anio": fecha[:4] if fecha else str(year),
+        "descripcion": descripcion,
+        "fuente": fuente
+    }
+
+
+class RecentBooksFetcher:
+    """
+    - timeout: segundos para la llamada completa (todas las consultas)
+    - ttl: segundos que un resultado se considera fresco; después se
+      sirve vencido y se refresca en segundo plano
+    - Fallos de cache concurrentes esperan a una sola descarga
+    - error_ttl: segundos que se recuerda una descarga fallida; mientras
+      tanto se responde el error (o lo vencido) sin volver a consultar
+    """
+
+    def __init__(self, base_url=GOOGLE_BOOKS_URL, ttl=10 * 60, timeout=3.0,
+                 max_results=10, clock=time.monotonic, error_ttl=30):
+        self.base_url = base_url
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.max_results = max_results
+        self.clock = clock
+
+        self.http = requests.Session()
+        self.http.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        self.http.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        self.executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix='libros-recientes')
+
+        self.cache = LRUCache(maxsize=16)   # año -> (libros, momento de descarga)
+        self._inflight = {}                 # año -> Future de la descarga en curso
+        self._failures = {}                 # año -> (error, momento del fallo)
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.stale_served = 0
+        self.errors_served = 0
+
+    @staticmethod
+    def queries(year):
+        return [
+            f"bestseller books {year}",
+            f"most popular books {year}",
+            f"award winning books {year}"
+        ]
+
+    def _query(self, query):
+        try:
+            with timed(OUTBOUND_SECONDS, service='google_books'):
+                response = self.http.get(
+                    self.base_url,
+                    params={'q': query, 'orderBy': 'relevance', 'maxResults': self.max_results},
+                    timeout=self.timeout
+                )
+                response.raise_for_status()
+                return response.json().get('items', [])
+        except Exception:
+            OUTBOUND_ERRORS.inc(service='google_books')
+            raise
+
+    def fetch(self, year):
+        """Consulta todo en paralelo; lo que no llegue dentro del timeout se descarta"""
+        self.fetches += 1
+        queries = self.queries(year)
+        futures = [self.executor.submit(self._query, query) for query in queries]
+        done, _ = wait(futures, timeout=self.timeout)
+
+        books = []
+        seen = set()
+        for query, future in zip(queries, futures):
+            if future not in done:
+                print(f"Timeout buscando con query '{query}'")
+                continue
+            if future.exception() is not None:
+                print(f"Error buscando con query '{query}': {future.exception()}")
+                continue
+            for item in future.result():
+                book = parse_volume(item, year)
+                if book and book['titulo'] not in seen:
+                    seen.add(book['titulo'])
+                    books.append(book)
+
+        if not any(future in done and future.exception() is None for future in futures):
+            raise RuntimeError("Google Books no respondió")
+        return books
+
+    def _refresh(self, year, future):
+        """Descarga y guarda en cache; el resultado (o error) va a future"""
+        try:
+            books = self.fetch(year)
+            self.cache.set(year, (books, self.clock()))
+            self._failures.pop(year, None)
+            future.set_result(books)
+        except Exception as e:
+            self._failures[year] = (e, self.clock())
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(year, None)
+
+    def _start_refresh(self, year):
+        """Future de la descarga de year (reutiliza la que esté en curso)"""
+        with self._lock:
+            future = self._inflight.get(year)
+            if future is not None:
+                return future, False
+            future = self._inflight[year] = Future()
+        return future, True
+
+    def _recent_failure(self, year):
+        """Error de la última descarga de year si falló hace menos de error_ttl"""
+        failure = self._failures.get(year)
+        if failure is not None and self.clock() - failure[1] < self.error_ttl:
+            return failure[0]
+        return None
+
+    def get(self, year):
+        """Libros de year: cache fresca, vencida (y refresco en fondo) o descarga"""
+        entry = self.cache.get(year)
+        if entry is not None:
+            books, fetched_at = entry
+            if self.clock() - fetched_at > self.ttl:
+                self.stale_served += 1
+                if self._recent_failure(year) is None:
+                    future, leader = self._start_refresh(year)
+                    if leader:
+                        threading.Thread(target=self._refresh, args=(year, future), daemon=True).start()
+            return books
+
+        failure = self._recent_failure(year)
+        if failure is not None:
+            self.errors_served += 1
+            raise failure
+
+        future, leader = self._start_refresh(year)
+        if leader:
+            self._refresh(year, future)
+        return future.result(timeout=self.timeout * 2)
+
+    def get_stats(self):
+        return dict(self.cache.get_stats(), fetches=self.fetches, stale_served=self.stale_served,
+                    errors_served=self.errors_served)
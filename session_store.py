@@ -0,0 +1,70 @@
+"""
+Sesiones por usuario para SmartRecommender
+Cada sesión guarda los ids de libros ya recomendados y un contexto de
+conversación acotado; el almacén desaloja por LRU y por inactividad
+"""
+
+import uuid
+from collections import deque
+
+from lru_cache import LRUCache
+
+
+class Session:
+    """
+    Estado de una conversación:
+    - recommended: ids (Book.id) ya recomendados, a lo sumo max_recommended
+    - context: últimas interacciones (deque acotado)
+    """
+
+    __slots__ = ('id', 'recommended', 'context', '_order', 'max_recommended')
+
+    def __init__(self, session_id, context_size=10, max_recommended=256):
+        self.id = session_id
+        self.recommended = set()
+        self.context = deque(maxlen=context_size)
+        self._order = deque()
+        self.max_recommended = max_recommended
+
+    def exclude(self, book_id):
+        """Marca un libro como recomendado (olvida el más antiguo si hay tope)"""
+        if book_id in self.recommended:
+            return
+        if len(self._order) >= self.max_recommended:
+            self.recommended.discard(self._order.popleft())
+        self.recommended.add(book_id)
+        self._order.append(book_id)
+
+    def reset(self):
+        self.recommended.clear()
+        self._order.clear()
+        self.context.clear()
+
+
+class SessionStore:
+    """Sesiones indexadas por id con tope de cantidad (LRU) y TTL de inactividad"""
+
+    def __init__(self, max_sessions=10000, ttl=30 * 60, context_size=10, max_recommended=256):
+        self.context_size = context_size
+        self.max_recommended = max_recommended
+        self.sessions = LRUCache(maxsize=max_sessions, ttl=ttl)
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def get(self, session_id):
+        """Sesión existente o nueva (renueva su último acceso)"""
+        return self.sessions.get_or_create(
+            session_id,
+            lambda: Session(session_id, self.context_size, self.max_recommended)
+        )
+
+    def reset(self, session_id):
+        self.sessions.pop(session_id)
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def get_stats(self):
+        return self.sessions.get_stats()
@@ -1,8 +1,13 @@
-import json
-import os
 from datetime import datetime
 from collections import defaultdict
-import re
+from keyword_matcher import KeywordMatcher
+from catalog import Catalog
+from catalog_store import CatalogStore
+from locks import InstrumentedLock
+from metrics import STAGE_SECONDS, timed
+from session_store import Session, SessionStore
+from state_store import StateStore
+from vector_index import top_k_indices
 
 class SmartRecommender:
     """
@@ -12,26 +17,38 @@ class SmartRecommender:
     - Mejor manejo de contradicciones
     """
     
-    def __init__(self):
-        self.history_file = 'smart_history.json'
-        self.session_recommended = set()
-        self.conversation_context = []
+    def __init__(self, store=None, session_store=None, catalog_store=None):
+        # Estado persistente compartido con FeedbackSystem (SQLite)
+        self.store = store or StateStore()
+        self.catalog_store = catalog_store or CatalogStore()
+        
+        # Sesiones por usuario; default_session se usa cuando no se indica una
+        self.sessions = session_store or SessionStore()
+        self.default_session = Session('default')
         
         self.history = self.load_history()
-        self.books = self.build_library()
         
-        # Mapeo emocional EXPANDIDO
+        # Catálogo inmutable construido desde el CatalogStore (la primera
+        # vez se carga la biblioteca base); add_book publica una versión nueva
+        self._catalog_lock = InstrumentedLock('catalog')
+        if not len(self.catalog_store):
+            self.catalog_store.bulk_load(Catalog.from_library(self.build_library()).books)
+        self.catalog = Catalog.from_books(self.catalog_store.load(), self.history['book_scores'])
+        self.store.subscribe(self._on_book_score)
+        
+        # Mapeo emocional EXPANDIDO (con formas femeninas: el matcher
+        # respeta límites de palabra)
         self.emotion_keywords = {
-            'triste': ['triste', 'melancólico', 'deprimido', 'solo', 'nostálgico', 'decaído', 'desanimado', 'vacía', 'vacío', 'pérdida', 'duelo'],
-            'feliz': ['feliz', 'alegre', 'contento', 'emocionado', 'optimista', 'energético', 'bien', 'genial'],
-            'pensativo': ['pensativo', 'reflexivo', 'filosófico', 'pensar', 'reflexionar', 'meditar', 'profundo'],
-            'motivado': ['motivado', 'inspirado', 'determinado', 'energía', 'productivo', 'cambio', 'transformar'],
-            'aburrido': ['aburrido', 'cansado', 'hastiado', 'monótono', 'desconectar', 'rutina'],
-            'ansioso': ['ansioso', 'nervioso', 'preocupado', 'estresado', 'inquieto', 'molesta', 'molesto', 'enojada', 'enojado', 'frustrado', 'ira'],
-            'curioso': ['curioso', 'interesado', 'aprender', 'descubrir', 'explorar', 'sorprender', 'sorpréndeme'],
-            'romántico': ['romántico', 'amor', 'sentimental', 'pasión', 'enamorado'],
-            'confundido': ['confundido', 'perdido', 'no sé', 'inseguro', 'sin sentido'],
-            'nostálgico': ['nostálgico', 'añoranza', 'recuerdos', 'pasado', 'era']
+            'triste': ['triste', 'melancólico', 'melancólica', 'deprimido', 'deprimida', 'solo', 'sola', 'nostálgico', 'decaído', 'decaída', 'desanimado', 'desanimada', 'vacía', 'vacío', 'pérdida', 'duelo'],
+            'feliz': ['feliz', 'alegre', 'contento', 'contenta', 'emocionado', 'emocionada', 'optimista', 'energético', 'energética', 'bien', 'genial'],
+            'pensativo': ['pensativo', 'pensativa', 'reflexivo', 'reflexiva', 'filosófico', 'filosófica', 'pensar', 'reflexionar', 'meditar', 'profundo'],
+            'motivado': ['motivado', 'motivada', 'inspirado', 'inspirada', 'determinado', 'determinada', 'energía', 'productivo', 'productiva', 'cambio', 'transformar'],
+            'aburrido': ['aburrido', 'aburrida', 'cansado', 'cansada', 'hastiado', 'hastiada', 'monótono', 'desconectar', 'rutina'],
+            'ansioso': ['ansioso', 'ansiosa', 'nervioso', 'nerviosa', 'preocupado', 'preocupada', 'estresado', 'estresada', 'inquieto', 'inquieta', 'molesta', 'molesto', 'enojada', 'enojado', 'frustrado', 'frustrada', 'ira'],
+            'curioso': ['curioso', 'curiosa', 'interesado', 'interesada', 'aprender', 'descubrir', 'explorar', 'sorprender', 'sorpréndeme'],
+            'romántico': ['romántico', 'romántica', 'amor', 'sentimental', 'pasión', 'enamorado', 'enamorada'],
+            'confundido': ['confundido', 'confundida', 'perdido', 'perdida', 'no sé', 'inseguro', 'insegura', 'sin sentido'],
+            'nostálgico': ['nostálgico', 'nostálgica', 'añoranza', 'recuerdos', 'pasado', 'era']
         }
         
         # Contextos especiales (frases que cambian la recomendación)
@@ -42,11 +59,36 @@ class SmartRecommender:
             'no_empeorar': ['no quiero', 'sin', 'evitar', 'no me gusta', 'menos']
         }
         
+        # Temas que ajustan el score de libros concretos
+        self.topic_keywords = {
+            'feminista': ['feminista'],
+            'protagonista': ['protagonista'],
+            'duelo': ['duelo', 'pérdida'],
+            'vacío': ['vacío', 'vacía']
+        }
+        
+        # Señales para detectar contradicciones ("feliz pero quiero llorar");
+        # 'raíz*' coincide como prefijo ("melancólicos", "evitarlo")
+        self.signal_keywords = {
+            'feliz': ['feliz'],
+            'llanto': ['llorar*', 'triste*', 'melanc*'],
+            'triste': ['triste'],
+            'evitar': ['no quiero*', 'sin*', 'evitar*'],
+            'vacío': ['vacía', 'vacío', 'sin sentido', 'nada']
+        }
+        
+        # Todas las palabras clave en un solo matcher (una pasada por mensaje)
+        self.keyword_matcher = KeywordMatcher()
+        self.keyword_matcher.add_groups('emotion', self.emotion_keywords)
+        self.keyword_matcher.add_groups('context', self.special_contexts)
+        self.keyword_matcher.add_groups('topic', self.topic_keywords)
+        self.keyword_matcher.add_groups('signal', self.signal_keywords)
+        
         print("✅ SmartRecommender MEJORADO inicializado")
         print(f"📊 Historial: {len(self.history.get('interactions', []))} interacciones previas")
     
     def build_library(self):
-        """Biblioteca con clasificación emocional expandida"""
+        """Biblioteca base con clasificación emocional expandida (carga inicial del CatalogStore)"""
         return {
             "filosofia": [
                 {
@@ -254,76 +296,67 @@ class SmartRecommender:
         }
     
     def load_history(self):
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Convertir a defaultdict
-                    if 'preferences' in data:
-                        data['preferences'] = defaultdict(float, data['preferences'])
-                    if 'book_scores' in data:
-                        data['book_scores'] = defaultdict(float, data['book_scores'])
-                    return data
-            except:
-                pass
-        return {
-            'interactions': [],
-            'preferences': defaultdict(float),
-            'book_scores': defaultdict(float)
-        }
+        """Estado de aprendizaje (en memoria, respaldado por el StateStore)"""
+        return self.store.history
     
     def save_history(self):
-        save_data = {
-            'interactions': self.history['interactions'][-100:],
-            'preferences': dict(self.history['preferences']),
-            'book_scores': dict(self.history['book_scores'])
-        }
-        try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(save_data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"❌ Error guardando: {e}")
+        """Consolida el WAL de la base (cada evento ya está confirmado)"""
+        self.store.checkpoint()
+    
+    def _on_book_score(self, book_scores):
+        """
+        Publica una versión del catálogo con los puntajes aprendidos al día
+        (copy-on-write: quien tomó la versión anterior no ve el cambio)
+        """
+        with self._catalog_lock:
+            self.catalog = self.catalog.with_learned(book_scores)
     
-    def detect_special_context(self, text):
+    def detect_special_context(self, text, hits=None):
         """Detecta contextos especiales que modifican la recomendación"""
-        text_lower = text.lower()
-        contexts = []
+        if hits is None:
+            hits = self.keyword_matcher.match(text)
         
-        for context_name, keywords in self.special_contexts.items():
-            if any(keyword in text_lower for keyword in keywords):
-                contexts.append(context_name)
-        
-        return contexts
+        return [context_name for context_name in self.special_contexts
+                if context_name in hits['context']]
+    
+    def detect_topics(self, text, hits=None):
+        """Temas mencionados en el mensaje (feminista, duelo, vacío...)"""
+        if hits is None:
+            hits = self.keyword_matcher.match(text)
+        return set(hits['topic'])
     
-    def analyze_emotion(self, text):
+    def analyze_emotion(self, text, hits=None, session=None):
         """Análisis emocional mejorado con contexto"""
-        text_lower = text.lower()
+        session = session or self.default_session
+        if hits is None:
+            hits = self.keyword_matcher.match(text)
         scores = defaultdict(float)
         
-        # Análisis por keywords
-        for emotion, keywords in self.emotion_keywords.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    scores[emotion] += 1.0
+        # Análisis por keywords (cada palabra clave distinta suma 1)
+        for emotion in self.emotion_keywords:
+            if emotion in hits['emotion']:
+                scores[emotion] += len({hit.keyword for hit in hits['emotion'][emotion]})
         
         # Contexto conversacional
-        if self.conversation_context:
-            prev_emotion = self.conversation_context[-1].get('emotion')
+        if session.context:
+            prev_emotion = session.context[-1].get('emotion')
             if prev_emotion and prev_emotion in scores:
                 scores[prev_emotion] += 0.3
         
         # Detectar negaciones y contradicciones
+        signals = hits['signal']
+        
         # Caso: "Estoy feliz pero quiero llorar"
-        if re.search(r'\bfeliz\b.*\b(llorar|triste|melanc)', text_lower):
+        if self._signal_follows(signals, 'feliz', 'llanto'):
             scores['triste'] += 2.0  # Priorizar la tristeza
             scores['feliz'] = max(0, scores['feliz'] - 1.0)
         
         # Caso: "Estoy triste pero no quiero empeorar"
-        if re.search(r'\btriste\b.*\b(no quiero|sin|evitar)', text_lower):
+        if self._signal_follows(signals, 'triste', 'evitar'):
             scores['motivado'] += 1.5  # Agregar motivación
         
         # Caso: "Me siento vacía"
-        if any(word in text_lower for word in ['vacía', 'vacío', 'sin sentido', 'nada']):
+        if 'vacío' in signals:
             scores['triste'] += 2.0
             scores['confundido'] += 1.5
         
@@ -336,17 +369,35 @@ class SmartRecommender:
         
         return best_emotion, confidence
     
+    @staticmethod
+    def _signal_follows(signals, first, then):
+        """True si alguna señal 'then' aparece después de una señal 'first'"""
+        if first not in signals or then not in signals:
+            return False
+        first_start = min(hit.start for hit in signals[first])
+        return any(hit.start > first_start for hit in signals[then])
+    
+    @property
+    def features(self):
+        return self.catalog.features
+    
+    def add_book(self, book):
+        """Persiste un libro y publica una nueva versión del catálogo"""
+        with self._catalog_lock:
+            book = self.catalog.new_book(book)
+            self.catalog_store.add(book)
+            self.catalog = self.catalog.with_book(book, self.history['book_scores'])
+        return book
+    
     def get_all_books_flat(self):
-        books = []
-        for category, book_list in self.books.items():
-            for book in book_list:
-                book_copy = book.copy()
-                book_copy['categoria'] = category
-                books.append(book_copy)
-        return books
+        """Todos los libros (tupla compartida de Book, sin copias)"""
+        return self.catalog.books
     
-    def calculate_book_score(self, book, emotion, user_message, special_contexts):
+    def calculate_book_score(self, book, emotion, user_message, special_contexts, topics=None, session=None):
         """Calcula puntuación con contextos especiales"""
+        session = session or self.default_session
+        if topics is None:
+            topics = self.detect_topics(user_message)
         score = 0.0
         
         # 1. Match emocional directo
@@ -362,12 +413,10 @@ class SmartRecommender:
         score += self.history['book_scores'].get(book_id, 0) * 0.3
         
         # 4. Penalización por repetición
-        if book['titulo'] in self.session_recommended:
+        if book.get('id') in session.recommended:
             score -= 10.0
         
         # 5. Contextos especiales
-        message_lower = user_message.lower()
-        
         # Contexto: Esperanza (quiere salir de la tristeza)
         if 'esperanza' in special_contexts:
             if book.get('impacto') == 'esperanzador':
@@ -395,15 +444,15 @@ class SmartRecommender:
                 score += 2.0
         
         # 6. Búsqueda por temas específicos
-        if 'feminista' in message_lower and 'protagonista' in message_lower:
+        if 'feminista' in topics and 'protagonista' in topics:
             if 'Jane Eyre' in book['titulo']:
                 score += 3.0
         
-        if 'duelo' in message_lower or 'pérdida' in message_lower:
+        if 'duelo' in topics:
             if 'duelo' in book.get('temas', []) or 'pérdida' in book.get('temas', []):
                 score += 2.5
         
-        if 'vacío' in message_lower or 'vacía' in message_lower:
+        if 'vacío' in topics:
             if 'vacío' in book.get('temas', []) or 'muerte' in book.get('temas', []):
                 score += 2.5
         
@@ -415,38 +464,156 @@ class SmartRecommender:
         
         return score
     
-    def recommend(self, user_message):
-        """Recomendación inteligente mejorada"""
-        
-        # 1. Detectar contextos especiales
-        special_contexts = self.detect_special_context(user_message)
+    def recommend(self, user_message, k=3, session=None):
+        """Recomendación inteligente mejorada (mejor libro + k alternativas)"""
+        result, event = self._recommend(
+            user_message, k, session or self.default_session,
+            self.catalog, self.history['preferences'], self._recent_categories()
+        )
+        if event:
+            with timed(STAGE_SECONDS, stage='persistence'):
+                self.store.record(event)
+        return result
+    
+    def recommend_stream(self, user_message, k=3, session=None):
+        """
+        Recomendación por etapas para /recomendar/stream: produce
+        (etapa, datos) a medida que se calculan y al final
+        ('resultado', resultado). La interacción se registra después de
+        entregar el resultado (si el cliente se desconecta antes, no se
+        aprende de ella).
+        """
+        steps = self._recommend_steps(
+            user_message, k, session or self.default_session,
+            self.catalog, self.history['preferences'], self._recent_categories()
+        )
+        for stage, data in steps:
+            if stage != 'resultado':
+                yield stage, data
+                continue
+            result, event = data
+            yield stage, result
+            if event:
+                with timed(STAGE_SECONDS, stage='persistence'):
+                    self.store.record(event)
+    
+    def recommend_batch(self, requests, k=3):
+        """
+        Recomienda para muchos mensajes en una llamada.
+        requests: lista de (mensaje, sesión o None)
+        
+        Todo el lote usa la misma versión del catálogo y el estado de
+        aprendizaje del inicio del lote; los scores se calculan una sola vez
+        por combinación (emoción, contextos, temas, exclusiones de la sesión)
+        y las interacciones se guardan con un único record_many.
+        """
+        catalog = self.catalog
+        preferences = dict(self.history['preferences'])
+        recent_categories = self._recent_categories()
+        score_cache = {}
+        
+        results, events = [], []
+        for user_message, session in requests:
+            result, event = self._recommend(
+                user_message, k, session or self.default_session,
+                catalog, preferences, recent_categories, score_cache, verbose=False
+            )
+            results.append(result)
+            if event:
+                events.append(event)
+        
+        if events:
+            with timed(STAGE_SECONDS, stage='persistence'):
+                self.store.record_many(events)
+        print(f"📦 Lote: {len(results)} mensajes, {len(score_cache)} combinaciones puntuadas")
+        return results
+    
+    def _recent_categories(self):
+        return [i.get('categoria', '') for i in self.history['interactions'][-5:]]
+    
+    def _recommend(self, user_message, k, session, catalog, preferences, recent_categories,
+                   score_cache=None, verbose=True):
+        """Recomendación sobre un catálogo y estado dados; retorna (resultado, evento)"""
+        for stage, data in self._recommend_steps(user_message, k, session, catalog, preferences,
+                                                 recent_categories, score_cache, verbose):
+            pass
+        return data
+    
+    def _recommend_steps(self, user_message, k, session, catalog, preferences, recent_categories,
+                         score_cache=None, verbose=True):
+        """
+        Generador con las etapas de _recommend a medida que se calculan:
+        ('analisis', ...), ('libro', ...), ('alternativas', ...),
+        ('explicacion', ...) y por último ('resultado', (resultado, evento)).
+        Cada etapa se mide en bookmate_stage_seconds (nunca a través de un
+        yield: el tiempo del consumidor no cuenta).
+        """
+        with timed(STAGE_SECONDS, stage='context'):
+            # Una sola pasada del matcher para contextos, emociones y temas
+            hits = self.keyword_matcher.match(user_message)
+            
+            # 1. Detectar contextos especiales
+            special_contexts = self.detect_special_context(user_message, hits)
         
         # 2. Analizar emoción
-        emotion, confidence = self.analyze_emotion(user_message)
-        
-        print(f"🔍 Emoción: {emotion} (confianza: {confidence:.2f})")
-        print(f"🎯 Contextos especiales: {special_contexts}")
-        
-        # 3. Calcular scores
-        all_books = self.get_all_books_flat()
-        book_scores = []
+        with timed(STAGE_SECONDS, stage='emotion'):
+            emotion, confidence = self.analyze_emotion(user_message, hits, session)
+            topics = self.detect_topics(user_message, hits)
         
-        for book in all_books:
-            score = self.calculate_book_score(book, emotion, user_message, special_contexts)
-            book_scores.append((book, score))
+        if verbose:
+            print(f"🔍 Emoción: {emotion} (confianza: {confidence:.2f})")
+            print(f"🎯 Contextos especiales: {special_contexts}")
         
-        # 4. Ordenar
-        book_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        if not book_scores or book_scores[0][1] < -5:
-            return self.handle_no_recommendations(emotion)
-        
-        best_book, best_score = book_scores[0]
+        yield 'analisis', {
+            'emotion': emotion,
+            'emotion_confidence': float(confidence),
+            'special_contexts': special_contexts,
+            'topics': sorted(topics)
+        }
         
-        print(f"📖 Mejor match: {best_book['titulo']} (score: {best_score:.2f})")
+        # 3. Calcular scores (todos los libros en una expresión vectorizada)
+        with timed(STAGE_SECONDS, stage='scoring'):
+            cache_key = None
+            if score_cache is not None:
+                cache_key = (emotion, tuple(special_contexts), frozenset(topics), frozenset(session.recommended))
+            scores = score_cache.get(cache_key) if cache_key else None
+            if scores is None:
+                scores = catalog.features.score(
+                    emotion, preferences, session.recommended,
+                    special_contexts, topics, recent_categories
+                )
+                if cache_key:
+                    score_cache[cache_key] = scores
+        
+        # 4. Seleccionar top-k sin ordenar todo el catálogo
+        # (en empate gana el orden del catálogo)
+        with timed(STAGE_SECONDS, stage='ranking'):
+            top = top_k_indices(scores, k + 1)
+        
+        if not len(top) or scores[top[0]] < -5:
+            yield 'resultado', (self.handle_no_recommendations(emotion), None)
+            return
+        
+        best_book, best_score = catalog.books[top[0]], float(scores[top[0]])
+        
+        if verbose:
+            print(f"📖 Mejor match: {best_book['titulo']} (score: {best_score:.2f})")
+        
+        yield 'libro', {'libro': best_book, 'confianza': float(confidence), 'score': best_score}
+        
+        alternatives = [
+            {
+                'id': int(i),
+                'titulo': catalog.books[i].titulo,
+                'autor': catalog.books[i].autor,
+                'score': float(scores[i])
+            }
+            for i in top[1:]
+        ]
+        yield 'alternativas', alternatives
         
         # 5. Registrar
-        self.session_recommended.add(best_book['titulo'])
+        session.exclude(best_book.id)
         
         interaction = {
             'timestamp': datetime.now().isoformat(),
@@ -459,23 +626,26 @@ class SmartRecommender:
             'special_contexts': special_contexts
         }
         
-        self.conversation_context.append(interaction)
-        self.history['interactions'].append(interaction)
+        session.context.append(interaction)
         
-        # 6. Aprendizaje
-        self.history['preferences'][emotion] += 0.2
+        # 6. Aprendizaje: un evento incremental para el StateStore
+        preference_deltas = [[emotion, 0.2]]
         for book_emotion in best_book.get('emociones', []):
-            self.history['preferences'][book_emotion] += 0.1
+            preference_deltas.append([book_emotion, 0.1])
         
-        book_id = f"{best_book['titulo']}_{best_book['autor']}"
-        self.history['book_scores'][book_id] += 0.1
-        
-        self.save_history()
+        event = {
+            'type': 'recommend',
+            'interaction': interaction,
+            'preferences': preference_deltas,
+            'book_scores': [[best_book.book_id, 0.1]]
+        }
         
         # 7. Explicación
-        explanation = self.generate_explanation(best_book, emotion, best_score, user_message, special_contexts)
+        with timed(STAGE_SECONDS, stage='explanation'):
+            explanation = self.generate_explanation(best_book, emotion, best_score, user_message, special_contexts)
+        yield 'explicacion', explanation
         
-        return {
+        yield 'resultado', ({
             'libro': best_book,
             'confianza': float(confidence),
             'analisis': {
@@ -485,8 +655,8 @@ class SmartRecommender:
                 'special_contexts': special_contexts
             },
             'explicacion': explanation,
-            'alternativas': [b[0]['titulo'] for b in book_scores[1:4]]
-        }
+            'alternativas': alternatives
+        }, event)
     
     def generate_explanation(self, book, emotion, score, user_message, special_contexts):
         """Genera explicación personalizada con contextos"""
@@ -532,11 +702,13 @@ class SmartRecommender:
             'alternativas': []
         }
     
-    def get_learning_stats(self):
-        total = len(self.history['interactions'])
+    def get_learning_stats(self, session=None):
+        # Copia consistente del historial (otros hilos pueden estar escribiendo)
+        history = self.store.snapshot()
+        total = len(history['interactions'])
         
         emotion_counts = defaultdict(int)
-        for interaction in self.history['interactions']:
+        for interaction in history['interactions']:
             emotion = interaction.get('emotion')
             if emotion:
                 emotion_counts[emotion] += 1
@@ -544,7 +716,7 @@ class SmartRecommender:
         top_emotions = sorted(emotion_counts.items(), key=lambda x: x[1], reverse=True)[:3]
         
         book_counts = defaultdict(int)
-        for interaction in self.history['interactions']:
+        for interaction in history['interactions']:
             book = interaction.get('recommended')
             if book:
                 book_counts[book] += 1
@@ -553,13 +725,12 @@ class SmartRecommender:
         
         return {
             'total_interactions': total,
-            'session_recommended': len(self.session_recommended),
+            'session_recommended': len((session or self.default_session).recommended),
             'top_emotions': [{'emotion': e, 'count': c} for e, c in top_emotions],
             'top_books': [{'book': b, 'count': c} for b, c in top_books],
-            'preferences': dict(self.history['preferences'])
+            'preferences': history['preferences']
         }
     
-    def reset_session(self):
-        self.session_recommended.clear()
-        self.conversation_context.clear()
+    def reset_session(self, session=None):
+        (session or self.default_session).reset()
         print("🔄 Sesión reiniciada")
\ No newline at end of file
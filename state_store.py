@@ -0,0 +1,503 @@
+"""
+Estado compartido de BookMate AI en SQLite (modo WAL)
+Un solo almacén para el historial del recomendador (interacciones,
+preferencias, book_scores) y el feedback (book_ratings, emotion_accuracy,
+context_effectiveness). El estado vive en memoria (las lecturas no tocan
+la base) y se escribe en segundo plano (write-behind): un hilo junta lo
+modificado y lo guarda en una transacción cada flush_interval segundos o
+cada flush_events eventos, lo que ocurra primero.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from history_log import empty_history, load_history
+from locks import InstrumentedLock
+from metrics import IO_SECONDS, timed
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    emotion TEXT,
+    recommended TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS preferences (
+    emotion TEXT PRIMARY KEY,
+    score REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS book_scores (
+    book_id TEXT PRIMARY KEY,
+    score REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS book_ratings (
+    book_id TEXT PRIMARY KEY,
+    positive INTEGER NOT NULL DEFAULT 0,
+    negative INTEGER NOT NULL DEFAULT 0,
+    neutral INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS emotion_accuracy (
+    emotion TEXT PRIMARY KEY,
+    correct INTEGER NOT NULL DEFAULT 0,
+    incorrect INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS context_effectiveness (
+    context TEXT PRIMARY KEY,
+    helpful INTEGER NOT NULL DEFAULT 0,
+    not_helpful INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS learning_adjustments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Tablas de contadores: tabla -> (columna clave, columnas contador)
+COUNTERS = {
+    'book_ratings': ('book_id', ('positive', 'negative', 'neutral')),
+    'emotion_accuracy': ('emotion', ('correct', 'incorrect')),
+    'context_effectiveness': ('context', ('helpful', 'not_helpful')),
+}
+
+# Tablas de sumas: tabla -> columna clave
+SCORES = {
+    'preferences': 'emotion',
+    'book_scores': 'book_id',
+}
+
+
+class StateStore:
+    """
+    Historial y feedback persistidos en db_file.
+
+    Eventos (todas las claves son opcionales salvo 'type'):
+        {'type': 'recommend' | 'feedback',
+         'interaction': {...},
+         'preferences': [[emocion, delta], ...],      # en orden de aplicación
+         'book_scores': [[book_id, delta], ...],
+         'book_ratings': [[book_id, 'positive'], ...],
+         'emotion_accuracy': [[emocion, 'correct'], ...],
+         'context_effectiveness': [[contexto, 'helpful'], ...],
+         'adjustment': {...}}                          # registro de feedback
+
+    La primera vez que se abre la base se importan smart_history.json (más
+    su log de eventos) y feedback_data.json si existen.
+
+    Un flush escribe cada clave modificada una sola vez con la suma de sus
+    deltas pendientes (coalescidos) y es atómico. Las escrituras son
+    aditivas (x = x + delta), así que varios procesos pueden compartir
+    db_file sin pisarse. close() hace el último flush; lo no escrito si el
+    proceso muere sin cerrar está acotado por flush_interval.
+    flush_interval=None escribe en cada record (sin hilo).
+    """
+
+    def __init__(self, db_file='bookmate.db', history_file='smart_history.json',
+                 feedback_file='feedback_data.json', max_interactions=100,
+                 max_adjustments=50, synchronous='FULL', flush_interval=0.2, flush_events=256):
+        self.db_file = db_file
+        self.max_interactions = max_interactions
+        self.max_adjustments = max_adjustments
+        self.flush_interval = flush_interval
+        self.flush_events = flush_events
+
+        # lock: estado en memoria (tomado brevemente por las peticiones)
+        # _db_lock: conexión SQLite (solo el flush y el mantenimiento)
+        self.lock = InstrumentedLock('state', reentrant=True)
+        self._db_lock = InstrumentedLock('state_db')
+        self._listeners = []
+
+        # Deltas pendientes de escribir (write-behind)
+        self._dirty = {table: {} for table in (*SCORES, *COUNTERS)}
+        self._new_interactions = []
+        self._new_adjustments = []
+        self._dirty_feedback_count = 0
+        self._backlog = 0
+        self.max_backlog = 0
+        self.flushes = 0
+        self.events_flushed = 0
+        self.flush_errors = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+        self.last_flush_at = None
+
+        self.conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA busy_timeout=5000')
+        self.conn.execute(f'PRAGMA synchronous={synchronous}')
+        self.conn.executescript(SCHEMA)
+
+        self.migrate_json(history_file, feedback_file)
+        self.history, self.feedback = self.load()
+
+        self._closed = False
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._flusher = None
+        if flush_interval is not None:
+            self._flusher = threading.Thread(target=self._flush_loop, name='state-flusher', daemon=True)
+            self._flusher.start()
+
+    @staticmethod
+    def empty_feedback():
+        return {
+            'book_ratings': {},
+            'emotion_accuracy': {},
+            'context_effectiveness': {},
+            'total_feedback_count': 0,
+            'learning_adjustments': []
+        }
+
+    # ------------------------------------------------------------------
+    # Carga y migración
+    # ------------------------------------------------------------------
+
+    def load(self):
+        """Lee el estado completo de la base"""
+        history = empty_history()
+        feedback = self.empty_feedback()
+        with self._db_lock, timed(IO_SECONDS, op='state_load'):
+            rows = self.conn.execute(
+                'SELECT data FROM interactions ORDER BY id DESC LIMIT ?', (self.max_interactions,)
+            ).fetchall()
+            history['interactions'] = [json.loads(data) for data, in reversed(rows)]
+            for table, key in SCORES.items():
+                history[table].update(self.conn.execute(f'SELECT {key}, score FROM {table}'))
+
+            for table, (key, columns) in COUNTERS.items():
+                query = f"SELECT {key}, {', '.join(columns)} FROM {table}"
+                for row in self.conn.execute(query):
+                    feedback[table][row[0]] = dict(zip(columns, row[1:]))
+
+            rows = self.conn.execute(
+                'SELECT data FROM learning_adjustments ORDER BY id DESC LIMIT ?', (self.max_adjustments,)
+            ).fetchall()
+            feedback['learning_adjustments'] = [json.loads(data) for data, in reversed(rows)]
+            feedback['total_feedback_count'] = int(self._meta('total_feedback_count') or 0)
+        return history, feedback
+
+    def _meta(self, key):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            'INSERT INTO meta (key, value) VALUES (?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value', (key, str(value))
+        )
+
+    def _add_meta(self, key, amount):
+        self.conn.execute(
+            'INSERT INTO meta (key, value) VALUES (?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value', (key, amount)
+        )
+
+    def migrate_json(self, history_file, feedback_file):
+        """Importa una sola vez el historial y el feedback en JSON"""
+        with self._db_lock:
+            if self._meta('migrated_json'):
+                return False
+
+            legacy = load_history(history_file, max_interactions=self.max_interactions)
+            feedback = {}
+            if feedback_file and os.path.exists(feedback_file):
+                try:
+                    with open(feedback_file, 'r', encoding='utf-8') as f:
+                        feedback = json.load(f)
+                except Exception as e:
+                    print(f"⚠️ No se pudo leer {feedback_file} para migrar: {e}")
+
+            with self.conn:
+                self.conn.execute('BEGIN IMMEDIATE')
+                for interaction in legacy['interactions']:
+                    self._insert_interaction(interaction)
+                for table in SCORES:
+                    for key, value in legacy[table].items():
+                        self._add_score(table, key, value)
+
+                for table, (key, columns) in COUNTERS.items():
+                    for name, counts in feedback.get(table, {}).items():
+                        for column in columns:
+                            self._add_count(table, column, name, counts.get(column, 0))
+                for record in feedback.get('learning_adjustments', []):
+                    self._insert_adjustment(record)
+                self._set_meta('total_feedback_count', feedback.get('total_feedback_count', 0))
+                self._set_meta('migrated_json', datetime.now().isoformat())
+                self._trim()
+
+            if legacy['interactions'] or feedback:
+                print(f"📦 Historial y feedback JSON migrados a {self.db_file}")
+            return True
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def subscribe(self, callback):
+        """
+        callback({book_id: nuevo_valor}) una vez por record/record_many con
+        todos los book_scores que cambiaron. Se invoca con el lock tomado,
+        en el orden de las llamadas.
+        """
+        self._listeners.append(callback)
+
+    def _insert_interaction(self, interaction):
+        self.conn.execute(
+            'INSERT INTO interactions (timestamp, emotion, recommended, data) VALUES (?, ?, ?, ?)',
+            (interaction.get('timestamp'), interaction.get('emotion'), interaction.get('recommended'),
+             json.dumps(interaction, ensure_ascii=False))
+        )
+
+    def _insert_adjustment(self, record):
+        self.conn.execute('INSERT INTO learning_adjustments (data) VALUES (?)',
+                          (json.dumps(record, ensure_ascii=False),))
+
+    def _add_score(self, table, key, delta):
+        self.conn.execute(
+            f'INSERT INTO {table} ({SCORES[table]}, score) VALUES (?, ?) '
+            f'ON CONFLICT({SCORES[table]}) DO UPDATE SET score = score + excluded.score', (key, delta)
+        )
+
+    def _add_count(self, table, column, key, amount=1):
+        key_column, columns = COUNTERS[table]
+        if column not in columns:
+            raise ValueError(f"Contador desconocido {table}.{column}")
+        self.conn.execute(
+            f'INSERT INTO {table} ({key_column}, {column}) VALUES (?, ?) '
+            f'ON CONFLICT({key_column}) DO UPDATE SET {column} = {column} + excluded.{column}', (key, amount)
+        )
+
+    def _apply(self, event):
+        """Aplica el evento al estado en memoria y marca lo que cambió"""
+        if event.get('interaction'):
+            self.history['interactions'].append(event['interaction'])
+            del self.history['interactions'][:-self.max_interactions]
+            self._new_interactions.append(event['interaction'])
+        for table in SCORES:
+            dirty = self._dirty[table]
+            for key, delta in event.get(table, []):
+                self.history[table][key] += delta
+                dirty[key] = dirty.get(key, 0) + delta
+        for table, (_, columns) in COUNTERS.items():
+            dirty = self._dirty[table]
+            for key, column in event.get(table, []):
+                counts = self.feedback[table].setdefault(key, dict.fromkeys(columns, 0))
+                counts[column] += 1
+                pending = dirty.setdefault(key, dict.fromkeys(columns, 0))
+                pending[column] += 1
+        if event['type'] == 'feedback':
+            self.feedback['total_feedback_count'] += 1
+            self._dirty_feedback_count += 1
+        if event.get('adjustment'):
+            self.feedback['learning_adjustments'].append(event['adjustment'])
+            del self.feedback['learning_adjustments'][:-self.max_adjustments]
+            self._new_adjustments.append(event['adjustment'])
+
+    def record(self, event):
+        """Aplica un evento en memoria y lo deja pendiente de escribir"""
+        return self.record_many([event])[0]
+
+    def record_many(self, events):
+        """
+        Aplica varios eventos en memoria (visibles de inmediato para las
+        lecturas) y los encola para el próximo flush. Nunca espera al disco
+        salvo con flush_interval=None.
+        """
+        with self.lock:
+            changed = {}
+            for event in events:
+                self._apply(event)
+                for book_id, _ in event.get('book_scores', []):
+                    changed[book_id] = self.history['book_scores'][book_id]
+            if changed:
+                for callback in self._listeners:
+                    callback(changed)
+            self._backlog += len(events)
+            self.max_backlog = max(self.max_backlog, self._backlog)
+            backlog = self._backlog
+
+        if self.flush_interval is None:
+            self.flush()
+        elif backlog >= self.flush_events:
+            self._wake.set()
+        return events
+
+    def _take_dirty(self):
+        """Deltas acumulados desde el último flush (con self.lock)"""
+        batch = {
+            'events': self._backlog,
+            'interactions': self._new_interactions,
+            'adjustments': self._new_adjustments,
+            'feedback_count': self._dirty_feedback_count,
+        }
+        for table in SCORES:
+            batch[table] = list(self._dirty[table].items())
+        for table, (_, columns) in COUNTERS.items():
+            batch[table] = [(key, *(counts[c] for c in columns)) for key, counts in self._dirty[table].items()]
+
+        self._backlog = 0
+        self._new_interactions = []
+        self._new_adjustments = []
+        self._dirty_feedback_count = 0
+        self._dirty = {table: {} for table in (*SCORES, *COUNTERS)}
+        return batch
+
+    def _restore_dirty(self, batch):
+        """Devuelve a la cola un lote que no se pudo escribir (con self.lock)"""
+        self._backlog += batch['events']
+        self._new_interactions[:0] = batch['interactions']
+        self._new_adjustments[:0] = batch['adjustments']
+        self._dirty_feedback_count += batch['feedback_count']
+        for table in SCORES:
+            dirty = self._dirty[table]
+            for key, delta in batch[table]:
+                dirty[key] = delta + dirty.get(key, 0)
+        for table, (_, columns) in COUNTERS.items():
+            dirty = self._dirty[table]
+            for key, *amounts in batch[table]:
+                pending = dirty.setdefault(key, dict.fromkeys(columns, 0))
+                for column, amount in zip(columns, amounts):
+                    pending[column] += amount
+
+    def _write(self, batch):
+        """Escribe un lote coalescido: cada clave modificada una sola vez, sumando su delta"""
+        self.conn.executemany(
+            'INSERT INTO interactions (timestamp, emotion, recommended, data) VALUES (?, ?, ?, ?)',
+            [(i.get('timestamp'), i.get('emotion'), i.get('recommended'), json.dumps(i, ensure_ascii=False))
+             for i in batch['interactions']]
+        )
+        self.conn.executemany('INSERT INTO learning_adjustments (data) VALUES (?)',
+                              [(json.dumps(r, ensure_ascii=False),) for r in batch['adjustments']])
+        for table, key_column in SCORES.items():
+            self.conn.executemany(
+                f'INSERT INTO {table} ({key_column}, score) VALUES (?, ?) '
+                f'ON CONFLICT({key_column}) DO UPDATE SET score = score + excluded.score', batch[table]
+            )
+        for table, (key_column, columns) in COUNTERS.items():
+            updates = ', '.join(f'{c} = {c} + excluded.{c}' for c in columns)
+            self.conn.executemany(
+                f"INSERT INTO {table} ({key_column}, {', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * (len(columns) + 1))}) "
+                f"ON CONFLICT({key_column}) DO UPDATE SET {updates}", batch[table]
+            )
+        if batch['feedback_count']:
+            self._add_meta('total_feedback_count', batch['feedback_count'])
+        if batch['interactions'] or batch['adjustments']:
+            self._trim()
+
+    def _trim(self):
+        """Conserva solo las últimas max_interactions / max_adjustments filas (misma transacción)"""
+        for table, keep in (('interactions', self.max_interactions),
+                            ('learning_adjustments', self.max_adjustments)):
+            self.conn.execute(
+                f'DELETE FROM {table} WHERE id <= '
+                f'(SELECT id FROM {table} ORDER BY id DESC LIMIT 1 OFFSET ?)', (keep,)
+            )
+
+    def flush(self):
+        """
+        Escribe en una transacción todo lo pendiente (atómico: o entra el
+        lote completo o nada). Retorna la cantidad de eventos escritos.
+        """
+        with self._db_lock:
+            with self.lock:
+                batch = self._take_dirty()
+            if not batch['events']:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                with self.conn:
+                    self.conn.execute('BEGIN IMMEDIATE')
+                    self._write(batch)
+            except Exception as e:
+                with self.lock:
+                    self._restore_dirty(batch)
+                self.flush_errors += 1
+                print(f"❌ Error escribiendo estado en {self.db_file}: {e}")
+                return 0
+
+            elapsed = time.perf_counter() - start
+            IO_SECONDS.observe(elapsed, op='state_flush')
+            self.flushes += 1
+            self.events_flushed += batch['events']
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.total_flush_seconds += elapsed
+            self.last_flush_at = time.time()
+            return batch['events']
+
+    def _flush_loop(self):
+        """Hilo de escritura: flush cada flush_interval o al llegar a flush_events"""
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def get_stats(self):
+        """Métricas de persistencia (backlog y latencia de flush)"""
+        return {
+            'backlog': self._backlog,
+            'max_backlog': self.max_backlog,
+            'flushes': self.flushes,
+            'events_flushed': self.events_flushed,
+            'flush_errors': self.flush_errors,
+            'last_flush_ms': self.last_flush_seconds * 1000,
+            'avg_flush_ms': self.total_flush_seconds / self.flushes * 1000 if self.flushes else 0.0,
+            'max_flush_ms': self.max_flush_seconds * 1000,
+            'seconds_since_flush': time.time() - self.last_flush_at if self.last_flush_at else None,
+            'flush_interval_ms': self.flush_interval * 1000 if self.flush_interval is not None else None,
+            'flush_events': self.flush_events
+        }
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def snapshot(self):
+        """Copia consistente del historial"""
+        with self.lock:
+            return {
+                'interactions': list(self.history['interactions']),
+                'preferences': dict(self.history['preferences']),
+                'book_scores': dict(self.history['book_scores'])
+            }
+
+    def feedback_snapshot(self):
+        """Copia consistente del feedback"""
+        with self.lock:
+            return copy.deepcopy(self.feedback)
+
+    def count(self, table):
+        """Filas persistidas en table (no incluye lo pendiente de flush)"""
+        with self._db_lock:
+            return self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def checkpoint(self):
+        """Escribe lo pendiente y consolida el WAL en el archivo principal"""
+        self.flush()
+        with self._db_lock, timed(IO_SECONDS, op='state_checkpoint'):
+            self.conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def close(self):
+        """Detiene el hilo de escritura, hace el último flush y cierra la base"""
+        if self._closed:
+            return
+        self._stop.set()
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        with self._db_lock:
+            self.conn.close()
+        self._closed = True
@@ -28,7 +28,7 @@ form.addEventListener('submit', async function(e) {
     sendBtn.disabled = true;
 
     try {
-        const response = await fetch('/recomendar', {
+        const response = await fetch('/recomendar/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -38,17 +38,32 @@ form.addEventListener('submit', async function(e) {
             })
         });
         
-        const data = await response.json();
+        if (!response.ok || !response.body) {
+            const data = await response.json();
+            document.getElementById('typing')?.remove();
+            addMessage('bot', '❌ ' + (data.error || 'Error en la recomendación'));
+            return;
+        }
         
+        // Cada etapa se muestra apenas llega (la primera reemplaza al indicador)
+        let recommendation = null;
+        await readEventStream(response, (event, data) => {
+            if (event === 'error') {
+                document.getElementById('typing')?.remove();
+                addMessage('bot', '❌ ' + data.error);
+                return;
+            }
+            if (!recommendation) {
+                document.getElementById('typing')?.remove();
+                recommendation = createRecommendationMessage();
+            }
+            recommendation.render(event, data);
+            if (event === 'resultado') {
+                setTimeout(() => updateStats(), 500);
+            }
+        });
         document.getElementById('typing')?.remove();
         
-        if (data.success) {
-            displayRecommendation(data.recommendation);
-            setTimeout(() => updateStats(), 500);
-        } else {
-            addMessage('bot', '❌ ' + data.error);
-        }
-        
     } catch (error) {
         console.error('❌ Error:', error);
         document.getElementById('typing')?.remove();
@@ -58,6 +73,33 @@ form.addEventListener('submit', async function(e) {
     }
 });
 
+// Lee un stream text/event-stream y llama a onEvent(evento, datos) por cada evento
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
 function addMessage(type, text) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${type}`;
@@ -69,29 +111,51 @@ function addMessage(type, text) {
     scrollToBottom();
 }
 
-function displayRecommendation(data) {
-    const messageDiv = document.createElement('div');
-    messageDiv.className = 'message bot';
-    
-    const confidence = (data.confianza * 100).toFixed(0);
-    const score = data.analisis.score || 0;
-    
-    messageDiv.innerHTML = `
+// Partes de la recomendación (se usan juntas o a medida que llegan)
+function analysisHTML(analisis) {
+    const contexts = (analisis.special_contexts || []).length
+        ? ` · ${analisis.special_contexts.join(', ')}`
+        : '';
+    return `<div style="font-size: 13px; margin-bottom: 8px;">🔍 Te noto <strong>${analisis.emotion}</strong>${contexts}</div>`;
+}
+
+function bookHTML(libro) {
+    return `
         <div>🎯 ¡Tengo la recomendación perfecta para ti!</div>
         <div class="book-recommendation">
-            <div class="rec-cover" style="background: linear-gradient(135deg, ${data.libro.color}, ${data.libro.color}dd);">
-                ${data.libro.emoji}
+            <div class="rec-cover" style="background: linear-gradient(135deg, ${libro.color}, ${libro.color}dd);">
+                ${libro.emoji}
             </div>
             <div class="rec-info">
-                <h4>${data.libro.titulo}</h4>
-                <p style="color: var(--purple); margin-bottom: 5px;">${data.libro.autor}</p>
-                <p>${data.libro.descripcion}</p>
+                <h4>${libro.titulo}</h4>
+                <p style="color: var(--purple); margin-bottom: 5px;">${libro.autor}</p>
+                <p>${libro.descripcion}</p>
             </div>
         </div>
+    `;
+}
+
+function alternativesHTML(alternativas) {
+    if (!alternativas || !alternativas.length) return '';
+    return `
+        <div style="margin-top: 10px; font-size: 13px;">
+            <strong>📚 También podrías leer:</strong>
+            ${alternativas.map(alt => `<div>• ${alt.titulo} — ${alt.autor}</div>`).join('')}
+        </div>
+    `;
+}
+
+function explanationHTML(explicacion) {
+    return `
         <div style="margin-top: 10px; font-size: 13px; background: rgba(255,255,255,0.2); padding: 10px; border-radius: 10px;">
             <strong>💡 ¿Por qué este libro?</strong><br>
-            ${data.explicacion}
+            ${explicacion}
         </div>
+    `;
+}
+
+function feedbackHTML(data) {
+    return `
         <div class="feedback-buttons" data-recommendation='${JSON.stringify(data).replace(/'/g, "&apos;")}'>
             <p class="feedback-prompt">¿Fue útil esta recomendación?</p>
             <div class="feedback-btn-group">
@@ -109,11 +173,54 @@ function displayRecommendation(data) {
                 </button>
             </div>
         </div>
+    `;
+}
+
+// Mensaje del bot que se completa por etapas (eventos de /recomendar/stream)
+function createRecommendationMessage() {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message bot';
+    messageDiv.innerHTML = `
+        <div class="rec-part" data-part="analisis"></div>
+        <div class="rec-part" data-part="libro"></div>
+        <div class="rec-part" data-part="alternativas"></div>
+        <div class="rec-part" data-part="explicacion"></div>
+        <div class="rec-part" data-part="feedback"></div>
         <div class="message-time">${new Date().toLocaleTimeString('es-ES', {hour: '2-digit', minute:'2-digit'})}</div>
     `;
-    
     chatMessages.appendChild(messageDiv);
-    scrollToBottom();
+    
+    const part = name => messageDiv.querySelector(`[data-part="${name}"]`);
+    
+    return {
+        render(event, data) {
+            if (event === 'analisis') {
+                part('analisis').innerHTML = analysisHTML(data);
+            } else if (event === 'libro') {
+                part('libro').innerHTML = bookHTML(data.libro);
+            } else if (event === 'alternativas') {
+                part('alternativas').innerHTML = alternativesHTML(data);
+            } else if (event === 'explicacion') {
+                part('explicacion').innerHTML = explanationHTML(data);
+            } else if (event === 'resultado') {
+                // Sin recomendaciones no hay etapas previas: se completa aquí
+                const rec = data.recommendation;
+                if (!part('libro').innerHTML) part('libro').innerHTML = bookHTML(rec.libro);
+                if (!part('explicacion').innerHTML) part('explicacion').innerHTML = explanationHTML(rec.explicacion);
+                part('feedback').innerHTML = feedbackHTML(rec);
+            }
+            scrollToBottom();
+        }
+    };
+}
+
+function displayRecommendation(data) {
+    const message = createRecommendationMessage();
+    message.render('analisis', data.analisis);
+    message.render('libro', data);
+    message.render('alternativas', data.alternativas);
+    message.render('explicacion', data.explicacion);
+    message.render('resultado', { recommendation: data });
 }
 
 async function submitFeedback(feedbackType, button) {
@@ -0,0 +1,254 @@
+"""
+Tests de la codificación del motor semántico con un modelo de prueba
+determinista (no carga sentence-transformers)
+"""
+
+import hashlib
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import vector_index
+from ai_engine import BookRecommendationAI
+from session_store import Session
+
+
+class HashModel:
+    """Embedding determinista por texto; registra el tamaño de cada llamada"""
+
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.calls = []
+
+    def vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+
+    def encode(self, texts, batch_size=32):
+        if isinstance(texts, str):
+            return self.vector(texts)
+        self.calls.append([len(text) for text in texts])
+        return np.vstack([self.vector(text) for text in texts])
+
+
+def make_books(n, start=0):
+    return [{'titulo': f'Libro {i}', 'autor': 'Autor', 'descripcion': 'x' * (i * 7 % 50),
+             'categoria': 'filosofia' if i % 2 else 'romance'} for i in range(start, start + n)]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ai = BookRecommendationAI(lazy=True, encode_batch_size=4)
+    ai.model = HashModel()
+    return ai
+
+
+def test_encode_texts_batches_by_length_and_keeps_order(engine):
+    texts = [BookRecommendationAI.book_text(book) for book in make_books(10)]
+    matrix = engine.encode_texts(texts)
+
+    assert [len(call) for call in engine.model.calls] == [4, 4, 2]
+    lengths = [length for call in engine.model.calls for length in call]
+    assert lengths == sorted(lengths)
+    for row, text in zip(matrix, texts):
+        np.testing.assert_array_equal(row, engine.model.vector(text))
+
+
+def test_add_books_encodes_only_new_books(engine):
+    base = make_books(10)
+    engine.encode_books(base)
+    engine.model.calls.clear()
+
+    new = make_books(3, start=10)
+    assert engine.add_books(new) == 3
+    assert sum(len(call) for call in engine.model.calls) == 3
+    assert len(engine.book_index) == 13 and len(engine.books) == 13
+    assert list(engine.book_index.ids) == list(range(13))
+
+    rebuilt = BookRecommendationAI(lazy=True)
+    rebuilt.model = HashModel()
+    rebuilt.encode_books(base + new)
+    assert rebuilt.model.calls == []  # todo quedó en el cache en disco
+    np.testing.assert_allclose(rebuilt.book_index.matrix, engine.book_index.matrix)
+
+
+def test_recommend_book_picks_up_added_books(engine):
+    books = make_books(5)
+    engine.recommend_book('quiero pensar', books, k=2)
+    books = books + make_books(2, start=5)
+    engine.model.calls.clear()
+
+    result = engine.recommend_book('quiero pensar', books, k=7)
+    assert sum(len(call) for call in engine.model.calls) == 2
+    assert sorted(item['id'] for item in result['ranking']) == list(range(7))
+
+
+def test_ivf_engine_adds_books_without_retraining(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ai = BookRecommendationAI(lazy=True, index_type='ivf', ivf_nprobe=64)
+    ai.model = HashModel()
+    ai.encode_books(make_books(40))
+    centroids = ai.book_index.centroids
+
+    ai.add_books(make_books(5, start=40))
+    assert ai.book_index.centroids is centroids
+    result = ai.recommend_book('quiero pensar', ai.books, k=45)
+    assert sorted(item['id'] for item in result['ranking']) == list(range(45))
+
+
+def test_ivf_is_reused_across_warmups(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    books = make_books(40)
+    first = BookRecommendationAI(lazy=True, index_type='ivf')
+    first.model = HashModel()
+    first.encode_books(books)
+    first.add_books(make_books(5, start=40))
+
+    def no_training(*args, **kwargs):
+        raise AssertionError("k-means no debería reentrenarse")
+
+    monkeypatch.setattr(vector_index, 'spherical_kmeans', no_training)
+    second = BookRecommendationAI(lazy=True, index_type='ivf')
+    second.model = HashModel()
+    second.encode_books(books + make_books(5, start=40))  # prefijo guardado + libros agregados
+    np.testing.assert_array_equal(second.book_index.centroids, first.book_index.centroids)
+    for rows, expected in zip(second.book_index.lists, first.book_index.lists):
+        assert rows.tolist() == expected.tolist()
+
+    monkeypatch.undo()
+    monkeypatch.chdir(tmp_path)
+    reordered = BookRecommendationAI(lazy=True, index_type='ivf')
+    reordered.model = HashModel()
+    reordered.encode_books(books[::-1])  # otro orden de filas: se reentrena
+    assert len(reordered.book_index) == 40
+
+
+def test_repeated_messages_hit_query_cache(engine):
+    books = make_books(5)
+    first = engine.recommend_book('Estoy  TRISTE', books, k=2)
+    engine.model.calls.clear()
+    encoded = []
+    engine.model.vector = lambda text, vector=engine.model.vector: encoded.append(text) or vector(text)
+
+    second = engine.recommend_book('estoy triste', books, k=2)
+    third = engine.recommend_book(' estóy triste ', books, k=2)
+    assert encoded == []  # ni el mensaje ni el contexto se recodifican
+    assert second['ranking'] == first['ranking'] == third['ranking']
+    assert third['analisis']['raw_message'] == ' estóy triste '
+
+    stats = engine.get_query_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 1)
+    assert stats['memory_bytes'] == 2 * 16 * 4
+
+
+def test_query_cache_is_bounded_and_reset_with_prototypes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ai = BookRecommendationAI(lazy=True, query_cache_size=2)
+    ai.model = HashModel()
+    for message in ['uno', 'dos', 'tres']:
+        ai.understand_user_input(message)
+    assert ai.get_query_cache_stats()['evictions'] == 1
+
+    ai.load_prototypes(emotions={'sereno': 'calma paz'})
+    assert len(ai.query_cache) == 0
+
+
+def test_int8_backend_uses_its_own_embedding_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fp32 = BookRecommendationAI(lazy=True)
+    int8 = BookRecommendationAI(lazy=True, model_backend='int8')
+    assert fp32.embedding_cache.model_name != int8.embedding_cache.model_name
+
+    with pytest.raises(ValueError):
+        BookRecommendationAI(lazy=True, model_backend='fp8').load_model()
+
+
+def test_confidence_keeps_the_cosine_scale_with_preference_boost(engine):
+    genre = engine.understand_user_input('quiero pensar')['genre']
+    books = [dict(book, categoria=genre) for book in make_books(6)]
+    engine.user_history['preferences'][genre] = 10.0  # boost x3 a todo el catálogo
+
+    boosted = engine.recommend_book('quiero pensar', books, k=3)
+    best = boosted['ranking'][0]
+    query = engine.analyze_query('quiero pensar')['context_embedding']
+    similarity = float(engine.book_index.similarities(query)[best['id']])
+    assert best['score'] > similarity  # el ranking sí usa el boost
+    assert 0.0 <= boosted['confianza'] <= 1.0
+    assert boosted['confianza'] == pytest.approx(min(max(similarity, 0.0), 1.0), abs=1e-6)
+
+
+def test_session_exclusions_and_store_recording(engine):
+    class Store:
+        def __init__(self):
+            self.events = []
+
+        def record(self, event):
+            self.events.append(event)
+
+    engine.store = Store()
+    session = Session('s')
+    books = make_books(3)
+
+    seen = [engine.recommend_book('quiero pensar', books, k=2, session=session)['ranking'][0]['id']
+            for _ in range(3)]
+    assert sorted(seen) == [0, 1, 2] and session.recommended == {0, 1, 2}
+    assert engine.recommend_book('quiero pensar', books, k=2, session=session)['ranking'] == []
+
+    assert len(engine.store.events) == 3
+    event = engine.store.events[0]
+    assert event['type'] == 'recommend' and event['interaction']['motor'] == 'semantico'
+    assert event['book_scores'] == [[f"Libro {seen[0]}_Autor", 0.1]]
+
+
+def test_store_backed_engine_does_not_rewrite_history_per_request(engine, tmp_path):
+    engine.store = type('Store', (), {'record': lambda self, event: None})()
+    for _ in range(3):
+        engine.recommend_book('quiero pensar', make_books(4), k=2)
+    assert not (tmp_path / 'user_history.json').exists()
+
+    engine.close()
+    saved = BookRecommendationAI(lazy=True).user_history
+    assert len(saved['interactions']) == 3 and saved['preferences']
+
+
+def test_concurrent_requests_add_new_books_once(engine):
+    books = make_books(5)
+    engine.recommend_book('quiero pensar', books, k=2)
+    books = books + make_books(4, start=5)
+
+    encode = engine.model.encode
+    barrier = threading.Barrier(4)
+
+    def slow_encode(texts, batch_size=32):
+        time.sleep(0.02)  # ensancha la ventana de la carrera
+        return encode(texts, batch_size)
+
+    engine.model.encode = slow_encode
+    errors = []
+
+    def worker():
+        barrier.wait()
+        try:
+            engine.recommend_book('quiero pensar', books, k=9)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(engine.books) == len(engine.book_index) == 9
+    assert list(engine.book_index.ids) == list(range(9))
+    assert [book['titulo'] for book in engine.books] == [book['titulo'] for book in books]
+
+
+def test_empty_catalog_returns_no_results(engine):
+    result = engine.recommend_book('quiero pensar', [], k=3)
+    assert result['ranking'] == [] and result['alternativas'] == []
+    assert result['libro']['titulo'] == 'Sin resultados'
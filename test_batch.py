@@ -0,0 +1,60 @@
+"""
+Tests de /recomendar/batch
+"""
+
+from session_store import Session
+
+
+def test_batch_returns_results_in_order(app_module):
+    client = app_module.app.test_client()
+    response = client.post('/recomendar/batch', json={'messages': [
+        'Estoy triste pero quiero esperanza',
+        {'message': '   '},
+        {'message': 'Sorpréndeme', 'session_id': 'otra'},
+    ], 'k': 2})
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert len(results) == 3
+    assert results[1] == {'error': 'Por favor escribe un mensaje'}
+    assert len(results[0]['recommendation']['alternativas']) == 2
+    assert results[2]['recommendation']['analisis']['emotion']
+
+
+def test_batch_matches_single_requests_and_writes_once(app_module, monkeypatch):
+    recommender = app_module.recommender
+    calls = []
+    record_many = recommender.store.record_many
+    monkeypatch.setattr(recommender.store, 'record_many', lambda events: calls.append(len(events)) or record_many(events))
+
+    # Lo que respondería /recomendar ahora mismo (sin registrar nada)
+    expected, _ = recommender._recommend(
+        'Estoy triste y quiero llorar', 3, Session('nueva'), recommender.catalog,
+        recommender.history['preferences'], recommender._recent_categories()
+    )
+
+    messages = [{'message': 'Estoy triste y quiero llorar', 'session_id': f'cohorte-{i}'} for i in range(20)]
+    results = app_module.app.test_client().post('/recomendar/batch', json={'messages': messages}).get_json()['results']
+
+    # Mismo estado de partida para todo el lote
+    assert {r['recommendation']['libro']['titulo'] for r in results} == {expected['libro']['titulo']}
+    assert results[0]['recommendation']['alternativas'] == expected['alternativas']
+    assert calls == [20]
+
+    recommender.store.flush()
+    assert recommender.store.count('interactions') == 20
+
+
+def test_batch_session_exclusions_accumulate(app_module):
+    messages = [{'message': 'Estoy triste', 'session_id': 'ana'}] * 4
+    results = app_module.app.test_client().post('/recomendar/batch', json={'messages': messages}).get_json()['results']
+    titles = [r['recommendation']['libro']['titulo'] for r in results]
+    assert len(set(titles)) == 4
+    assert len(app_module.recommender.sessions.get('ana').recommended) == 4
+
+
+def test_batch_rejects_malformed_requests(app_module):
+    client = app_module.app.test_client()
+    assert client.post('/recomendar/batch', json={'messages': 'hola'}).status_code == 400
+    assert client.post('/recomendar/batch', json={'messages': ['x'] * (app_module.MAX_LOTE + 1)}).status_code == 400
+    assert client.post('/recomendar/batch', json={'messages': ['hola'], 'k': 'dos'}).status_code == 400
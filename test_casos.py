@@ -24,12 +24,15 @@ def show_rec(user_msg, rec):
     print(f"💡 {rec['explicacion']}")
     
     if rec.get('alternativas'):
-        print(f"📚 Alternativas: {', '.join(rec['alternativas'][:2])}")
+        print(f"📚 Alternativas: {', '.join(alt['titulo'] for alt in rec['alternativas'][:2])}")
 
-# Limpiar historial para empezar de cero
+# Limpiar historial (base SQLite y JSON heredados) para empezar de cero
 if os.path.exists('smart_history.json'):
     os.remove('smart_history.json')
     print("🧹 Historial limpiado para empezar de cero\n")
+for path in ('smart_history.log.jsonl', 'bookmate.db', 'bookmate.db-wal', 'bookmate.db-shm'):
+    if os.path.exists(path):
+        os.remove(path)
 
 recommender = SmartRecommender()
 
@@ -100,7 +103,8 @@ print_sep()
 # Test 5: Ya leí este libro
 print("\n🔹 Test 5: Evitar libro ya leído")
 # Marcar Pedro Páramo como ya recomendado
-recommender.session_recommended.add('Pedro Páramo')
+pedro = next(b for b in recommender.get_all_books_flat() if b['titulo'] == 'Pedro Páramo')
+recommender.default_session.exclude(pedro.id)
 rec5 = recommender.recommend("Ya leí Pedro Páramo. Dame otra opción igual de triste pero diferente.")
 show_rec("Ya leí Pedro Páramo, dame otra opción", rec5)
 
@@ -0,0 +1,56 @@
+"""
+Tests del catálogo persistente (SQLite) detrás de /api/add-book
+"""
+
+import pytest
+
+from catalog_store import CatalogStore
+from smart_recommender import SmartRecommender
+
+NUEVO = {
+    'titulo': 'Libro nuevo', 'autor': 'Autora', 'descripcion': 'Sobre el duelo',
+    'categoria': 'nueva', 'emociones': ['triste', 'esperanzado'],
+    'impacto': 'esperanzador', 'intensidad': 'media', 'temas': ['duelo'],
+}
+
+
+@pytest.fixture
+def base_books(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return SmartRecommender().get_all_books_flat()
+
+
+def test_added_book_survives_restart(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    recommender = SmartRecommender()
+    base = len(recommender.get_all_books_flat())
+    book = recommender.add_book(dict(NUEVO))
+    assert book.id == base
+
+    restarted = SmartRecommender()
+    books = restarted.get_all_books_flat()
+    assert len(books) == base + 1
+    assert books[-1] == book
+    assert restarted.features.titles[-1] == 'Libro nuevo'
+    assert restarted.recommend("Tengo un duelo, quiero esperanza")['libro']['titulo'] == 'Libro nuevo'
+
+
+def test_store_roundtrip(tmp_path, base_books):
+    books = base_books
+    store = CatalogStore(str(tmp_path / 'catalog.db'))
+    assert store.bulk_load(books) == len(books)
+    assert store.load() == books
+
+
+def test_find_uses_indexes(tmp_path, base_books):
+    books = base_books
+    store = CatalogStore(str(tmp_path / 'catalog.db'))
+    store.bulk_load(books)
+
+    expected = [b.id for b in books if b.categoria == 'filosofia' and 'triste' in b.emociones]
+    assert store.find(categoria='filosofia', emocion='triste') == expected
+    assert store.find(titulo='Pedro Páramo') == [b.id for b in books if b.titulo == 'Pedro Páramo']
+
+    for column in ('categoria', 'impacto', 'titulo'):
+        plan = store.conn.execute(f'EXPLAIN QUERY PLAN SELECT id FROM books WHERE {column} = ?', ('x',)).fetchall()
+        assert 'USING INDEX' in str(plan) or 'USING COVERING INDEX' in str(plan)
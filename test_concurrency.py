@@ -0,0 +1,82 @@
+"""
+Stress de concurrencia: muchos hilos contra /recomendar y /api/feedback en
+un servidor WSGI con hilos; verifica que no se pierdan actualizaciones
+"""
+
+import threading
+
+import pytest
+import requests
+from werkzeug.serving import make_server
+
+from feedback_system import FeedbackSystem
+from state_store import StateStore
+
+THREADS = 8
+ROUNDS = 12
+
+
+@pytest.fixture
+def server(app_module):
+    httpd = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield app_module, f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+def hammer(base_url, worker, errors):
+    http = requests.Session()
+    http.headers['X-Session-Id'] = f'stress-{worker}'
+    for round_ in range(ROUNDS):
+        try:
+            response = http.post(f'{base_url}/recomendar', json={'message': f'Estoy triste {round_}'})
+            response.raise_for_status()
+            recommendation = response.json()['recommendation']
+            response = http.post(f'{base_url}/api/feedback', json={
+                'recommendation': recommendation, 'feedback_type': 'positive'
+            })
+            response.raise_for_status()
+        except Exception as e:
+            errors.append(e)
+
+
+def test_no_lost_updates_under_load(server):
+    app_module, base_url = server
+    errors = []
+    workers = [threading.Thread(target=hammer, args=(base_url, i, errors)) for i in range(THREADS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    total = THREADS * ROUNDS
+    store = app_module.recommender.store
+    feedback_sys = app_module.feedback_sys
+
+    # Cada petición generó exactamente un evento
+    store.flush()
+    assert store.events_flushed == 2 * total
+    assert store.count('interactions') == min(total, store.max_interactions)
+    assert store.count('learning_adjustments') == min(total, store.max_adjustments)
+    assert feedback_sys.feedback_data['total_feedback_count'] == total
+    assert sum(r['positive'] for r in feedback_sys.feedback_data['book_ratings'].values()) == total
+    assert sum(store.history['book_scores'].values()) == pytest.approx(0.1 * total + 0.5 * total)
+
+    # El vector de scoring quedó con el último valor de cada libro
+    features = app_module.recommender.features
+    learned = features.learned_values()
+    for book_id, value in store.history['book_scores'].items():
+        for row in features.rows_by_id.get(book_id, []):
+            assert learned[row] == value
+
+    # Lo persistido coincide con lo que hay en memoria
+    # (los deltas coalescidos se suman en otro orden: igual salvo redondeo)
+    reloaded = StateStore(store.db_file)
+    assert reloaded.history['book_scores'] == pytest.approx(store.history['book_scores'])
+    assert reloaded.history['preferences'] == pytest.approx(store.history['preferences'])
+    assert FeedbackSystem(store=reloaded).feedback_data == feedback_sys.feedback_data
+
+    # Cada sesión vio sus propias recomendaciones
+    assert len(app_module.recommender.sessions) == THREADS
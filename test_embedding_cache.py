@@ -0,0 +1,102 @@
+"""
+Tests del cache persistente de embeddings (desalojo, escrituras
+interrumpidas, cambio de modelo y textos repetidos)
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache
+
+
+class CountingEncoder:
+    """encode_fn determinista que registra los textos codificados"""
+
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(text) + 1] + [hash(text) % 7] * (self.dim - 1) for text in texts], dtype=np.float32)
+
+
+def matrices(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.startswith('embeddings-'))
+
+
+def test_removed_books_are_evicted(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    encoder = CountingEncoder()
+    cache = EmbeddingCache('modelo', cache_dir)
+    cache.get_embeddings(['a', 'b', 'c'], encoder)
+
+    cache.get_embeddings(['a', 'c'], encoder)
+    assert encoder.encoded == ['a', 'b', 'c']
+    assert len(cache.keys) == 2 and len(matrices(cache_dir)) == 1
+
+    reloaded = EmbeddingCache('modelo', cache_dir)
+    assert reloaded.keys == cache.keys
+
+
+def test_crash_before_index_replace_keeps_previous_cache(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    encoder = CountingEncoder()
+    before = EmbeddingCache('modelo', cache_dir).get_embeddings(['a', 'b'], encoder)
+
+    def crash(*args):
+        raise OSError("proceso interrumpido")
+
+    monkeypatch.setattr(os, 'replace', crash)
+    EmbeddingCache('modelo', cache_dir).get_embeddings(['a', 'b', 'nuevo'], encoder)
+    monkeypatch.undo()
+
+    # El índice anterior sigue apuntando a su matriz (la nueva queda huérfana)
+    reloaded = EmbeddingCache('modelo', cache_dir)
+    assert len(reloaded.keys) == 2
+    np.testing.assert_array_equal(reloaded.matrix, before)
+    assert len(matrices(cache_dir)) == 2
+
+    encoder.encoded.clear()
+    reloaded.get_embeddings(['a', 'b', 'nuevo'], encoder)
+    assert encoder.encoded == ['nuevo']
+    assert len(matrices(cache_dir)) == 1  # la huérfana se limpia en el siguiente save
+
+
+def test_model_change_ignores_existing_cache(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    EmbeddingCache('modelo-a', cache_dir).get_embeddings(['a', 'b'], CountingEncoder())
+
+    encoder = CountingEncoder()
+    cache = EmbeddingCache('modelo-b', cache_dir)
+    assert cache.keys == [] and cache.matrix is None
+    cache.get_embeddings(['a', 'b'], encoder)
+    assert encoder.encoded == ['a', 'b']
+    assert EmbeddingCache('modelo-a', cache_dir).keys == []  # el índice ahora es de modelo-b
+
+
+def test_duplicate_texts_do_not_rewrite_the_cache(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    texts = ['a', 'b', 'a', 'c', 'b']
+    first = EmbeddingCache('modelo', cache_dir).get_embeddings(texts, CountingEncoder())
+
+    cache = EmbeddingCache('modelo', cache_dir)
+    saves = []
+    monkeypatch.setattr(cache, 'save', lambda *args: saves.append(args))
+    encoder = CountingEncoder()
+    result = cache.get_embeddings(texts, encoder)
+
+    assert saves == [] and encoder.encoded == []
+    np.testing.assert_array_equal(result, first)
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_add_embeddings_with_no_texts(tmp_path, cached):
+    cache = EmbeddingCache('modelo', str(tmp_path / 'cache'))
+    if cached:
+        cache.get_embeddings(['a'], CountingEncoder())
+    encoder = CountingEncoder()
+    assert cache.add_embeddings([], encoder).shape[0] == 0
+    assert encoder.encoded == []
@@ -0,0 +1,84 @@
+"""
+Tests del micro-batching de codificaciones (EncodeScheduler)
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from encode_scheduler import EncodeScheduler
+
+
+class SlowEncoder:
+    """Codificador con costo fijo por forward; registra el tamaño de cada lote"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(len(texts))
+        time.sleep(self.delay)
+        return np.array([[len(text), i] for i, text in enumerate(texts)], dtype=np.float32)
+
+
+def run_concurrently(scheduler, texts):
+    results = [None] * len(texts)
+    barrier = threading.Barrier(len(texts))
+
+    def worker(i):
+        barrier.wait()
+        results[i] = scheduler.encode(texts[i], timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_requests_share_forward_passes():
+    encoder = SlowEncoder()
+    scheduler = EncodeScheduler(encoder, max_batch=8, max_wait_ms=20, adaptive=False)
+    texts = ['x' * i for i in range(1, 21)]
+
+    results = run_concurrently(scheduler, texts)
+    scheduler.close()
+
+    assert [int(row[0]) for row in results] == list(range(1, 21))  # cada uno recibe su fila
+    assert max(encoder.batches) == 8 and len(encoder.batches) < 20
+    stats = scheduler.get_stats()
+    assert stats['items'] == 20 and stats['batches'] == len(encoder.batches)
+    assert stats['max_queue_depth'] > 1 and stats['queue_depth'] == 0
+
+
+def test_adaptive_window_closes_without_concurrency():
+    scheduler = EncodeScheduler(SlowEncoder(delay=0.005), max_batch=8, max_wait_ms=50)
+    start = time.perf_counter()
+    for text in ['uno', 'dos', 'tres']:
+        scheduler.encode(text, timeout=5)
+    assert time.perf_counter() - start < 0.12  # no espera 3 ventanas de 50 ms
+    assert scheduler.get_stats()['window_ms'] == 0.0
+
+    run_concurrently(scheduler, ['a'] * 16)
+    assert scheduler.get_stats()['window_ms'] > 0  # con carga la ventana se abre
+    scheduler.close()
+
+
+def test_encoder_errors_reach_every_caller():
+    def failing(texts):
+        raise RuntimeError("modelo caído")
+
+    scheduler = EncodeScheduler(failing, max_batch=4, max_wait_ms=10, adaptive=False)
+    futures = [scheduler.submit(text) for text in ['a', 'b', 'c']]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="modelo caído"):
+            future.result(timeout=5)
+    assert scheduler.get_stats()['errors'] >= 1
+
+    scheduler.close()
+    with pytest.raises(RuntimeError):
+        scheduler.submit('d')
@@ -0,0 +1,83 @@
+"""
+Tests de liveness/readiness y del calentamiento del motor semántico
+"""
+
+import threading
+
+from test_ai_engine import HashModel, make_books
+
+
+def wait_warmup(timeout=5):
+    for thread in threading.enumerate():
+        if thread.name == 'ai-warmup':
+            thread.join(timeout)
+
+
+def test_live_always_answers(app_module):
+    response = app_module.app.test_client().get('/api/health/live')
+    assert response.status_code == 200 and response.get_json()['status'] == 'alive'
+
+
+def test_ready_without_semantic_engine(app_module):
+    response = app_module.app.test_client().get('/api/health/ready')
+    assert response.status_code == 200
+    assert response.get_json()['motor_activo'] == 'smart'
+
+
+def test_ready_follows_warmup_state(app_module, monkeypatch):
+    client = app_module.app.test_client()
+    ai = app_module.semantic_ai
+    monkeypatch.setattr(app_module, 'semantic_enabled', True)
+
+    for state in ('pending', 'warming'):
+        monkeypatch.setattr(ai, 'warmup_state', state)
+        response = client.get('/api/health/ready')
+        body = response.get_json()
+        assert response.status_code == 200 and body['motor_activo'] == 'smart'
+        assert body['semantic_engine']['state'] == state
+
+    monkeypatch.setattr(ai, 'warmup_state', 'failed')
+    response = client.get('/api/health/ready')
+    assert response.status_code == 200 and response.get_json()['motor_activo'] == 'smart'
+
+    monkeypatch.setattr(ai, 'warmup_state', 'ready')
+    response = client.get('/api/health/ready')
+    assert response.status_code == 200 and response.get_json()['motor_activo'] == 'semantico'
+
+
+def test_warmup_reaches_ready(app_module, monkeypatch):
+    ai = app_module.semantic_ai
+    monkeypatch.setattr(ai, 'load_model', lambda: setattr(ai, 'model', HashModel()))
+    ai.start_warmup(make_books(4))
+    wait_warmup()
+
+    status = ai.get_warmup_status()
+    assert status['state'] == 'ready' and status['books_encoded'] == 4
+    assert status['seconds'] is not None and status['error'] is None
+    ai.start_warmup(make_books(4))  # solo calienta una vez
+    assert ai.warmup_state == 'ready'
+
+
+def test_failed_warmup_is_reported_and_smart_keeps_serving(app_module, monkeypatch):
+    ai = app_module.semantic_ai
+
+    def broken():
+        raise RuntimeError("sin modelo")
+
+    monkeypatch.setattr(ai, 'load_model', broken)
+    monkeypatch.setattr(app_module, 'semantic_enabled', True)
+    ai.start_warmup(make_books(2))
+    wait_warmup()
+
+    client = app_module.app.test_client()
+    ready = client.get('/api/health/ready').get_json()
+    assert ready['semantic_engine']['state'] == 'failed'
+    assert ready['semantic_engine']['error'] == 'sin modelo'
+    response = client.post('/recomendar', json={'message': 'Estoy triste'})
+    assert response.status_code == 200 and response.get_json()['motor'] == 'smart'
+
+
+def test_not_ready_when_no_engine_can_serve(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.recommender, 'catalog', app_module.recommender.catalog.from_books([]))
+    response = app_module.app.test_client().get('/api/health/ready')
+    assert response.status_code == 503 and response.get_json()['status'] == 'unavailable'
@@ -0,0 +1,64 @@
+"""
+Tests del lector del historial JSON heredado (snapshot + log JSONL)
+"""
+
+import json
+import os
+
+from history_log import load_history
+
+
+def make_event(seq):
+    return {
+        'seq': seq,
+        'type': 'recommend',
+        'interaction': {'recommended': f'Libro {seq}', 'categoria': 'filosofia'},
+        'preferences': [['triste', 0.2], ['pensativo', 0.1]],
+        'book_scores': [[f'Libro {seq % 3}_Autor', 0.1]]
+    }
+
+
+def write_legacy(tmp_path, snapshot=None, events=(), tail=''):
+    path = tmp_path / 'history.json'
+    if snapshot is not None:
+        path.write_text(json.dumps(snapshot), encoding='utf-8')
+    lines = ''.join(json.dumps(event) + '\n' for event in events)
+    (tmp_path / 'history.log.jsonl').write_text(lines + tail, encoding='utf-8')
+    return str(path)
+
+
+def test_replays_only_events_after_snapshot(tmp_path):
+    snapshot = {'interactions': [{'recommended': 'Libro 1'}], 'preferences': {'triste': 0.2},
+                'book_scores': {'Libro 1_Autor': 0.1}, 'last_seq': 1}
+    # El evento 1 ya está en el snapshot (corte entre compactar y truncar)
+    path = write_legacy(tmp_path, snapshot, [make_event(1), make_event(2), make_event(3)])
+
+    history = load_history(path)
+    assert [i['recommended'] for i in history['interactions']] == ['Libro 1', 'Libro 2', 'Libro 3']
+    assert history['preferences']['triste'] == 0.2 + 0.2 + 0.2
+    assert history['book_scores']['Libro 1_Autor'] == 0.1
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    path = write_legacy(tmp_path, None, [make_event(1), make_event(2)], tail='{"seq": 3, "type": "recom')
+    history = load_history(path, max_interactions=1)
+    assert [i['recommended'] for i in history['interactions']] == ['Libro 2']
+
+
+def test_corrupt_snapshot_is_preserved(tmp_path):
+    path = tmp_path / 'history.json'
+    path.write_text('{"interactions": [', encoding='utf-8')
+
+    history = load_history(str(path))
+    assert history['interactions'] == []
+    assert any(name.startswith('history.json.corrupt-') for name in os.listdir(tmp_path))
+
+
+def test_legacy_snapshot_without_seq_is_loaded(tmp_path):
+    path = write_legacy(tmp_path, {'interactions': [{'recommended': 'María'}],
+                                   'preferences': {'triste': 1.5}, 'book_scores': {'María_Jorge Isaacs': 0.4}},
+                        [make_event(1)])
+
+    history = load_history(path)
+    assert history['preferences']['triste'] == 1.5 + 0.2
+    assert history['book_scores']['María_Jorge Isaacs'] == 0.4
@@ -0,0 +1,120 @@
+"""
+Tests del matcher multi-patrón (límites de palabra, frases solapadas,
+acentos y puntuación) y comparación con el recorrido palabra por palabra
+"""
+
+import os
+import re
+import sys
+
+import pytest
+
+from keyword_matcher import KeywordMatcher
+from smart_recommender import SmartRecommender
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+from bench_suite import message_corpus  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def recommender(tmp_path_factory):
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('matcher'))
+    try:
+        recommender = SmartRecommender()
+        recommender.store.close()
+        recommender.catalog_store.close()
+    finally:
+        os.chdir(cwd)
+    return recommender
+
+
+@pytest.fixture(scope='module')
+def matcher(recommender):
+    return recommender.keyword_matcher
+
+
+def keywords(matcher, text):
+    return {hit.keyword for hit in matcher.find(text)}
+
+
+def labels(matcher, text, category):
+    return set(matcher.match(text)[category])
+
+
+def test_respects_word_boundaries(matcher):
+    assert 'era' not in keywords(matcher, 'quiero algo de esperanza')
+    assert 'sin' not in keywords(matcher, 'fue sincero conmigo')
+    assert 'ira' not in keywords(matcher, 'me inspira')
+    assert {'era', 'sin'} <= keywords(matcher, 'era un día sin luz')
+
+
+def test_overlapping_phrases_report_every_keyword():
+    small = KeywordMatcher()
+    small.add('a', 'corta', ['sin'])
+    small.add('b', 'larga', ['sin sentido'])
+
+    hits = small.find('todo es sin sentido')
+    assert [(hit.keyword, hit.start) for hit in hits] == [('sin sentido', 8), ('sin', 8)]
+    assert [hit.keyword for hit in small.find('sin sentidos')] == ['sin']
+    assert [hit.keyword for hit in small.find('voy sin rumbo')] == ['sin']
+
+
+def test_accented_and_feminine_forms(matcher):
+    assert labels(matcher, 'Me siento VACÍA', 'emotion') == {'triste'}
+    assert labels(matcher, 'estoy melancólica', 'emotion') == {'triste'}
+    assert labels(matcher, 'ando ansiosa y cansada', 'emotion') == {'ansioso', 'aburrido'}
+    assert labels(matcher, 'me siento romántica', 'emotion') == {'romántico'}
+    assert labels(matcher, 'estoy romantica', 'emotion') == set()  # sin tilde no es la misma palabra
+
+
+def test_stems_match_as_prefixes():
+    small = KeywordMatcher()
+    small.add('signal', 'llanto', ['melanc*', 'triste*'])
+    small.add('emotion', 'triste', ['triste'])
+
+    assert [hit.keyword for hit in small.find('libros melancólicos')] == ['melanc*']
+    assert [hit.keyword for hit in small.find('tanta melancolía')] == ['melanc*']
+    assert [(hit.keyword, hit.label) for hit in small.find('triste')] == [('triste', 'triste'), ('triste*', 'llanto')]
+    assert [hit.keyword for hit in small.find('tristeza')] == ['triste*']
+    assert small.find('desmelancolizado') == []  # el inicio sigue con límite de palabra
+
+
+@pytest.mark.parametrize('message', ['Estoy feliz pero quiero libros melancólicos',
+                                     'Estoy feliz, aunque con algo de melancolía'])
+def test_melancholic_stem_triggers_the_crying_signal(recommender, matcher, message):
+    assert labels(matcher, message, 'signal') >= {'feliz', 'llanto'}
+    assert recommender.analyze_emotion(message)[0] == 'triste'
+
+
+@pytest.mark.parametrize('text', ['¡Triste!', 'triste, pero bien', '(triste)', '«triste»', 'triste...', '¿triste?',
+                                  'muy-triste'])
+def test_punctuation_delimits_words(matcher, text):
+    assert 'triste' in keywords(matcher, text)
+
+
+def test_matches_word_by_word_loop_on_benchmark_corpus(matcher):
+    """
+    Cada clave se encuentra si y solo si aparece con límites de palabra;
+    frente al antiguo `keyword in texto` solo se pierden coincidencias
+    dentro de otra palabra.
+    """
+    def pattern(keyword):
+        if keyword.endswith('*'):  # raíz: sin límite al final
+            return re.compile(r'(?<!\w)' + re.escape(keyword[:-1]))
+        return re.compile(r'(?<!\w)' + re.escape(keyword) + r'(?!\w)')
+
+    patterns = {keyword: pattern(keyword) for keyword in matcher.tags}
+    corpus = message_corpus(500, seed=0) + message_corpus(200, seed=1)
+
+    dropped = set()
+    for message in corpus:
+        text = message.lower()
+        found = keywords(matcher, message)
+        expected = {keyword for keyword, pattern in patterns.items() if pattern.search(text)}
+        assert found == expected, message
+
+        substring = {keyword for keyword in matcher.tags if keyword.rstrip('*') in text}
+        assert found <= substring
+        dropped |= substring - found
+    assert 'era' in dropped  # 'esperanza' ya no cuenta como nostalgia
@@ -0,0 +1,81 @@
+"""
+Tests de las métricas (formato Prometheus) y de /api/metrics
+"""
+
+import pytest
+
+import metrics
+from metrics import Counter, Histogram, Registry, timed
+
+
+@pytest.fixture
+def registry():
+    """Registro propio: las métricas de prueba no aparecen en /api/metrics"""
+    return Registry()
+
+
+def test_histogram_renders_cumulative_buckets(registry):
+    histogram = Histogram('test_latency_seconds', 'Latencia de prueba', ['stage'], buckets=(0.1, 1.0),
+                          registry=registry)
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, stage='a')
+
+    lines = histogram.render()
+    assert '# TYPE test_latency_seconds histogram' in lines
+    assert 'test_latency_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{stage="a",le="1.0"} 3' in lines
+    assert 'test_latency_seconds_bucket{stage="a",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{stage="a"} 4' in lines
+    assert 'test_latency_seconds_sum{stage="a"} 4.05' in lines
+
+
+def test_timed_observes_even_when_the_block_fails(registry):
+    histogram = Histogram('test_timed_seconds', 'Bloques medidos', ['op'], registry=registry)
+    errors = Counter('test_errors_total', 'Errores de prueba', ['op'], registry=registry)
+    with pytest.raises(ValueError):
+        with timed(histogram, op='falla'):
+            errors.inc(op='falla')
+            raise ValueError("boom")
+    assert histogram.count(op='falla') == 1
+    assert errors.value(op='falla') == 1
+    assert 'test_errors_total{op="falla"} 1' in metrics.render(registry=registry)
+    assert 'test_errors_total' not in metrics.render()
+
+
+def test_metrics_endpoint_reports_stages_and_requests(app_module):
+    client = app_module.app.test_client()
+    before = metrics.STAGE_SECONDS.count(stage='scoring')
+    assert client.post('/recomendar', json={'message': 'Estoy triste'}).status_code == 200
+    client.get('/no-existe')
+
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    assert metrics.STAGE_SECONDS.count(stage='scoring') == before + 1
+
+    body = response.get_data(as_text=True)
+    for stage in ('context', 'emotion', 'scoring', 'ranking', 'explanation', 'persistence'):
+        assert f'bookmate_stage_seconds_count{{stage="{stage}"}}' in body
+    assert 'bookmate_http_requests_total{endpoint="/recomendar",method="POST",status="200"}' in body
+    assert 'bookmate_http_requests_total{endpoint="unmatched",method="GET",status="404"}' in body
+    assert 'bookmate_persistence_backlog ' in body
+    assert 'bookmate_lock_acquisitions{lock="state"}' in body
+
+
+def test_swallowed_errors_are_counted(app_module, monkeypatch):
+    client = app_module.app.test_client()
+    errors = metrics.HTTP_ERRORS
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("falla a mitad de camino")
+
+    before = errors.value(endpoint='/recomendar/stream')
+    monkeypatch.setattr(app_module.recommender, 'generate_explanation', broken)
+    response = client.post('/recomendar/stream', json={'message': 'Estoy triste'})
+    assert response.status_code == 200 and b'event: error' in response.get_data()
+    assert errors.value(endpoint='/recomendar/stream') == before + 1
+
+    before = errors.value(endpoint='/api/libros-recientes')
+    monkeypatch.setattr(app_module.recent_books, 'get', broken)
+    assert client.get('/api/libros-recientes').get_json()['success']
+    assert errors.value(endpoint='/api/libros-recientes') == before + 1
@@ -0,0 +1,172 @@
+"""
+Tests de RecentBooksFetcher contra un servidor HTTP local que imita
+Google Books (con latencia configurable y conteo de peticiones)
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from recent_books import RecentBooksFetcher
+
+
+class StubBooksAPI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.delay = 0.0
+        self.fail = False
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/books/v1/volumes"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        time.sleep(server.delay)
+        if server.fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        query = parse_qs(urlparse(self.path).query)['q'][0]
+        body = json.dumps({'items': [
+            {'volumeInfo': {'title': f'{query} #{i}', 'authors': ['Autora'],
+                            'publishedDate': '2025-01-01', 'averageRating': 4.5, 'ratingsCount': 10}}
+            for i in range(2)
+        ] + [{'volumeInfo': {'title': 'Compartido', 'authors': ['Autor']}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def stub():
+    server = StubBooksAPI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_queries_run_concurrently_and_dedupe(stub):
+    stub.delay = 0.3
+    fetcher = RecentBooksFetcher(base_url=stub.url, timeout=2.0)
+
+    start = time.perf_counter()
+    books = fetcher.get(2025)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.6  # tres consultas de 0.3 s en paralelo, no 0.9 s
+    assert stub.requests == 3
+    titles = [book['titulo'] for book in books]
+    assert titles.count('Compartido') == 1
+    assert titles[0] == 'bestseller books 2025 #0'
+    assert books[0]['fuente'] == '⭐ 4.5/5 (10 reseñas)'
+
+
+def test_whole_call_is_bounded_by_timeout(stub):
+    stub.delay = 2.0
+    fetcher = RecentBooksFetcher(base_url=stub.url, timeout=0.3)
+
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError):
+        fetcher.get(2025)
+    assert time.perf_counter() - start < 1.0
+
+
+def test_concurrent_misses_fetch_once(stub):
+    stub.delay = 0.2
+    fetcher = RecentBooksFetcher(base_url=stub.url, timeout=2.0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetcher.get(2025))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 10 and all(result == results[0] for result in results)
+    assert fetcher.fetches == 1
+    assert stub.requests == 3
+
+
+def test_stale_is_served_while_single_refresh_runs(stub):
+    clock = FakeClock()
+    fetcher = RecentBooksFetcher(base_url=stub.url, ttl=60, timeout=2.0, clock=clock)
+    first = fetcher.get(2025)
+    assert fetcher.get(2025) == first and stub.requests == 3  # fresco: sin red
+
+    clock.now = 120
+    stub.delay = 0.3
+    start = time.perf_counter()
+    for _ in range(5):
+        assert fetcher.get(2025) == first  # vencido: se sirve sin esperar
+    assert time.perf_counter() - start < 0.2
+
+    deadline = time.monotonic() + 3
+    while fetcher.fetches < 2 or fetcher._inflight:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert fetcher.fetches == 2  # un solo refresco para las cinco lecturas
+    assert fetcher.get_stats()['stale_served'] == 5
+
+
+def test_failed_refresh_keeps_serving_stale(stub):
+    clock = FakeClock()
+    fetcher = RecentBooksFetcher(base_url=stub.url, ttl=60, timeout=1.0, clock=clock)
+    first = fetcher.get(2025)
+
+    clock.now = 120
+    stub.fail = True
+    assert fetcher.get(2025) == first
+    deadline = time.monotonic() + 3
+    while fetcher.fetches < 2 or fetcher._inflight:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert fetcher.get(2025) == first
+    assert fetcher.fetches == 2  # dentro de error_ttl no se reintenta
+
+
+def test_failures_are_cached_for_error_ttl(stub):
+    clock = FakeClock()
+    stub.fail = True
+    fetcher = RecentBooksFetcher(base_url=stub.url, timeout=1.0, clock=clock, error_ttl=30)
+    with pytest.raises(RuntimeError):
+        fetcher.get(2025)
+    assert stub.requests == 3
+
+    start = time.perf_counter()
+    for _ in range(5):
+        with pytest.raises(RuntimeError):
+            fetcher.get(2025)  # sin red: se responde el error recordado
+    assert time.perf_counter() - start < 0.1
+    assert stub.requests == 3 and fetcher.get_stats()['errors_served'] == 5
+
+    clock.now = 31
+    stub.fail = False
+    assert fetcher.get(2025) and stub.requests == 6
@@ -0,0 +1,176 @@
+"""
+Test diferencial: scoring vectorizado (BookFeatures) vs calculate_book_score
+"""
+
+import random
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+import book_features
+from book_features import BookFeatures
+from smart_recommender import SmartRecommender
+from vector_index import top_k_indices
+
+EMOCIONES = ['triste', 'feliz', 'pensativo', 'motivado', 'aburrido', 'ansioso',
+             'curioso', 'romántico', 'confundido', 'nostálgico', 'valiente']
+IMPACTOS = ['catártico', 'reflexivo', 'esperanzador', 'transformador', 'entretenimiento', None]
+INTENSIDADES = ['alta', 'media', 'baja', None]
+TEMAS = ['duelo', 'pérdida', 'vacío', 'muerte', 'amor', 'moral', 'soledad', 'control']
+CATEGORIAS = ['filosofia', 'romance', 'distopia', 'clasica', 'humor', 'aventura']
+MENSAJES = [
+    "Estoy triste pero no quiero ponerme peor",
+    "Estoy feliz, pero quiero algo que me haga llorar.",
+    "Hoy me siento vacía, como si nada tuviera sentido",
+    "Quiero algo feminista, triste y con una protagonista fuerte.",
+    "¿Tienes algo sobre duelo, pero que no sea deprimente?",
+    "Me siento nostálgica, pero con ganas de esperanza",
+    "Sorpréndeme con algo que me transforme",
+    "No sé cómo me siento",
+    "Estoy aburrido de la rutina",
+    "hola",
+]
+
+
+def random_book(rng, i):
+    titulo = rng.choice(['Jane Eyre', f'Libro {i}', f'Libro {i % 7}'])
+    return {
+        'id': i,
+        'titulo': titulo,
+        'autor': rng.choice(['Autora A', 'Autor B', 'Autor C']),
+        'descripcion': 'Descripción',
+        'categoria': rng.choice(CATEGORIAS),
+        'emociones': rng.sample(EMOCIONES, rng.randint(0, 4)),
+        'impacto': rng.choice(IMPACTOS),
+        'intensidad': rng.choice(INTENSIDADES),
+        'temas': rng.sample(TEMAS, rng.randint(0, 3)),
+    }
+
+
+@pytest.fixture
+def recommender(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return SmartRecommender()
+
+
+def randomize_state(recommender, rng, books):
+    recommender.history['preferences'] = defaultdict(
+        float, {e: round(rng.uniform(-1, 3), 1) for e in rng.sample(EMOCIONES, 6)}
+    )
+    recommender.history['book_scores'] = defaultdict(
+        float, {f"{b['titulo']}_{b['autor']}": rng.choice([0.1, 0.2, 0.3, -0.3, 0.5])
+                for b in rng.sample(books, len(books) // 2)}
+    )
+    recommender.history['interactions'] = [
+        {'categoria': rng.choice(CATEGORIAS + [None])} for _ in range(rng.randint(0, 7))
+    ]
+    recommender.default_session.reset()
+    for book in rng.sample(books, rng.randint(0, 5)):
+        recommender.default_session.exclude(book['id'])
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_vectorized_matches_scalar(recommender, seed):
+    rng = random.Random(seed)
+    books = [random_book(rng, i) for i in range(rng.randint(1, 80))]
+    randomize_state(recommender, rng, books)
+    features = BookFeatures(books, recommender.history['book_scores'])
+    recent = [i.get('categoria', '') for i in recommender.history['interactions'][-5:]]
+
+    for message in MENSAJES:
+        contexts = recommender.detect_special_context(message)
+        emotion, _ = recommender.analyze_emotion(message)
+        topics = recommender.detect_topics(message)
+
+        expected = [recommender.calculate_book_score(book, emotion, message, contexts, topics)
+                    for book in books]
+        actual = features.score(emotion, recommender.history['preferences'],
+                                recommender.default_session.recommended, contexts, topics, recent)
+
+        assert actual.tolist() == expected
+
+        # Mismo ranking que el ordenamiento estable original
+        expected_order = sorted(range(len(books)), key=lambda i: expected[i], reverse=True)
+        assert np.argsort(-actual, kind='stable').tolist() == expected_order
+
+
+def test_incremental_extend_matches_full_build(recommender):
+    rng = random.Random(42)
+    books = [random_book(rng, i) for i in range(50)]
+    randomize_state(recommender, rng, books)
+
+    full = BookFeatures(books, recommender.history['book_scores'])
+    incremental = BookFeatures(books[:30], recommender.history['book_scores'])
+    for book in books[30:]:
+        incremental.extend([book], recommender.history['book_scores'])
+
+    for message in MENSAJES:
+        args = (recommender.analyze_emotion(message)[0], recommender.history['preferences'],
+                recommender.default_session.recommended, recommender.detect_special_context(message),
+                recommender.detect_topics(message), ['romance'])
+        assert incremental.score(*args).tolist() == full.score(*args).tolist()
+
+
+def test_add_book_is_scored(recommender):
+    recommender.add_book({
+        'titulo': 'Libro nuevo', 'autor': 'Autora', 'descripcion': 'Sobre el duelo',
+        'categoria': 'nueva', 'emociones': ['triste', 'esperanzado'],
+        'impacto': 'esperanzador', 'intensidad': 'media', 'temas': ['duelo'],
+    })
+    assert recommender.features.titles[-1] == 'Libro nuevo'
+
+    result = recommender.recommend("Tengo un duelo, quiero esperanza")
+    assert result['libro']['titulo'] == 'Libro nuevo'
+
+
+def test_learned_scores_publish_a_new_catalog_version(recommender):
+    old = recommender.catalog
+    book = old.books[0]
+    before = old.features.learned_values()
+    args = ('triste', {}, set(), [], set(), [])
+    old_scores = old.features.score(*args)
+
+    recommender.store.record({'type': 'recommend', 'book_scores': [[book.book_id, 0.5]]})
+
+    new = recommender.catalog
+    assert new is not old and new.books is old.books
+    assert new.features.learned_values()[book.id] == before[book.id] + 0.5
+    assert new.features.learned is old.features.learned  # sin copiar el vector completo
+    np.testing.assert_array_equal(old.features.learned_values(), before)  # la versión anterior no cambia
+    assert old.features.score(*args).tolist() == old_scores.tolist()
+
+
+def test_learned_overlay_is_folded_and_scores_match(recommender, monkeypatch):
+    monkeypatch.setattr(book_features, 'LEARNED_OVERLAY_MAX', 4)
+    features = recommender.catalog.features
+    args = ('triste', {'triste': 2}, set(), ['esperanza'], set(), ['filosofia'])
+
+    versions = [features]
+    for i, book_id in enumerate(features.book_ids[:6]):
+        versions.append(versions[-1].with_learned({book_id: i + 0.25}))
+    assert len(versions[4].learned_overlay) == 4 and versions[4].learned is features.learned
+    assert versions[5].learned_overlay == {} and versions[5].learned is not features.learned
+    assert len(versions[6].learned_overlay) == 1
+
+    for version in versions:
+        expected = BookFeatures(version.books, dict(zip(version.book_ids, version.learned_values())))
+        assert version.score(*args).tolist() == expected.score(*args).tolist()
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_top_k_matches_stable_sort_with_ties(seed):
+    rng = np.random.default_rng(seed)
+    scores = rng.integers(-3, 4, size=rng.integers(1, 200)).astype(np.float64)
+    stable = np.argsort(-scores, kind='stable')
+    for k in (1, 4, 10, len(scores), len(scores) + 5):
+        assert top_k_indices(scores, k).tolist() == stable[:k].tolist()
+
+
+def test_recommend_returns_k_alternatives(recommender):
+    result = recommender.recommend("Estoy triste", k=6)
+    alternativas = result['alternativas']
+    assert len(alternativas) == 6
+    assert all({'id', 'titulo', 'autor', 'score'} <= set(alt) for alt in alternativas)
+    assert [alt['score'] for alt in alternativas] == sorted((alt['score'] for alt in alternativas), reverse=True)
+    assert result['libro']['titulo'] not in [alt['titulo'] for alt in alternativas]
@@ -0,0 +1,87 @@
+"""
+Tests del almacén de sesiones (LRU + TTL) y del aislamiento entre usuarios
+"""
+
+import pytest
+
+from lru_cache import LRUCache
+from session_store import Session, SessionStore
+from smart_recommender import SmartRecommender
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_lru_idle_ttl_expires():
+    clock = FakeClock()
+    evicted = []
+    cache = LRUCache(maxsize=10, ttl=60, clock=clock, on_evict=lambda k, v: evicted.append(k))
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    clock.now = 50
+    assert cache.get('a') == 1  # renueva el último acceso de 'a'
+    clock.now = 100
+    assert cache.purge_expired() == 1
+    assert evicted == ['b']
+    assert cache.get('a') == 1
+
+
+def test_session_memory_is_bounded():
+    session = Session('s', context_size=3, max_recommended=4)
+    for book_id in range(10):
+        session.exclude(book_id)
+        session.context.append({'book': book_id})
+
+    assert session.recommended == {6, 7, 8, 9}
+    assert len(session.context) == 3
+
+
+def test_store_caps_number_of_sessions():
+    store = SessionStore(max_sessions=3)
+    for i in range(5):
+        store.get(f'user-{i}')
+    assert len(store) == 3
+
+
+@pytest.fixture
+def recommender(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return SmartRecommender()
+
+
+def test_sessions_are_isolated(recommender):
+    alice = recommender.sessions.get('alice')
+    bob = recommender.sessions.get('bob')
+    message = "Estoy triste y quiero llorar"
+
+    first = recommender.recommend(message, session=alice)
+    second = recommender.recommend(message, session=alice)
+    assert second['libro']['titulo'] != first['libro']['titulo']
+
+    # Bob no hereda las exclusiones ni el contexto de Alice
+    assert first['libro'].id in alice.recommended
+    assert not bob.recommended and not bob.context
+    recommender.recommend(message, session=bob)
+    assert len(bob.recommended) == 1 and len(alice.recommended) == 2
+
+    recommender.reset_session(alice)
+    assert not alice.recommended and not alice.context
+    assert len(bob.recommended) == 1
@@ -0,0 +1,175 @@
+"""
+Tests del almacén de estado compartido (SQLite WAL) y la migración JSON
+"""
+
+import json
+import time
+
+import pytest
+
+from feedback_system import FeedbackSystem
+from state_store import StateStore
+
+RECOMMENDATION = {
+    'libro': {'titulo': 'Pedro Páramo', 'autor': 'Juan Rulfo'},
+    'analisis': {'emotion': 'triste', 'special_contexts': ['catarsis']}
+}
+
+
+def make_store(tmp_path, **kwargs):
+    return StateStore(str(tmp_path / 'bookmate.db'),
+                      history_file=str(tmp_path / 'smart_history.json'),
+                      feedback_file=str(tmp_path / 'feedback_data.json'), **kwargs)
+
+
+def test_events_survive_reopen(tmp_path):
+    store = make_store(tmp_path, max_interactions=5)
+    for i in range(8):
+        store.record({
+            'type': 'recommend',
+            'interaction': {'recommended': f'Libro {i}', 'emotion': 'triste'},
+            'preferences': [['triste', 0.2], ['pensativo', 0.1]],
+            'book_scores': [[f'Libro {i % 3}_Autor', 0.1]]
+        })
+    store.close()
+
+    reopened = make_store(tmp_path, max_interactions=5)
+    assert reopened.snapshot() == store.snapshot()
+    assert [i['recommended'] for i in reopened.history['interactions']] == [f'Libro {i}' for i in range(3, 8)]
+    assert reopened.count('interactions') == 5  # la tabla también queda acotada
+
+
+def test_feedback_and_history_share_one_store(tmp_path):
+    store = make_store(tmp_path)
+    feedback_sys = FeedbackSystem(store=store)
+    updates = []
+    store.subscribe(lambda changed: updates.extend(changed.items()))
+
+    feedback_sys.process_feedback(RECOMMENDATION, 'positive')
+    feedback_sys.process_feedback(RECOMMENDATION, 'negative')
+    feedback_sys.process_feedback(RECOMMENDATION, 'wrong_emotion')
+
+    assert store.history['book_scores']['Pedro Páramo_Juan Rulfo'] == 0.5 - 0.3
+    assert updates[-1] == ('Pedro Páramo_Juan Rulfo', 0.5 - 0.3)
+    assert feedback_sys.feedback_data['book_ratings']['Pedro Páramo_Juan Rulfo'] == {
+        'positive': 1, 'negative': 1, 'neutral': 1
+    }
+    assert feedback_sys.feedback_data['emotion_accuracy']['triste'] == {'correct': 2, 'incorrect': 1}
+    assert feedback_sys.feedback_data['context_effectiveness']['catarsis'] == {'helpful': 1, 'not_helpful': 1}
+
+    store.flush()
+    reopened = FeedbackSystem(store=make_store(tmp_path))
+    assert reopened.feedback_data == feedback_sys.feedback_data
+    assert reopened.get_feedback_stats()['total_feedback'] == 3
+
+
+def test_json_migration_runs_once(tmp_path):
+    # Historial heredado: snapshot + un evento pendiente en el log
+    with open(tmp_path / 'smart_history.json', 'w', encoding='utf-8') as f:
+        json.dump({'interactions': [{'recommended': 'María'}], 'preferences': {'triste': 0.2},
+                   'book_scores': {'María_Jorge Isaacs': 0.1}, 'last_seq': 1}, f)
+    with open(tmp_path / 'smart_history.log.jsonl', 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'seq': 2, 'type': 'feedback', 'preferences': [['triste', 0.3]],
+                            'book_scores': [['María_Jorge Isaacs', 0.5]]}) + '\n')
+    with open(tmp_path / 'feedback_data.json', 'w', encoding='utf-8') as f:
+        json.dump({'book_ratings': {'María_Jorge Isaacs': {'positive': 1, 'negative': 0, 'neutral': 0}},
+                   'emotion_accuracy': {'triste': {'correct': 1, 'incorrect': 0}},
+                   'context_effectiveness': {}, 'total_feedback_count': 1,
+                   'learning_adjustments': [{'book': 'María', 'feedback': 'positive'}]}, f)
+
+    store = make_store(tmp_path)
+    assert store.history['preferences']['triste'] == 0.2 + 0.3
+    assert store.history['book_scores']['María_Jorge Isaacs'] == 0.1 + 0.5
+    assert store.feedback['book_ratings']['María_Jorge Isaacs']['positive'] == 1
+    assert store.feedback['total_feedback_count'] == 1
+    store.close()
+
+    # Reabrir no vuelve a importar
+    reopened = make_store(tmp_path)
+    assert reopened.history['book_scores']['María_Jorge Isaacs'] == 0.1 + 0.5
+    assert reopened.count('interactions') == 1
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def recommend_event(i):
+    return {'type': 'recommend', 'interaction': {'recommended': f'Libro {i}'},
+            'preferences': [['triste', 0.1]], 'book_scores': [['María_Jorge Isaacs', 0.1]]}
+
+
+def test_write_behind_flushes_by_event_count(tmp_path):
+    store = make_store(tmp_path, flush_interval=60, flush_events=5)
+    for i in range(4):
+        store.record(recommend_event(i))
+    assert store.get_stats()['backlog'] == 4
+    assert store.count('interactions') == 0  # la petición no esperó al disco
+
+    store.record(recommend_event(4))
+    assert wait_for(lambda: store.count('interactions') == 5)
+    assert store.get_stats()['backlog'] == 0
+    store.close()
+
+
+def test_write_behind_flushes_by_interval(tmp_path):
+    store = make_store(tmp_path, flush_interval=0.05, flush_events=1000)
+    store.record(recommend_event(0))
+    assert wait_for(lambda: store.count('interactions') == 1)
+    store.close()
+
+
+def test_flush_coalesces_and_close_flushes_pending(tmp_path):
+    store = make_store(tmp_path, flush_interval=60)
+    for i in range(50):
+        store.record(recommend_event(i))
+    store.close()
+    assert store.get_stats()['flushes'] == 1
+
+    reopened = make_store(tmp_path, flush_interval=None)
+    assert reopened.history['book_scores'] == store.history['book_scores']
+    assert reopened.history['preferences'] == store.history['preferences']
+    assert reopened.count('interactions') == 50
+
+
+def test_failed_flush_keeps_pending_changes(tmp_path, monkeypatch):
+    store = make_store(tmp_path, flush_interval=None)
+    monkeypatch.setattr(store, '_write', lambda batch: 1 / 0)
+    store.record(recommend_event(0))
+    assert store.get_stats()['flush_errors'] == 1
+    assert store.get_stats()['backlog'] == 1
+
+    monkeypatch.undo()
+    assert store.flush() == 1
+    assert make_store(tmp_path).history['book_scores'] == store.history['book_scores']
+
+
+def test_two_stores_on_one_database_add_up(tmp_path):
+    first = make_store(tmp_path, flush_interval=60)
+    second = make_store(tmp_path, flush_interval=60)
+    feedback = {'type': 'feedback', 'book_ratings': [['María_Jorge Isaacs', 'positive']],
+                'emotion_accuracy': [['triste', 'correct']]}
+    for i in range(3):
+        first.record(recommend_event(i))
+        second.record(recommend_event(i))
+    first.record(feedback)
+    second.record(feedback)
+    second.record(feedback)
+    first.flush()
+    second.flush()
+    first.record(recommend_event(3))  # segundo flush: suma sobre lo que escribió el otro
+    first.close()
+    second.close()
+
+    reopened = make_store(tmp_path, flush_interval=None)
+    assert reopened.history['book_scores']['María_Jorge Isaacs'] == pytest.approx(0.7)
+    assert reopened.history['preferences']['triste'] == pytest.approx(0.7)
+    assert reopened.feedback['book_ratings']['María_Jorge Isaacs']['positive'] == 3
+    assert reopened.feedback['emotion_accuracy']['triste'] == {'correct': 3, 'incorrect': 0}
+    assert reopened.feedback['total_feedback_count'] == 3
+    assert reopened.count('interactions') == 7
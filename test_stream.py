@@ -0,0 +1,58 @@
+"""
+Tests de /recomendar/stream (Server-Sent Events)
+"""
+
+import json
+
+
+def parse_events(chunks):
+    events = []
+    for chunk in chunks:
+        for block in chunk.decode('utf-8').strip().split('\n\n'):
+            lines = dict(line.split(': ', 1) for line in block.splitlines())
+            events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_stream_sends_stages_in_order(app_module):
+    client = app_module.app.test_client()
+    response = client.post('/recomendar/stream', json={'message': 'Estoy triste pero quiero esperanza', 'k': 2},
+                           headers={'X-Session-Id': 'stream'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = parse_events(response.response)
+    assert [name for name, _ in events] == ['analisis', 'libro', 'alternativas', 'explicacion', 'resultado']
+
+    stages = dict(events)
+    assert stages['analisis']['emotion'] == 'triste'
+    assert 'esperanza' in stages['analisis']['special_contexts']
+    final = stages['resultado']
+    assert final['success'] and final['motor'] == 'smart'
+    assert final['recommendation']['libro'] == stages['libro']['libro']
+    assert final['recommendation']['alternativas'] == stages['alternativas']
+    assert final['recommendation']['explicacion'] == stages['explicacion']
+
+
+def test_stream_persists_after_the_result_is_sent(app_module):
+    recommender = app_module.recommender
+    before = len(recommender.history['interactions'])
+    response = app_module.app.test_client().post('/recomendar/stream', json={'message': 'Sorpréndeme'},
+                                                 buffered=False)
+
+    chunks = iter(response.response)
+    names = []
+    for chunk in chunks:
+        names.extend(name for name, _ in parse_events([chunk]))
+        if names[-1] == 'resultado':
+            break
+    assert len(recommender.history['interactions']) == before  # aún no se registró
+
+    list(chunks)
+    response.close()
+    assert len(recommender.history['interactions']) == before + 1
+
+
+def test_stream_rejects_empty_message(app_module):
+    response = app_module.app.test_client().post('/recomendar/stream', json={'message': '  '})
+    assert response.status_code == 400
@@ -0,0 +1,116 @@
+"""
+Tests de los índices vectoriales (exacto e IVF)
+"""
+
+import numpy as np
+import pytest
+
+from vector_index import ExactIndex, IVFIndex, normalize_rows
+
+
+def clustered(n, dim=32, clusters=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.standard_normal((clusters, dim)))
+    noise = rng.standard_normal((n, dim)).astype(np.float32) * 0.05
+    return normalize_rows(centers[rng.integers(0, clusters, n)] + noise)
+
+
+@pytest.fixture
+def data():
+    return clustered(5_000)
+
+
+def test_exact_add_matches_build(data):
+    built = ExactIndex()
+    built.build(data, normalized=True)
+    grown = ExactIndex()
+    grown.build(data[:4_000], normalized=True)
+    grown.add(data[4_000:], normalized=True)
+
+    assert list(grown.ids) == list(range(5_000))
+    query = data[4_321]
+    assert list(grown.search(query, k=10)[0]) == list(built.search(query, k=10)[0])
+
+
+def test_ivf_probing_every_list_is_exact(data):
+    exact = ExactIndex()
+    exact.build(data, normalized=True)
+    ivf = IVFIndex(nlist=64)
+    ivf.build(data, normalized=True)
+    boost = np.linspace(1.0, 1.5, len(data), dtype=np.float32)
+
+    for query in data[:20]:
+        ids, scores = ivf.search(query, k=5, boost=boost, nprobe=64)
+        exact_ids, exact_scores = exact.search(query, k=5, boost=boost)
+        assert list(ids) == list(exact_ids)
+        np.testing.assert_allclose(scores, exact_scores, rtol=1e-6)
+
+
+def test_ivf_recall_grows_with_nprobe(data):
+    exact = ExactIndex()
+    exact.build(data, normalized=True)
+    ivf = IVFIndex(nlist=64)
+    ivf.build(data, normalized=True)
+
+    def recall(nprobe):
+        hits = 0
+        for query in data[::250]:
+            hits += len(set(ivf.search(query, k=10, nprobe=nprobe)[0]) & set(exact.search(query, k=10)[0]))
+        return hits / (10 * len(data[::250]))
+
+    assert recall(1) <= recall(4) <= recall(16)
+    assert recall(16) >= 0.95
+
+
+def test_ivf_insert_and_save_load(data, tmp_path):
+    ivf = IVFIndex(nlist=32, nprobe=4)
+    ivf.build(data[:4_000], normalized=True)
+    before = ivf.lists
+    ivf.add(data[4_000:], normalized=True)
+
+    assert sum(len(rows) for rows in before) == 4_000  # la versión anterior no cambia
+    assert len(ivf) == 5_000 and int(ivf.ids[-1]) == 4_999
+    assert ivf.search(data[4_500], k=1)[0][0] == 4_500
+
+    path = tmp_path / 'ivf.npz'
+    ivf.save(path)
+    loaded = IVFIndex.load(path, data, normalized=True)
+    assert loaded.nprobe == 4 and len(loaded) == 5_000
+    for query in data[::500]:
+        assert list(loaded.search(query, k=5)[0]) == list(ivf.search(query, k=5)[0])
+
+
+@pytest.mark.parametrize('precision,ratio,tolerance', [('float16', 2, 2e-3), ('int8', 3.5, 2e-2)])
+def test_reduced_precision_scores_close_to_float32(data, precision, ratio, tolerance):
+    full = ExactIndex()
+    full.build(data, normalized=True)
+    reduced = ExactIndex(precision=precision)
+    reduced.build(data[:4_000], normalized=True)
+    reduced.add(data[4_000:], normalized=True)
+
+    assert reduced.matrix.dtype == np.dtype(precision)
+    assert full.nbytes / reduced.nbytes >= ratio  # int8: 4·dim / (dim + 4 de la escala)
+    query = data[123]
+    np.testing.assert_allclose(reduced.similarities(query), full.similarities(query), atol=tolerance)
+    assert reduced.search(query, k=1)[0][0] == 123
+
+
+def test_ivf_int8_round_trip(data, tmp_path):
+    ivf = IVFIndex(nlist=32, nprobe=32, precision='int8')
+    ivf.build(data, normalized=True)
+    path = tmp_path / 'ivf8.npz'
+    ivf.save(path)
+    loaded = IVFIndex.load(path, data, normalized=True)
+
+    assert loaded.precision == 'int8' and loaded.matrix.dtype == np.int8
+    np.testing.assert_array_equal(loaded.scales, ivf.scales)
+    assert list(loaded.search(data[7], k=5)[0]) == list(ivf.search(data[7], k=5)[0])
+
+
+def test_ivf_load_rejects_other_embeddings(data, tmp_path):
+    ivf = IVFIndex(nlist=16)
+    ivf.build(data[:1_000], normalized=True)
+    path = tmp_path / 'ivf.npz'
+    ivf.save(path)
+    with pytest.raises(ValueError):
+        IVFIndex.load(path, data[:999], normalized=True)
@@ -0,0 +1,344 @@
+"""
+Índice vectorial para el motor semántico de BookMate AI
+Guarda la biblioteca como una única matriz normalizada (float32, float16
+o int8 con escala por fila) y resuelve la similitud con un producto
+matriz-vector + selección top-k
+"""
+
+import os
+
+import numpy as np
+
+
+def normalize_rows(matrix):
+    """Normaliza cada fila a norma L2 = 1 (las filas nulas quedan en cero)"""
+    matrix = np.array(matrix, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def quantize_rows(matrix, precision='float32', chunk=65_536):
+    """
+    Matriz normalizada en la precisión de almacenamiento:
+    - float32: sin cambios
+    - float16: mitad de memoria
+    - int8: un cuarto; cada fila guarda su escala (max|x| / 127)
+    Retorna (storage, scales); scales es None salvo en int8.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if precision == 'float32':
+        return matrix, None
+    if precision == 'float16':
+        return matrix.astype(np.float16), None
+    if precision != 'int8':
+        raise ValueError(f"Precisión desconocida: {precision}")
+
+    storage = np.empty(matrix.shape, dtype=np.int8)
+    scales = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), chunk):
+        block = matrix[start:start + chunk]
+        block_scales = np.abs(block).max(axis=1) / 127
+        block_scales[block_scales == 0] = 1.0
+        storage[start:start + chunk] = np.round(block / block_scales[:, None])
+        scales[start:start + chunk] = block_scales
+    return storage, scales
+
+
+def score_rows(storage, scales, query, chunk=1024):
+    """
+    storage @ query en float32. Las matrices reducidas se convierten por
+    bloques pequeños: la copia temporal cabe en cache y no depende del
+    tamaño del catálogo.
+    """
+    if storage.dtype == np.float32:
+        return storage @ query
+
+    scores = np.empty(len(storage), dtype=np.float32)
+    for start in range(0, len(storage), chunk):
+        scores[start:start + chunk] = storage[start:start + chunk].astype(np.float32) @ query
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+def top_k_indices(scores, k):
+    """
+    Devuelve los índices de los k mayores scores, de mayor a menor.
+
+    Usa argpartition (O(n)) y solo ordena los candidatos. Los empates
+    se resuelven por índice ascendente para que el resultado sea
+    determinista e igual al de un ordenamiento estable completo.
+    """
+    scores = np.asarray(scores)
+    n = len(scores)
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    k = min(k, n)
+    if k < n:
+        partition = np.argpartition(-scores, k - 1)[:k]
+        threshold = scores[partition].min()
+        # Incluir todos los empatados con el umbral antes de desempatar
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(n)
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:k]]
+
+
+class ExactIndex:
+    """
+    Búsqueda exacta por similitud coseno:
+    - matrix: embeddings normalizados (n x dim) en la precisión elegida
+    - scales: escala por fila (solo con precision='int8')
+    - ids: identificador entero de cada fila (array paralelo)
+    """
+
+    def __init__(self, precision='float32'):
+        self.precision = precision
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.scales = None
+        self.ids = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def build(self, embeddings, ids=None, normalized=False):
+        """Construye el índice a partir de una matriz de embeddings"""
+        if normalized:
+            matrix = np.asarray(embeddings, dtype=np.float32)
+        else:
+            matrix = normalize_rows(embeddings)
+
+        if ids is None:
+            ids = np.arange(len(matrix), dtype=np.int64)
+
+        self.matrix, self.scales = quantize_rows(matrix, self.precision)
+        self.ids = np.asarray(ids, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        """Memoria de la matriz (y escalas) del índice"""
+        return self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def add(self, embeddings, ids=None, normalized=False):
+        """
+        Agrega filas al final del índice sin recalcular las existentes.
+        Sin ids, continúan la numeración a partir del último id.
+        """
+        if normalized:
+            rows = np.asarray(embeddings, dtype=np.float32)
+        else:
+            rows = normalize_rows(embeddings)
+        if not len(self.ids):
+            self.build(rows, ids, normalized=True)
+            return
+
+        if ids is None:
+            start = int(self.ids[-1]) + 1
+            ids = np.arange(start, start + len(rows), dtype=np.int64)
+
+        rows, scales = quantize_rows(rows, self.precision)
+        if scales is not None:
+            self.scales = np.concatenate([self.scales, scales])
+        self.matrix = np.vstack([self.matrix, rows])
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+
+    def similarities(self, query):
+        """Similitud coseno de la consulta contra todas las filas"""
+        query = normalize_rows(query)[0]
+        return score_rows(self.matrix, self.scales, query)
+
+    def search(self, query, k=5, boost=None):
+        """
+        Retorna (ids, scores) de los k libros más similares.
+
+        Args:
+            query: embedding de la consulta (no necesita estar normalizado)
+            k: cantidad de resultados
+            boost: vector opcional (n,) que multiplica cada similitud
+        """
+        scores = self.similarities(query)
+        if boost is not None:
+            scores = scores * boost
+
+        top = top_k_indices(scores, k)
+        return self.ids[top], scores[top]
+
+
+def spherical_kmeans(matrix, nlist, iterations=10, seed=0):
+    """
+    K-means sobre vectores normalizados (similitud coseno).
+    Retorna los centroides normalizados (nlist x dim).
+    """
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(matrix), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = assign_lists(matrix, centroids)
+        order = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=nlist)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        # Suma por lista con reduceat sobre las filas agrupadas
+        sums = np.empty_like(centroids)
+        filled = np.flatnonzero(counts)
+        sums[filled] = np.add.reduceat(matrix[order], starts[filled], axis=0)
+        # Listas vacías: se reinician con un vector cualquiera
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = matrix[rng.choice(len(matrix), len(empty))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def assign_lists(matrix, centroids, chunk=65_536):
+    """Centroide más similar de cada fila (por bloques para acotar memoria)"""
+    assign = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), chunk):
+        assign[start:start + chunk] = np.argmax(matrix[start:start + chunk] @ centroids.T, axis=1)
+    return assign
+
+
+class IVFIndex:
+    """
+    Búsqueda aproximada con índice invertido (IVF):
+    - centroids: nlist centroides de k-means esférico
+    - lists: filas de matrix asignadas a cada centroide
+    - nprobe: listas visitadas por consulta (la perilla de recall:
+      nprobe = nlist equivale a la búsqueda exacta)
+
+    Misma interfaz que ExactIndex (build, add, search, precision); matrix
+    e ids conservan el orden de inserción, así que boost se indexa igual.
+    """
+
+    def __init__(self, nlist=None, nprobe=8, train_size=100_000, seed=0, precision='float32'):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.seed = seed
+        self.precision = precision
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.scales = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.lists = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def build(self, embeddings, ids=None, normalized=False):
+        """Entrena los centroides (sobre una muestra) y asigna todas las filas"""
+        matrix = np.asarray(embeddings, dtype=np.float32) if normalized else normalize_rows(embeddings)
+        if ids is None:
+            ids = np.arange(len(matrix), dtype=np.int64)
+
+        nlist = self.nlist or max(1, int(4 * np.sqrt(len(matrix))))
+        rng = np.random.default_rng(self.seed)
+        sample = matrix
+        if len(matrix) > self.train_size:
+            sample = matrix[np.sort(rng.choice(len(matrix), self.train_size, replace=False))]
+        nlist = min(nlist, len(sample))
+
+        self.centroids = spherical_kmeans(np.asarray(sample), nlist, seed=self.seed)
+        self.lists = self._split(assign_lists(matrix, self.centroids), offset=0)
+        self.matrix, self.scales = quantize_rows(matrix, self.precision)
+        self.ids = np.asarray(ids, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        """Memoria de la matriz, escalas y centroides del índice"""
+        scales = self.scales.nbytes if self.scales is not None else 0
+        return self.matrix.nbytes + scales + self.centroids.nbytes
+
+    def _split(self, assign, offset):
+        """Filas (desde offset) agrupadas por lista"""
+        order = np.argsort(assign, kind='stable')
+        bounds = np.searchsorted(assign[order], np.arange(len(self.centroids) + 1))
+        return [order[bounds[c]:bounds[c + 1]] + offset for c in range(len(self.centroids))]
+
+    def add(self, embeddings, ids=None, normalized=False):
+        """
+        Inserta filas al final sin reentrenar: cada una va a la lista de su
+        centroide más cercano. Crea arrays nuevos (no modifica los que
+        pueda estar usando una consulta en curso).
+        """
+        rows = np.asarray(embeddings, dtype=np.float32) if normalized else normalize_rows(embeddings)
+        if not len(self.ids):
+            self.build(rows, ids, normalized=True)
+            return
+
+        if ids is None:
+            start = int(self.ids[-1]) + 1
+            ids = np.arange(start, start + len(rows), dtype=np.int64)
+
+        new_lists = self._split(assign_lists(rows, self.centroids), offset=len(self.ids))
+        self.lists = [np.concatenate([old, new]) if len(new) else old
+                      for old, new in zip(self.lists, new_lists)]
+        rows, scales = quantize_rows(rows, self.precision)
+        if scales is not None:
+            self.scales = np.concatenate([self.scales, scales])
+        self.matrix = np.vstack([self.matrix, rows])
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+
+    def search(self, query, k=5, boost=None, nprobe=None):
+        """
+        Retorna (ids, scores) de los k libros más similares entre las
+        nprobe listas más cercanas a la consulta.
+        """
+        query = normalize_rows(query)[0]
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probe = top_k_indices(self.centroids @ query, nprobe)
+        rows = np.sort(np.concatenate([self.lists[c] for c in probe]))
+
+        scales = self.scales[rows] if self.scales is not None else None
+        scores = score_rows(self.matrix[rows], scales, query)
+        if boost is not None:
+            scores = scores * boost[rows]
+
+        top = top_k_indices(scores, k)
+        return self.ids[rows[top]], scores[top]
+
+    def save(self, path):
+        """
+        Guarda el entrenamiento (centroides y lista de cada fila) en un .npz;
+        la matriz no se guarda: se reconstruye desde los embeddings al cargar
+        """
+        assign = np.empty(len(self.ids), dtype=np.int32)
+        for c, rows in enumerate(self.lists):
+            assign[rows] = c
+        with open(path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, assign=assign, nprobe=self.nprobe,
+                     train_size=self.train_size, seed=self.seed, precision=self.precision)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def load(cls, path, embeddings, ids=None, normalized=False):
+        """
+        Reconstruye un índice guardado con save sobre los mismos embeddings
+        (en el mismo orden) sin reentrenar
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32) if normalized else normalize_rows(embeddings)
+        with np.load(path) as data:
+            index = cls(nlist=len(data['centroids']), nprobe=int(data['nprobe']),
+                        train_size=int(data['train_size']), seed=int(data['seed']),
+                        precision=str(data['precision']))
+            index.centroids = data['centroids']
+            assign = data['assign']
+        if len(assign) != len(matrix) or index.centroids.shape[1] != matrix.shape[1]:
+            raise ValueError("el índice guardado no corresponde a estos embeddings")
+
+        index.lists = index._split(assign, offset=0)
+        index.matrix, index.scales = quantize_rows(matrix, index.precision)
+        index.ids = np.asarray(ids if ids is not None else np.arange(len(matrix)), dtype=np.int64)
+        return index